@@ -1,15 +1,275 @@
-# from typing import Dict, List
-#
-# class AgentMemory:
-#     def __init__(self):
-#         self.sessions: Dict[str, List[str]] = {}
-#
-#     def add_message(self, session_id: str, message: str):
-#         self.sessions.setdefault(session_id, []).append(message)
-#
-#     def get_context(self, session_id: str) -> str:
-#         return "\n".join(self.sessions.get(session_id, []))
-#
-#     def clear_session(self, session_id: str):
-#         if session_id in self.sessions:
-#             del self.sessions[session_id]
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.graph.llm_client import LLMClient
+from app.graph.llm_errors import LLMError
+from app.models.parameters import SessionParams
+
+logger = logging.getLogger("AgentMemory")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    turns TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_last_access
+    ON sessions (last_access);
+"""
+
+SUMMARY_PROMPT = """Стисло підсумуй розмову користувача з асистентом у кількох реченнях.
+Збережи теми, ключові факти та відповіді, на які користувач може послатися далі.
+
+{summary}{turns}
+
+Підсумок:"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Turn:
+    query: str
+    answer: str
+    sources: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+
+    def render(self) -> str:
+        text = f"Користувач: {self.query}\nАсистент: {self.answer}"
+        if self.sources:
+            text += f"\nДжерела: {', '.join(self.sources)}"
+        return text
+
+
+@dataclass
+class SessionMemory:
+    summary: str = ""
+    turns: List[Turn] = field(default_factory=list)
+    last_access: float = field(default_factory=time.time)
+    # Serializes summarization of one session without blocking the others.
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(t.render()) for t in self.turns)
+
+    def context(self) -> str:
+        parts: List[str] = []
+        if self.summary:
+            parts.append(f"Підсумок попередньої розмови: {self.summary}")
+        parts.extend(turn.render() for turn in self.turns)
+        return "\n\n".join(parts)
+
+
+class LLMSummarizer:
+    def __init__(self, llm_client: LLMClient, max_tokens: int = 300):
+        self.llm_client = llm_client
+        self.max_tokens = max_tokens
+
+    def __call__(self, summary: str, turns: List[Turn]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            summary=f"Попередній підсумок: {summary}\n\n" if summary else "",
+            turns="\n\n".join(turn.render() for turn in turns),
+        )
+        return self.llm_client.generate(prompt, max_tokens=self.max_tokens, caller="summary")
+
+
+def extractive_summary(summary: str, turns: List[Turn]) -> str:
+    # Fallback without an LLM: keep the question and the first sentence of each answer.
+    lines = [summary] if summary else []
+    for turn in turns:
+        first_sentence = turn.answer.split(". ")[0].strip()
+        lines.append(f"{turn.query} — {first_sentence}")
+    return " ".join(lines)
+
+
+class SessionStore:
+    """Bounded per-session conversation memory with LRU/TTL eviction and optional SQLite persistence."""
+
+    def __init__(
+            self,
+            params: SessionParams = SessionParams(),
+            summarizer: Optional[Callable[[str, List[Turn]], str]] = None,
+    ):
+        self.params = params
+        self.summarizer = summarizer
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {"evicted_lru": 0, "evicted_ttl": 0, "summaries": 0, "restored": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        if params.db_path:
+            Path(params.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(params.db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+        self._stop = threading.Event()
+        self._evictor: Optional[threading.Thread] = None
+        logger.info(
+            f"SessionStore ініціалізовано | max_sessions={params.max_sessions} "
+            f"ttl={params.idle_ttl_seconds}s db={params.db_path}"
+        )
+
+    def _load(self, session_id: str) -> Optional[SessionMemory]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT summary, turns, last_access FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None or time.time() - row[2] > self.params.idle_ttl_seconds:
+            return None
+        self._stats["restored"] += 1
+        return SessionMemory(
+            summary=row[0],
+            turns=[Turn(**turn) for turn in json.loads(row[1])],
+            last_access=row[2],
+        )
+
+    def _save(self, session_id: str, memory: SessionMemory) -> None:
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, summary, turns, last_access) VALUES (?, ?, ?, ?)",
+            (
+                session_id,
+                memory.summary,
+                json.dumps([asdict(turn) for turn in memory.turns], ensure_ascii=False),
+                memory.last_access,
+            ),
+        )
+
+    def _get(self, session_id: str, create: bool) -> Optional[SessionMemory]:
+        # Caller holds self._lock.
+        memory = self._sessions.get(session_id)
+        if memory is None:
+            memory = self._load(session_id)
+            if memory is None and not create:
+                return None
+            memory = memory or SessionMemory()
+            self._sessions[session_id] = memory
+            self._evict_lru()
+        self._sessions.move_to_end(session_id)
+        memory.last_access = time.time()
+        return memory
+
+    def _evict_lru(self) -> None:
+        # Persisted sessions only leave memory; they are reloaded on the next request.
+        while len(self._sessions) > self.params.max_sessions:
+            session_id, _ = self._sessions.popitem(last=False)
+            self._stats["evicted_lru"] += 1
+            logger.info(f"Сесію витіснено (LRU): {session_id}")
+
+    def get_context(self, session_id: Optional[str]) -> str:
+        if session_id is None:
+            return ""
+        with self._lock:
+            memory = self._get(session_id, create=False)
+            return memory.context() if memory else ""
+
+    def add_turn(
+            self,
+            session_id: Optional[str],
+            query: str,
+            answer: str,
+            sources: Optional[List[str]] = None,
+    ) -> None:
+        if session_id is None:
+            return
+        unique_sources = list(dict.fromkeys(s for s in sources or [] if s))[:5]
+        turn = Turn(query=query, answer=answer.strip()[: self.params.max_answer_chars], sources=unique_sources)
+        with self._lock:
+            memory = self._get(session_id, create=True)
+            memory.turns.append(turn)
+
+        with memory.lock:
+            if memory.tokens() > self.params.history_token_budget:
+                self._summarize(session_id, memory)
+            with self._lock:
+                self._save(session_id, memory)
+
+    def _summarize(self, session_id: str, memory: SessionMemory) -> None:
+        keep = self.params.keep_recent_turns
+        with self._lock:
+            old_turns = memory.turns[:-keep] if keep else list(memory.turns)
+            previous = memory.summary
+        if not old_turns:
+            return
+
+        summary = None
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(previous, old_turns)
+            except LLMError as e:
+                logger.warning(f"Не вдалося підсумувати сесію {session_id} ({type(e).__name__}), extractive fallback")
+        if not summary:
+            summary = extractive_summary(previous, old_turns)
+
+        with self._lock:
+            memory.summary = summary[-self.params.max_summary_chars:]
+            memory.turns = memory.turns[len(old_turns):]
+            self._stats["summaries"] += 1
+        logger.info(f"Історію сесії {session_id} підсумовано | turns={len(old_turns)} tokens={memory.tokens()}")
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            found = self._sessions.pop(session_id, None) is not None
+            if self._db is not None:
+                found = self._db.execute(
+                    "DELETE FROM sessions WHERE session_id = ?",
+                    (session_id,),
+                ).rowcount > 0 or found
+        return found
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def evict_expired(self) -> int:
+        cutoff = time.time() - self.params.idle_ttl_seconds
+        with self._lock:
+            expired = [sid for sid, memory in self._sessions.items() if memory.last_access < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+            if self._db is not None:
+                self._db.execute("DELETE FROM sessions WHERE last_access < ?", (cutoff,))
+            self._stats["evicted_ttl"] += len(expired)
+        if expired:
+            logger.info(f"Витіснено неактивних сесій: {len(expired)}")
+        return len(expired)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._evictor = threading.Thread(target=self._evict_loop, name="session-evictor", daemon=True)
+        self._evictor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._evictor:
+            self._evictor.join(timeout=5)
+
+    def _evict_loop(self) -> None:
+        while not self._stop.wait(self.params.eviction_interval_seconds):
+            try:
+                self.evict_expired()
+            except Exception:
+                logger.exception("Помилка витіснення сесій")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._sessions)
+            stats["history_tokens"] = sum(memory.tokens() for memory in self._sessions.values())
+        stats["max_sessions"] = self.params.max_sessions
+        stats["persistent"] = self._db is not None
+        return stats
@@ -1,7 +1,8 @@
 import logging
-from typing import List, Literal, Optional
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
 
 from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, START, StateGraph
 
 from app.graph.llm_client import LLMClient
@@ -9,20 +10,19 @@ from app.graph.nodes.fallback_node import FallbackNode
 from app.graph.nodes.generate_node import GenerateNode
 from app.graph.nodes.grade_node import GradeNode
 from app.graph.nodes.input_node import InputNode
+from app.graph.nodes.prefetch_node import PrefetchNode, SpeculationStats
 from app.graph.nodes.query_analysis import QueryAnalysisNode
 from app.graph.nodes.retrieve_node import RetrieveNode
 from app.graph.nodes.rewrite_node import RewriteQueryNode
 from app.graph.state_model import GraphState
-from app.models.parameters import BiEncoderParams, CrossEncoderParams
-from app.services.embedders import HFBiEmbedder, HFCrossEncoder
+from app.models.parameters import BiEncoderParams, CrossEncoderParams, GradeParams, MultiQueryParams
+from app.services.context_compressor import ContextCompressor
+from app.services.context_packer import ContextPacker
+from app.services.embedders import create_bi_embedder, create_cross_encoder
+from app.services.query_router import EmbeddingQueryRouter
+from app.services.telemetry import span
 from app.services.vector_storage import VectorMemory
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)s] %(asctime)s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
-
 logger: logging.Logger = logging.getLogger(__name__)
 
 
@@ -31,23 +31,46 @@ class RAGAgent:
     def __init__(
             self,
             max_rewrite_attempts: int = 1,
+            vector_memory: Optional[VectorMemory] = None,
+            speculative_retrieval: bool = False,
+            speculation_stats: Optional[SpeculationStats] = None,
+            query_router: Optional[EmbeddingQueryRouter] = None,
+            grade_params: GradeParams = GradeParams(),
+            context_packer: Optional[ContextPacker] = None,
+            context_compressor: Optional[ContextCompressor] = None,
+            llm_client: Optional[LLMClient] = None,
+            multi_query: bool = False,
+            multi_query_params: MultiQueryParams = MultiQueryParams(),
     ) -> None:
-        self.llm: LLMClient = LLMClient()
+        self.llm: LLMClient = llm_client or LLMClient()
         self.max_rewrite_attempts: int = max_rewrite_attempts
+        self.speculative_retrieval: bool = speculative_retrieval
+        self.speculation_stats: SpeculationStats = speculation_stats or SpeculationStats()
+        self.query_router: Optional[EmbeddingQueryRouter] = query_router
+        self.grade_params: GradeParams = grade_params
+        self.context_packer: Optional[ContextPacker] = context_packer
+        self.context_compressor: Optional[ContextCompressor] = context_compressor
+        self.multi_query: bool = multi_query
+        self.multi_query_params: MultiQueryParams = multi_query_params
 
-        self.vector_memory: VectorMemory = VectorMemory(
-            bi_embedder=HFBiEmbedder(BiEncoderParams()),
-            cross_encoder=HFCrossEncoder(CrossEncoderParams()),
+        self.vector_memory: VectorMemory = vector_memory or VectorMemory(
+            bi_embedder=create_bi_embedder(BiEncoderParams()),
+            cross_encoder=create_cross_encoder(CrossEncoderParams()),
         )
 
         self.graph = self._build_graph()
         logger.info(
-            "RAGAgent ініціалізовано | max_rewrite_attempts=%d",
+            "RAGAgent ініціалізовано | max_rewrite_attempts=%d speculative_retrieval=%s multi_query=%s",
             self.max_rewrite_attempts,
+            self.speculative_retrieval,
+            self.multi_query,
         )
 
     def _route_after_query_analysis(self, state: GraphState) -> str:
         need_external = state.get("need_external_info", True)
+        # prefetch runs in the same superstep, so its output is not visible here yet.
+        if self.speculative_retrieval and state.get("rewrite_attempts", 0) == 0:
+            self.speculation_stats.record_outcome(used=need_external)
         if need_external:
             logger.info("Потрібна зовнішня інформація -> RAG")
             return "retrieve"
@@ -68,19 +91,54 @@ class RAGAgent:
                 logger.warning("Недостатньо інформації і спроби вичерпано -> fallback")
                 return "fallback"
 
+    @staticmethod
+    def _node(name: str, node) -> RunnableLambda:
+        # invoke() runs __call__, ainvoke() awaits acall; both are timed as node.<name>.
+        def call(state):
+            with span(f"node.{name}"):
+                return node(state)
+
+        async def acall(state):
+            with span(f"node.{name}"):
+                return await node.acall(state)
+
+        return RunnableLambda(call, afunc=acall, name=name)
+
     def _build_graph(self):
 
+        retrieve_node = RetrieveNode(self.vector_memory, self.multi_query_params)
+        num_rewrites = self.multi_query_params.num_rewrites if self.multi_query else 1
+
         graph = StateGraph(GraphState)
-        graph.add_node("input", InputNode())
-        graph.add_node("query_analysis", QueryAnalysisNode(self.llm))
-        graph.add_node("retrieve", RetrieveNode(self.vector_memory))
-        graph.add_node("grade", GradeNode(self.llm))
-        graph.add_node("rewrite", RewriteQueryNode(self.llm))
-        graph.add_node("generate", GenerateNode(self.llm))
-        graph.add_node("fallback", FallbackNode())
+        graph.add_node("input", self._node("input", InputNode()))
+        graph.add_node("query_analysis", self._node("query_analysis", QueryAnalysisNode(self.llm, self.query_router)))
+        graph.add_node("retrieve", self._node("retrieve", retrieve_node))
+        graph.add_node("grade", self._node("grade", GradeNode(
+            self.llm,
+            getattr(self.vector_memory, "cross_encoder", None),
+            self.grade_params,
+        )))
+        graph.add_node("rewrite", self._node("rewrite", RewriteQueryNode(self.llm, num_rewrites)))
+        graph.add_node("generate", self._node("generate", GenerateNode(
+            self.llm,
+            self.context_packer,
+            self.context_compressor,
+        )))
+        graph.add_node("fallback", self._node("fallback", FallbackNode()))
 
         graph.add_edge(START, "input")
         graph.add_edge("input", "query_analysis")
+        if self.speculative_retrieval:
+            # Search runs in the same superstep as query_analysis; retrieve
+            # reuses the result when the router picks RAG. The superstep ends
+            # when both nodes finish, so a direct answer also waits for the
+            # search whenever it outlasts the analysis (e.g. the local router).
+            graph.add_node(
+                "prefetch",
+                self._node("prefetch", PrefetchNode(retrieve_node, self.speculation_stats)),
+            )
+            graph.add_edge("input", "prefetch")
+            graph.add_edge("prefetch", END)
         graph.add_conditional_edges(
             "query_analysis",
             self._route_after_query_analysis,
@@ -101,17 +159,23 @@ class RAGAgent:
                 "fallback": "fallback",
             }
         )
-        graph.add_edge("rewrite", "query_analysis")
+        if self.multi_query:
+            # All rewrites are retrieved and fused in one hop; they need no re-analysis.
+            graph.add_edge("rewrite", "retrieve")
+        else:
+            graph.add_edge("rewrite", "query_analysis")
         graph.add_edge("generate", END)
         graph.add_edge("fallback", END)
         return graph.compile()
 
-    def run(
-            self,
+    @staticmethod
+    def _initial_state(
             query: str,
             docs: Optional[List[Document]] = None,
-    ) -> dict:
-        initial_state: GraphState = {
+            stream: bool = False,
+            history: str = "",
+    ) -> GraphState:
+        return {
             "input_query": query,
             "query": "",
             "docs": docs or [],
@@ -121,9 +185,77 @@ class RAGAgent:
             "messages": [],
             "need_external_info": True,
             "enough_data": False,
+            "stream": stream,
+            "prefetched_query": None,
+            "prefetched_docs": [],
+            "history": history,
+            "queries": [],
         }
+
+    def run(
+            self,
+            query: str,
+            docs: Optional[List[Document]] = None,
+            history: str = "",
+    ) -> dict:
         logger.info(f"Початок виконання графа | запит: {query[:100]}")
-        result = self.graph.invoke(initial_state)
+        result = self.graph.invoke(self._initial_state(query, docs, history=history))
+        logger.info(f"Відповідь: {result.get('answer', '')[:100]}...")
+        logger.info(f"Джерел: {len(result.get('sources', []))}")
+        return result
+
+    async def arun(
+            self,
+            query: str,
+            docs: Optional[List[Document]] = None,
+            history: str = "",
+    ) -> dict:
+        logger.info(f"Початок виконання графа (async) | запит: {query[:100]}")
+        result = await self.graph.ainvoke(self._initial_state(query, docs, history=history))
+        logger.info(f"Відповідь: {result.get('answer', '')[:100]}...")
+        logger.info(f"Джерел: {len(result.get('sources', []))}")
+        return result
+
+    @staticmethod
+    def _progress_event(node: str, update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        update = update or {}
+        if node == "query_analysis":
+            return {"type": "progress", "stage": "analysis",
+                    "need_external_info": update.get("need_external_info", True)}
+        if node == "retrieve":
+            return {"type": "progress", "stage": "retrieval",
+                    "num_docs": len(update.get("docs", []))}
+        if node == "grade":
+            return {"type": "progress", "stage": "grading",
+                    "enough_data": update.get("enough_data", False)}
+        if node == "rewrite":
+            return {"type": "progress", "stage": "rewrite", "query": update.get("query"),
+                    "queries": update.get("queries", [])}
+        return None
+
+    async def astream(
+            self,
+            query: str,
+            docs: Optional[List[Document]] = None,
+            history: str = "",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yields progress and token events, then a final "result" event with the graph state."""
+        logger.info(f"Початок потокового виконання графа | запит: {query[:100]}")
+        result: Dict[str, Any] = {}
+        async for mode, chunk in self.graph.astream(
+            self._initial_state(query, docs, stream=True, history=history),
+            stream_mode=["updates", "custom", "values"],
+        ):
+            if mode == "custom":
+                yield chunk
+            elif mode == "updates":
+                for node, update in chunk.items():
+                    event = self._progress_event(node, update)
+                    if event:
+                        yield event
+            else:
+                result = chunk
+
         logger.info(f"Відповідь: {result.get('answer', '')[:100]}...")
         logger.info(f"Джерел: {len(result.get('sources', []))}")
-        return result
\ No newline at end of file
+        yield {"type": "result", "state": result}
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from abc import abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Protocol
+
+from google import genai
+from google.genai import types
+
+from app.models.parameters import LLMParams, LocalLLMParams
+
+logger = logging.getLogger("LLMBackend")
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    # Token usage as reported by the backend, when it reports it.
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class LLMBackend(Protocol):
+    model_name: str
+
+    @abstractmethod
+    def generate(self, prompt: str, config: types.GenerateContentConfig) -> LLMResponse:
+        ...
+
+    @abstractmethod
+    async def agenerate(self, prompt: str, config: types.GenerateContentConfig) -> LLMResponse:
+        ...
+
+    @abstractmethod
+    def generate_stream(self, prompt: str, config: types.GenerateContentConfig) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    def agenerate_stream(self, prompt: str, config: types.GenerateContentConfig) -> AsyncIterator[str]:
+        ...
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, params: LLMParams = LLMParams()):
+        self.model_name = params.model_name
+        api_key = os.getenv("LLM_API_KEY")
+        if not api_key:
+            raise ValueError("LLM_API_KEY не встановлено в середовищі")
+        self.client = genai.Client(api_key=api_key)
+
+    @staticmethod
+    def _response(resp) -> LLMResponse:
+        usage = resp.usage_metadata
+        return LLMResponse(
+            text=resp.text or "",
+            input_tokens=usage.prompt_token_count if usage else None,
+            output_tokens=usage.candidates_token_count if usage else None,
+        )
+
+    def generate(self, prompt: str, config: types.GenerateContentConfig) -> LLMResponse:
+        resp = self.client.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=config,
+        )
+        return self._response(resp)
+
+    async def agenerate(self, prompt: str, config: types.GenerateContentConfig) -> LLMResponse:
+        resp = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=prompt,
+            config=config,
+        )
+        return self._response(resp)
+
+    def generate_stream(self, prompt: str, config: types.GenerateContentConfig) -> Iterator[str]:
+        for chunk in self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=prompt,
+            config=config,
+        ):
+            if chunk.text:
+                yield chunk.text
+
+    async def agenerate_stream(self, prompt: str, config: types.GenerateContentConfig) -> AsyncIterator[str]:
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=prompt,
+            config=config,
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+# Markers of the prompts built by the graph nodes.
+_ANALYSIS_MARKER = "Проаналізуй наступний запит"
+_GRADE_MARKER = "Визнач, чи достатньо наявних документів"
+_REWRITE_MARKER = "Перефразуй наступний запит"
+_DIRECT_MARKER = "на основі загальних знань.\nЗапит:"
+_SUMMARY_MARKER = "Стисло підсумуй розмову"
+_NO_DOCS_MARKER = "Немає документів"
+_SMALL_TALK = re.compile(r"^(привіт|добрий|дякую|hello|hi|thanks)\b", re.IGNORECASE)
+
+
+class LocalLLMBackend(LLMBackend):
+    """Deterministic, rule-based stand-in for Gemini with simulated latency."""
+
+    def __init__(self, params: LocalLLMParams = LocalLLMParams()):
+        self.params = params
+        self.model_name = params.model_name
+        self._lock = threading.Lock()
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    @staticmethod
+    def _quoted(prompt: str, label: str) -> str:
+        match = re.search(rf'{label}: "(.*?)"', prompt, re.DOTALL)
+        return match.group(1).strip() if match else ""
+
+    def _answer(self, prompt: str) -> str:
+        if _ANALYSIS_MARKER in prompt:
+            query = self._quoted(prompt, "Запит")
+            return "НІ" if _SMALL_TALK.match(query) else "ТАК"
+        if _GRADE_MARKER in prompt:
+            return "НІ" if _NO_DOCS_MARKER in prompt else "ТАК"
+        if _REWRITE_MARKER in prompt:
+            variants = re.search(r"(\d+) різних варіантах", prompt)
+            if variants:
+                query = self._quoted(prompt, "Оригінальний запит")
+                suffixes = ["визначення опис", "вимоги норми", "приклади застосування", "пояснення терміни"]
+                return "\n".join(
+                    f"{query} {suffixes[i % len(suffixes)]}" for i in range(int(variants.group(1)))
+                )
+            return f"{self._quoted(prompt, 'Оригінальний запит')} визначення опис"
+        if _SUMMARY_MARKER in prompt:
+            previous = re.findall(r"^Попередній підсумок: (.+)$", prompt, re.MULTILINE)
+            topics = re.findall(r"^Користувач: (.+)$", prompt, re.MULTILINE)
+            return " ".join(previous + [f"Обговорювали: {'; '.join(topics)}."])
+        if _DIRECT_MARKER in prompt:
+            return "Це відповідь локальної моделі без документів."
+        return self._extractive_answer(prompt)
+
+    def _extractive_answer(self, prompt: str) -> str:
+        # Echo the start of the retrieved context so answers depend on retrieval.
+        start = prompt.find("[1] ")
+        # The user template ends with "\n\n{query}\n\n<instruction>".
+        end = prompt.rfind("\n\n", 0, prompt.rfind("\n\n"))
+        context = prompt[max(start, 0):end if end > start else None]
+        words: List[str] = []
+        for line in context.splitlines():
+            if not line.strip() or line.startswith("[") or line.strip() == "---":
+                continue
+            words.extend(line.split())
+            if len(words) >= self.params.answer_tokens:
+                break
+        return " ".join(words[: self.params.answer_tokens]) or "Локальна відповідь."
+
+    def _tokens(self, text: str) -> int:
+        return max(1, int(len(text) / self.params.chars_per_token))
+
+    def _account(self, prompt: str, answer: str) -> None:
+        with self._lock:
+            self.input_tokens += self._tokens(prompt)
+            self.output_tokens += self._tokens(answer)
+
+    def _chunks(self, answer: str) -> List[str]:
+        words = answer.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _decode_seconds(self, answer: str) -> float:
+        if self.params.tokens_per_second <= 0:
+            return 0.0
+        return self._tokens(answer) / self.params.tokens_per_second
+
+    def _response(self, prompt: str, answer: str) -> LLMResponse:
+        self._account(prompt, answer)
+        return LLMResponse(answer, self._tokens(prompt), self._tokens(answer))
+
+    def generate(self, prompt: str, config: types.GenerateContentConfig) -> LLMResponse:
+        answer = self._answer(prompt)
+        time.sleep(self.params.first_token_latency_seconds + self._decode_seconds(answer))
+        return self._response(prompt, answer)
+
+    async def agenerate(self, prompt: str, config: types.GenerateContentConfig) -> LLMResponse:
+        answer = self._answer(prompt)
+        await asyncio.sleep(self.params.first_token_latency_seconds + self._decode_seconds(answer))
+        return self._response(prompt, answer)
+
+    def generate_stream(self, prompt: str, config: types.GenerateContentConfig) -> Iterator[str]:
+        answer = self._answer(prompt)
+        chunks = self._chunks(answer)
+        per_chunk = self._decode_seconds(answer) / len(chunks)
+        time.sleep(self.params.first_token_latency_seconds)
+        for chunk in chunks:
+            yield chunk
+            time.sleep(per_chunk)
+        self._account(prompt, answer)
+
+    async def agenerate_stream(self, prompt: str, config: types.GenerateContentConfig) -> AsyncIterator[str]:
+        answer = self._answer(prompt)
+        chunks = self._chunks(answer)
+        per_chunk = self._decode_seconds(answer) / len(chunks)
+        await asyncio.sleep(self.params.first_token_latency_seconds)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(per_chunk)
+        self._account(prompt, answer)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"input_tokens": self.input_tokens, "output_tokens": self.output_tokens}
+
+
+def create_backend(params: LLMParams = LLMParams()) -> LLMBackend:
+    name = os.getenv("LLM_BACKEND", "gemini").lower()
+    if name == "local":
+        local_params = LocalLLMParams(
+            first_token_latency_seconds=float(
+                os.getenv("LOCAL_LLM_LATENCY_SECONDS", LocalLLMParams.first_token_latency_seconds)
+            ),
+            tokens_per_second=float(
+                os.getenv("LOCAL_LLM_TOKENS_PER_SECOND", LocalLLMParams.tokens_per_second)
+            ),
+        )
+        logger.info(
+            f"Локальний LLM backend | latency={local_params.first_token_latency_seconds}s "
+            f"tokens_per_second={local_params.tokens_per_second}"
+        )
+        return LocalLLMBackend(local_params)
+    return GeminiBackend(params)
@@ -1,54 +1,350 @@
-import os
+import asyncio
+import contextvars
 import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
 
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 
-from app.models.parameters import LLMParams
+from app.graph.llm_backends import LLMBackend, LLMResponse, create_backend
+from app.graph.llm_errors import LLMEmptyResponseError, LLMError, classify_error
+from app.models.parameters import LLMParams, LLMResilienceParams
+from app.services.llm_cache import LLMCache, cache_key
+from app.services.rate_limit import InFlightLimiter, LatencyTracker, TokenBucket
+from app.services.telemetry import span
 
 logger = logging.getLogger("LLMClient")
 logger.setLevel(logging.INFO)
 
+T = TypeVar("T")
+
+
+def _approx_tokens(text: str) -> int:
+    # Used only when the backend does not report usage (streaming).
+    return len(text) // 4 + 1
+
 load_dotenv()
 class LLMClient:
-    def __init__(self, params: LLMParams = LLMParams()):
+    def __init__(
+            self,
+            params: LLMParams = LLMParams(),
+            cache: Optional[LLMCache] = None,
+            resilience: LLMResilienceParams = LLMResilienceParams(),
+            backend: Optional[LLMBackend] = None,
+    ):
         self.params = params
-        self.api_key = os.getenv("LLM_API_KEY")
-        if not self.api_key:
-            raise ValueError("LLM_API_KEY не встановлено в середовищі")
-        self.client = genai.Client(api_key=self.api_key)
+        self.cache = cache
+        self.resilience = resilience
+        # LLM_BACKEND=local selects the offline stand-in; Gemini otherwise.
+        self.backend = backend or create_backend(params)
 
-    def generate(
-            self,
-            prompt: str,
-            max_tokens: int | None = None
-    ) -> str:
+        self.rate_limiter = TokenBucket(resilience.requests_per_second, resilience.burst)
+        self.in_flight = InFlightLimiter(resilience.max_in_flight)
+        self.latency = LatencyTracker()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "errors": 0}
+        # Sync calls are hedged from threads: the first attempt and the hedge of each call.
+        self._hedge_executor: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=2 * resilience.max_in_flight, thread_name_prefix="llm-hedge")
+            if resilience.hedge
+            else None
+        )
 
+    def _config(self, max_tokens: int | None) -> types.GenerateContentConfig:
         if max_tokens is None:
             max_tokens = self.params.max_output_tokens
+        return types.GenerateContentConfig(
+            temperature=self.params.temperature,
+            max_output_tokens=max_tokens,
+        )
+
+    def _cache_key(self, prompt: str, max_tokens: int | None) -> Optional[str]:
+        # Only deterministic generations are safe to replay.
+        if self.cache is None or self.params.temperature != 0:
+            return None
+        return cache_key(
+            self.backend.model_name,
+            {
+                "temperature": self.params.temperature,
+                "max_output_tokens": max_tokens or self.params.max_output_tokens,
+            },
+            prompt,
+        )
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
 
+    def _backoff(self, attempt: int) -> float:
+        cap = min(
+            self.resilience.backoff_max_seconds,
+            self.resilience.backoff_base_seconds * 2 ** attempt,
+        )
+        return random.uniform(cap / 2, cap)
+
+    def _should_retry(self, error: LLMError, attempt: int) -> bool:
+        if not error.retryable or attempt >= self.resilience.max_retries:
+            self._count("errors")
+            logger.error(f"LLM error ({type(error).__name__}): {error}")
+            return False
+        self._count("retries")
+        logger.warning(f"LLM retryable error ({type(error).__name__}), attempt {attempt + 1}: {error}")
+        return True
+
+    @staticmethod
+    def _text(response: LLMResponse, attrs: Dict) -> str:
+        attrs["input_tokens"] = response.input_tokens
+        attrs["output_tokens"] = response.output_tokens
+        if not response.text or not response.text.strip():
+            raise LLMEmptyResponseError("Empty response from LLM")
+        return response.text.strip()
+
+    def _attempt(self, prompt: str, max_tokens: int | None, caller: str | None = None) -> str:
+        self.rate_limiter.acquire()
+        self.in_flight.acquire()
+        started = time.perf_counter()
         try:
-            resp = self.client.models.generate_content(
-                model=self.params.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=self.params.temperature,
-                    max_output_tokens=max_tokens,
-                ),
-            )
-            return resp.text.strip()
+            with span("llm.generate", caller=caller, backend=self.backend.model_name) as attrs:
+                text = self._text(self.backend.generate(prompt, self._config(max_tokens)), attrs)
+            self.latency.record(time.perf_counter() - started)
+            return text
+        except LLMError:
+            raise
+        except Exception as e:
+            raise classify_error(e) from e
+        finally:
+            self.in_flight.release()
 
+    async def _aattempt(self, prompt: str, max_tokens: int | None, caller: str | None = None) -> str:
+        await self.rate_limiter.aacquire()
+        await self.in_flight.aacquire()
+        started = time.perf_counter()
+        try:
+            with span("llm.generate", caller=caller, backend=self.backend.model_name) as attrs:
+                text = self._text(await self.backend.agenerate(prompt, self._config(max_tokens)), attrs)
+            self.latency.record(time.perf_counter() - started)
+            return text
+        except LLMError:
+            raise
         except Exception as e:
-            error_msg = str(e).lower()
+            raise classify_error(e) from e
+        finally:
+            self.in_flight.release()
+
+    def _hedge_threshold(self) -> Optional[float]:
+        if not self.resilience.hedge:
+            return None
+        return self.latency.quantile(
+            self.resilience.hedge_quantile,
+            self.resilience.hedge_min_samples,
+        )
+
+    def _submit(self, call: Callable[[], T]) -> Future:
+        # A context per attempt: spans land in the caller's trace, and one context
+        # cannot be entered by two threads at once.
+        return self._hedge_executor.submit(contextvars.copy_context().run, call)
+
+    def _hedged(self, call: Callable[[], T]) -> T:
+        threshold = self._hedge_threshold()
+        if threshold is None:
+            return call()
+        first = self._submit(call)
+        done, _ = wait({first}, timeout=threshold)
+        if done:
+            return first.result()
+
+        self._count("hedges")
+        second = self._submit(call)
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        # Threads cannot be cancelled: the losing attempt finishes in the
+        # background and its result is dropped.
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _ahedged(self, call: Callable[[], Awaitable[T]]) -> T:
+        threshold = self._hedge_threshold()
+        first = asyncio.ensure_future(call())
+        if threshold is None:
+            return await first
 
-            if "quota" in error_msg or "resource exhausted" in error_msg:
-                logger.warning(f"Quota exceeded: {e}")
-                return "Ліміт генерації вичерпано."
+        done, _ = await asyncio.wait({first}, timeout=threshold)
+        if done:
+            return first.result()
 
-            if "invalid" in error_msg and "api" in error_msg:
-                logger.error(f"Invalid API key: {e}")
-                return "Помилка автентифікації."
+        self._count("hedges")
+        second = asyncio.ensure_future(call())
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _call(self, prompt: str, max_tokens: int | None, caller: str | None = None) -> str:
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                return self._hedged(lambda: self._attempt(prompt, max_tokens, caller))
+            except LLMError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def _acall(self, prompt: str, max_tokens: int | None, caller: str | None = None) -> str:
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                return await self._ahedged(lambda: self._aattempt(prompt, max_tokens, caller))
+            except LLMError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    def generate(
+            self,
+            prompt: str,
+            max_tokens: int | None = None,
+            caller: str | None = None
+    ) -> str:
+        """Raises LLMError once retries are exhausted; errors are never cached."""
+        key = self._cache_key(prompt, max_tokens)
+        if key:
+            with span("llm.cache_lookup", caller=caller) as attrs:
+                cached = self.cache.get(key, caller)
+                attrs["hit"] = cached is not None
+            if cached is not None:
+                return cached
+
+        text = self._call(prompt, max_tokens, caller)
+        if key:
+            self.cache.set(key, text)
+        return text
+
+    async def agenerate(
+            self,
+            prompt: str,
+            max_tokens: int | None = None,
+            caller: str | None = None
+    ) -> str:
+        key = self._cache_key(prompt, max_tokens)
+        if key:
+            with span("llm.cache_lookup", caller=caller) as attrs:
+                cached = await asyncio.to_thread(self.cache.get, key, caller)
+                attrs["hit"] = cached is not None
+            if cached is not None:
+                return cached
+
+        text = await self._acall(prompt, max_tokens, caller)
+        if key:
+            await asyncio.to_thread(self.cache.set, key, text)
+        return text
+
+    def generate_stream(
+            self,
+            prompt: str,
+            max_tokens: int | None = None,
+            caller: str | None = None
+    ) -> Iterator[str]:
+        """Retries only until the first token; a later failure ends the stream."""
+        self._count("calls")
+        attempt = 0
+        emitted = False
+        while True:
+            self.rate_limiter.acquire()
+            self.in_flight.acquire()
+            try:
+                with span("llm.stream", caller=caller, backend=self.backend.model_name) as attrs:
+                    started = time.perf_counter()
+                    parts = []
+                    for chunk in self.backend.generate_stream(prompt, self._config(max_tokens)):
+                        if not emitted:
+                            attrs["first_token_seconds"] = time.perf_counter() - started
+                        emitted = True
+                        parts.append(chunk)
+                        yield chunk
+                    attrs["input_tokens"] = _approx_tokens(prompt)
+                    attrs["output_tokens"] = _approx_tokens("".join(parts))
+                return
+            except Exception as e:
+                error = classify_error(e)
+                if emitted:
+                    logger.error(f"LLM stream interrupted: {error}")
+                    return
+                if not self._should_retry(error, attempt):
+                    raise error from e
+            finally:
+                self.in_flight.release()
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def agenerate_stream(
+            self,
+            prompt: str,
+            max_tokens: int | None = None,
+            caller: str | None = None
+    ) -> AsyncIterator[str]:
+        self._count("calls")
+        attempt = 0
+        emitted = False
+        while True:
+            await self.rate_limiter.aacquire()
+            await self.in_flight.aacquire()
+            try:
+                with span("llm.stream", caller=caller, backend=self.backend.model_name) as attrs:
+                    started = time.perf_counter()
+                    parts = []
+                    async for chunk in self.backend.agenerate_stream(prompt, self._config(max_tokens)):
+                        if not emitted:
+                            attrs["first_token_seconds"] = time.perf_counter() - started
+                        emitted = True
+                        parts.append(chunk)
+                        yield chunk
+                    attrs["input_tokens"] = _approx_tokens(prompt)
+                    attrs["output_tokens"] = _approx_tokens("".join(parts))
+                return
+            except Exception as e:
+                error = classify_error(e)
+                # A partial answer is kept as is; the error is only logged.
+                if emitted:
+                    logger.error(f"LLM stream interrupted: {error}")
+                    return
+                if not self._should_retry(error, attempt):
+                    raise error from e
+            finally:
+                self.in_flight.release()
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
 
-            logger.error(f"LLM generation error: {e}")
-            return "Помилка генерації відповіді."
\ No newline at end of file
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["p95_latency_seconds"] = self.latency.quantile(0.95)
+        stats["backend"] = self.backend.model_name
+        if hasattr(self.backend, "get_stats"):
+            stats.update(self.backend.get_stats())
+        return stats
@@ -0,0 +1,70 @@
+from typing import Optional
+
+import httpx
+from google.genai import errors as genai_errors
+
+
+class LLMError(Exception):
+    user_message: str = "Помилка генерації відповіді."
+    retryable: bool = False
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMRateLimitError(LLMError):
+    user_message = "Ліміт генерації вичерпано."
+    retryable = True
+
+
+class LLMAuthError(LLMError):
+    user_message = "Помилка автентифікації."
+
+
+class LLMInvalidRequestError(LLMError):
+    pass
+
+
+class LLMUnavailableError(LLMError):
+    retryable = True
+
+
+class LLMTimeoutError(LLMError):
+    retryable = True
+
+
+class LLMEmptyResponseError(LLMError):
+    pass
+
+
+def classify_error(e: Exception) -> LLMError:
+    if isinstance(e, LLMError):
+        return e
+
+    message = str(e)
+    lowered = message.lower()
+
+    if isinstance(e, genai_errors.APIError):
+        code = e.code
+        if code == 429 or "resource exhausted" in lowered or "quota" in lowered:
+            return LLMRateLimitError(message, code)
+        if code in (401, 403) or ("api key" in lowered and "invalid" in lowered):
+            return LLMAuthError(message, code)
+        if code == 408 or code == 504:
+            return LLMTimeoutError(message, code)
+        if code >= 500:
+            return LLMUnavailableError(message, code)
+        return LLMInvalidRequestError(message, code)
+
+    if isinstance(e, httpx.TimeoutException):
+        return LLMTimeoutError(message)
+    if isinstance(e, httpx.TransportError):
+        return LLMUnavailableError(message)
+
+    # Same heuristics the client used before errors were typed.
+    if "quota" in lowered or "resource exhausted" in lowered:
+        return LLMRateLimitError(message)
+    if "invalid" in lowered and "api" in lowered:
+        return LLMAuthError(message)
+    return LLMError(message)
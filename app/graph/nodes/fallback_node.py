@@ -4,4 +4,7 @@ class FallbackNode:
     def __call__(self, state: Dict) -> Dict:
         state["answer"] = "На жаль, інформації з цього питання немає."
         state["sources"] = []
-        return state
\ No newline at end of file
+        return state
+
+    async def acall(self, state: Dict) -> Dict:
+        return self(state)
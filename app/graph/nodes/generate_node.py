@@ -1,7 +1,12 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 from app.graph.llm_client import LLMClient
-from app.graph.prompts import get_prompt_template
+from app.graph.llm_errors import LLMError
+from app.graph.prompts import HISTORY_TEMPLATE, get_prompt_template
+from app.services.context_compressor import ContextCompressor
+from app.services.context_packer import ContextBlock, ContextPacker
+from app.services.inference import run_inference
 from langchain_core.documents import Document
+from langgraph.config import get_stream_writer
 from app.graph.state_model import GraphState, SourceInfo
 import logging
 
@@ -10,9 +15,16 @@ logger = logging.getLogger("GenerateNode")
 
 class GenerateNode:
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(
+            self,
+            llm_client: LLMClient,
+            context_packer: Optional[ContextPacker] = None,
+            context_compressor: Optional[ContextCompressor] = None,
+    ):
         self.llm_client = llm_client
         self.prompt_template = get_prompt_template()
+        self.context_packer = context_packer
+        self.context_compressor = context_compressor
 
     def _extract_source_info(
             self,
@@ -56,46 +68,61 @@ class GenerateNode:
             logger.warning(f"Невідомий тип елемента на позиції {idx}: {type(item)}")
             return item, None
 
-    def __call__(self, state: GraphState) -> dict:
+    def _context_entries(
+            self,
+            query: str,
+            docs_raw: List,
+    ) -> Tuple[List[Tuple[Document, float, str]], Dict[str, Any]]:
+        """(citation doc, score, context text) per context entry, plus packing stats."""
+        items = [self._convert_to_document(item, idx) for idx, item in enumerate(docs_raw, 1)]
+        compress = self.context_compressor.compress if self.context_compressor else None
+
+        if self.context_packer is not None:
+            packed = self.context_packer.assemble(query, items, compress)
+            entries = [(block.documents[0], block.score, block.text) for block in packed.blocks]
+            return entries, packed.stats
+
+        if compress is None:
+            return [(doc, score, doc.page_content) for doc, score in items], {}
+
+        blocks = [
+            ContextBlock(
+                text=doc.page_content,
+                source=(doc.metadata or {}).get("source", ""),
+                page=(doc.metadata or {}).get("page"),
+                score=score,
+                documents=[doc],
+            )
+            for doc, score in items
+        ]
+        # Citations keep pointing at the original chunk; only the prompt text shrinks.
+        return [(block.documents[0], block.score, block.text) for block in compress(query, blocks)], {}
+
+    def _prepare(self, state: GraphState) -> tuple[str | None, List[SourceInfo], Dict[str, Any]]:
 
         docs_raw = state.get("docs", [])
         query = state["query"]
+        history = state.get("history", "")
+        history_text = HISTORY_TEMPLATE.format(history=history) if history else ""
 
         if not docs_raw and not state.get("need_external_info", True):
             logger.info("Генерація відповіді без зовнішніх документів (загальні знання)")
 
-            prompt = f"""Відповідь на запит користувача на основі загальних знань.
+            prompt = f"""{history_text}Відповідь на запит користувача на основі загальних знань.
 Запит: {query}
 
 Дай чітку та лаконічну відповідь українською мовою:"""
-
-            try:
-                answer = self.llm_client.generate(prompt)
-                logger.info("Відповідь згенеровано без документів")
-                return {
-                    "answer": answer,
-                    "sources": []
-                }
-            except Exception as e:
-                logger.error(f"Помилка генерації без документів: {e}")
-                return {
-                    "answer": "",
-                    "sources": []
-                }
+            return prompt, [], {}
 
         if not docs_raw:
             logger.warning("Документи не надано для генерації")
-            return {
-                "answer": "",
-                "sources": []
-            }
+            return None, [], {}
 
         context_parts = []
         sources_info: List[SourceInfo] = []
+        entries, context_stats = self._context_entries(query, docs_raw)
 
-        for idx, item in enumerate(docs_raw, 1):
-            doc, score = self._convert_to_document(item, idx)
-
+        for idx, (doc, score, text) in enumerate(entries, 1):
             source_info = self._extract_source_info(doc, idx, score)
             sources_info.append(source_info)
 
@@ -105,23 +132,67 @@ class GenerateNode:
             if source_info['section']:
                 source_label += f" - {source_info['section']}"
 
-            context_parts.append(f"{source_label}\n{doc.page_content}")
+            context_parts.append(f"{source_label}\n{text}")
 
         context_text = "\n\n---\n\n".join(context_parts)
 
         prompt = self.prompt_template.format(
+            history=history_text,
             context=context_text,
             query=query
         )
+        return prompt, sources_info, context_stats
+
+    def __call__(self, state: GraphState) -> dict:
+        prompt, sources_info, context_stats = self._prepare(state)
+        if prompt is None:
+            return {"answer": "", "sources": []}
 
         try:
-            answer = self.llm_client.generate(prompt)
+            answer = self.llm_client.generate(prompt, caller="generate")
             logger.info(f"Відповідь згенеровано з {len(sources_info)} джерелами")
-        except Exception as e:
-            logger.error(f"Помилка генерації LLM: {e}")
-            answer = ""
+        except LLMError as e:
+            logger.error(f"Помилка генерації LLM ({type(e).__name__}): {e}")
+            answer = e.user_message
 
         return {
             "answer": answer,
-            "sources": sources_info
-        }
\ No newline at end of file
+            "sources": sources_info,
+            "context_stats": context_stats
+        }
+
+    async def acall(self, state: GraphState) -> dict:
+        # Context packing tokenizes and may embed, so it runs off the event loop.
+        prompt, sources_info, context_stats = await run_inference(self._prepare, state)
+        if prompt is None:
+            return {"answer": "", "sources": []}
+
+        try:
+            if state.get("stream", False):
+                answer = await self._astream_answer(prompt)
+            else:
+                answer = await self.llm_client.agenerate(prompt, caller="generate")
+            logger.info(f"Відповідь згенеровано з {len(sources_info)} джерелами")
+        except LLMError as e:
+            logger.error(f"Помилка генерації LLM ({type(e).__name__}): {e}")
+            answer = e.user_message
+
+        return {
+            "answer": answer,
+            "sources": sources_info,
+            "context_stats": context_stats
+        }
+
+    async def _astream_answer(self, prompt: str) -> str:
+        writer = get_stream_writer()
+        parts: List[str] = []
+        try:
+            async for token in self.llm_client.agenerate_stream(prompt, caller="generate"):
+                parts.append(token)
+                writer({"type": "token", "text": token})
+        except LLMError as e:
+            # Raised only before the first token, so the message is the whole answer.
+            logger.error(f"Помилка потокової генерації LLM ({type(e).__name__}): {e}")
+            writer({"type": "token", "text": e.user_message})
+            return e.user_message
+        return "".join(parts).strip()
@@ -1,21 +1,88 @@
 import logging
+import math
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
 from app.graph.llm_client import LLMClient
+from app.graph.llm_errors import LLMError
 from app.graph.state_model import GraphState
+from app.models.parameters import GradeParams
+from app.services.embedders import CrossEmbedder
+from app.services.inference import run_inference
 
 
 logger = logging.getLogger("GradeNode")
 
 
 class GradeNode:
-    def __init__(self, llm_client: LLMClient):
+    def __init__(
+            self,
+            llm_client: LLMClient,
+            cross_encoder: Optional[CrossEmbedder] = None,
+            params: GradeParams = GradeParams(),
+    ):
         self.llm_client = llm_client
+        self.cross_encoder = cross_encoder
+        self.params = params
 
-    def __call__(self, state: GraphState) -> dict:
+    @property
+    def use_rerank(self) -> bool:
+        return self.params.mode == "rerank" and self.cross_encoder is not None
+
+    def _calibrate(self, score: float) -> float:
+        if self.params.calibration_scale == 1.0 and self.params.calibration_bias == 0.0:
+            return score
+        score = min(max(score, 1e-6), 1 - 1e-6)
+        logit = math.log(score / (1 - score))
+        z = self.params.calibration_scale * logit + self.params.calibration_bias
+        # Split by sign so a steep fitted scale cannot overflow exp().
+        return 1 / (1 + math.exp(-z)) if z >= 0 else math.exp(z) / (1 + math.exp(z))
+
+    def _rerank(self, query: str, docs: List[Document]) -> List[Tuple[Document, float]]:
+        raw_scores = self.cross_encoder.get_scores(query, [d.page_content for d in docs])
+        scored = [
+            (Document(id=d.id, page_content=d.page_content, metadata={**(d.metadata or {}), "score": score}), score)
+            for d, score in zip(docs, map(self._calibrate, raw_scores))
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored
+
+    def _decide(self, scored: List[Tuple[Document, float]]) -> Optional[bool]:
+        """True/False when the scores are decisive, None for the uncertain band."""
+        if not scored:
+            return False
+        top = scored[0][1]
+        if top >= self.params.accept_threshold:
+            return True
+        if top < self.params.reject_threshold:
+            return False
+        supporting = sum(1 for _, score in scored if score >= self.params.support_threshold)
+        if supporting >= self.params.min_supporting_docs:
+            return True
+        return None
+
+    def _rerank_state(self, state: GraphState, scored: List[Tuple[Document, float]]) -> Optional[dict]:
+        state["docs"] = [doc for doc, _ in scored]
+        decision = self._decide(scored)
+        top = scored[0][1] if scored else None
+        if decision is not None:
+            logger.info(f"Оцінка документів (reranker): enough_data = {decision}, top_score = {top}")
+            state["enough_data"] = decision
+            return state
+        logger.info(f"Оцінка документів: невизначена зона (top_score = {top:.3f}) -> LLM")
+        return None
+
+    def _uncertain_docs(self, scored: List[Tuple[Document, float]]) -> List[Document]:
+        # Only docs that could plausibly help are sent to the LLM.
+        return [doc for doc, score in scored if score >= self.params.reject_threshold]
+
+    def _build_prompt(self, state: GraphState, docs: Optional[List[Document]] = None) -> str:
         query = state.get("query", "")
-        docs = state.get("docs", [])
+        docs = state.get("docs", []) if docs is None else docs
         context_preview = " ".join([d.page_content[:] for d in docs]) if docs else "Немає документів"
 
-        prompt = f"""
+        return f"""
 Тобі дано запит користувача та контекст документів. 
 Визнач, чи достатньо наявних документів для відповіді на запит.
 
@@ -27,13 +94,45 @@ class GradeNode:
 - "ТАК" якщо можна відповісти на запит повністю за наявними документами
 - "НІ" якщо інформації недостатньо
 """
+
+    def _parse(self, state: GraphState, response: str) -> dict:
+        enough_data = "так" in response.lower() or "yes" in response.lower()
+        logger.info(f"Оцінка документів: enough_data = {enough_data}")
+        state["enough_data"] = enough_data
+        return state
+
+    def __call__(self, state: GraphState) -> dict:
+        prompt_docs = None
+        if self.use_rerank:
+            scored = self._rerank(state.get("query", ""), state.get("docs", []))
+            result = self._rerank_state(state, scored)
+            if result is not None:
+                return result
+            prompt_docs = self._uncertain_docs(scored)
+
+        prompt = self._build_prompt(state, prompt_docs)
         try:
-            response = self.llm_client.generate(prompt, max_tokens=10)
-            enough_data = "так" in response.lower() or "yes" in response.lower()
-            logger.info(f"Оцінка документів: enough_data = {enough_data}")
-            state["enough_data"] = enough_data
+            response = self.llm_client.generate(prompt, max_tokens=10, caller="grade")
+            return self._parse(state, response)
+        except LLMError as e:
+            logger.error(f"Помилка оцінки документів ({type(e).__name__}): {str(e)}")
+            state["enough_data"] = False
             return state
-        except Exception as e:
-            logger.error(f"Помилка оцінки документів: {str(e)}")
+
+    async def acall(self, state: GraphState) -> dict:
+        prompt_docs = None
+        if self.use_rerank:
+            scored = await run_inference(self._rerank, state.get("query", ""), state.get("docs", []))
+            result = self._rerank_state(state, scored)
+            if result is not None:
+                return result
+            prompt_docs = self._uncertain_docs(scored)
+
+        prompt = self._build_prompt(state, prompt_docs)
+        try:
+            response = await self.llm_client.agenerate(prompt, max_tokens=10, caller="grade")
+            return self._parse(state, response)
+        except LLMError as e:
+            logger.error(f"Помилка оцінки документів ({type(e).__name__}): {str(e)}")
             state["enough_data"] = False
             return state
@@ -4,4 +4,7 @@ from typing import Dict
 class InputNode:
     def __call__(self, state: Dict) -> Dict:
         state["query"] = state.get("input_query", "")
-        return state
\ No newline at end of file
+        return state
+
+    async def acall(self, state: Dict) -> Dict:
+        return self(state)
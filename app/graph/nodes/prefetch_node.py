@@ -0,0 +1,74 @@
+import logging
+import threading
+from typing import Dict
+
+from app.graph.nodes.retrieve_node import RetrieveNode
+
+logger = logging.getLogger("PrefetchNode")
+
+
+class SpeculationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.used = 0
+        self.wasted = 0
+        self.failed = 0
+
+    def record_launch(self) -> None:
+        with self._lock:
+            self.launched += 1
+
+    def record_outcome(self, used: bool) -> None:
+        with self._lock:
+            if used:
+                self.used += 1
+            else:
+                self.wasted += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            decided = self.used + self.wasted
+            return {
+                "launched": self.launched,
+                "used": self.used,
+                "wasted": self.wasted,
+                "failed": self.failed,
+                "wasted_ratio": self.wasted / decided if decided else 0.0,
+            }
+
+
+class PrefetchNode:
+    """Runs retrieval for the original query while QueryAnalysisNode is still deciding."""
+
+    def __init__(self, retrieve_node: RetrieveNode, stats: SpeculationStats):
+        self.retrieve_node = retrieve_node
+        self.stats = stats
+
+    def _result(self, query: str, docs) -> Dict:
+        # Only speculative keys: this node shares a superstep with query_analysis.
+        return {"prefetched_query": query, "prefetched_docs": docs}
+
+    def __call__(self, state: Dict) -> Dict:
+        query = state.get("query", "")
+        self.stats.record_launch()
+        try:
+            return self._result(query, self.retrieve_node.search(query))
+        except Exception as e:
+            logger.warning(f"Спекулятивний пошук не вдався: {e}")
+            self.stats.record_failure()
+            return self._result(None, [])
+
+    async def acall(self, state: Dict) -> Dict:
+        query = state.get("query", "")
+        self.stats.record_launch()
+        try:
+            return self._result(query, await self.retrieve_node.asearch(query))
+        except Exception as e:
+            logger.warning(f"Спекулятивний пошук не вдався: {e}")
+            self.stats.record_failure()
+            return self._result(None, [])
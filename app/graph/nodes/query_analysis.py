@@ -1,5 +1,10 @@
+from typing import Optional
+
 from app.graph.llm_client import LLMClient
+from app.graph.llm_errors import LLMError
 from app.graph.state_model import GraphState
+from app.services.inference import run_inference
+from app.services.query_router import EmbeddingQueryRouter, RouteDecision
 import logging
 
 logger = logging.getLogger("QueryAnalysisNode")
@@ -7,13 +12,12 @@ logger = logging.getLogger("QueryAnalysisNode")
 
 class QueryAnalysisNode:
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, router: Optional[EmbeddingQueryRouter] = None):
         self.llm_client = llm_client
+        self.router = router
 
-    def __call__(self, state: GraphState) -> dict:
-        query = state["query"]
-
-        prompt = f"""Проаналізуй наступний запит і визнач, чи потрібна для нього зовнішня інформація з документів, чи можна відповісти на основі загальних знань.
+    def _build_prompt(self, query: str) -> str:
+        return f"""Проаналізуй наступний запит і визнач, чи потрібна для нього зовнішня інформація з документів, чи можна відповісти на основі загальних знань.
 
 Запит: "{query}"
 
@@ -30,15 +34,84 @@ class QueryAnalysisNode:
 - "Які показники продажів у звіті за Q3?" → ТАК (потрібні документи)
 
 Відповідь:"""
+
+    def _parse(self, response: str) -> dict:
+        need_external = "так" in response.lower() or "yes" in response.lower()
+        logger.info(f"Аналіз запиту: need_external_info = {need_external}")
+        return {
+            "need_external_info": need_external
+        }
+
+    def _classify(self, query: str) -> Optional[RouteDecision]:
+        if self.router is None:
+            return None
         try:
-            response = self.llm_client.generate(prompt, max_tokens=10)
-            need_external = "так" in response.lower() or "yes" in response.lower()
-            logger.info(f"Аналіз запиту: need_external_info = {need_external}")
-            return {
-                "need_external_info": need_external
-            }
+            return self.router.classify(query)
         except Exception as e:
-            logger.error(f"Помилка аналізу запиту: {str(e)}")
-            return {
-                "need_external_info": True
-            }
\ No newline at end of file
+            logger.error(f"Помилка локального роутера: {str(e)}")
+            return None
+
+    def _local_result(self, query: str, decision: Optional[RouteDecision]) -> Optional[dict]:
+        """Returns the classifier's answer when it can skip the LLM call."""
+        if decision is None or not decision.confident:
+            return None
+        logger.info(
+            f"Аналіз запиту (локальний роутер): need_external_info = {decision.need_external_info}, "
+            f"margin = {decision.margin:.3f}"
+        )
+        self.router.log_decision(query, decision.need_external_info, "embedding", decision.margin)
+        return {"need_external_info": decision.need_external_info}
+
+    def _llm_result(self, query: str, decision: Optional[RouteDecision], result: Optional[dict]) -> dict:
+        if result is None:
+            # LLM failed: the fallback is not a label, so it is neither logged for
+            # retraining nor counted as a shadow disagreement.
+            if decision is not None and decision.confident:
+                return {"need_external_info": decision.need_external_info}
+            return {"need_external_info": True}
+        if self.router is None:
+            return result
+        if decision is not None and decision.confident:
+            self.router.record_shadow(decision, result["need_external_info"])
+            return {"need_external_info": decision.need_external_info}
+        self.router.log_decision(
+            query,
+            result["need_external_info"],
+            "llm",
+            decision.margin if decision else None,
+        )
+        return result
+
+    def _analyze(self, prompt: str) -> Optional[dict]:
+        try:
+            response = self.llm_client.generate(prompt, max_tokens=10, caller="query_analysis")
+            return self._parse(response)
+        except LLMError as e:
+            logger.error(f"Помилка аналізу запиту ({type(e).__name__}): {str(e)}")
+            return None
+
+    async def _aanalyze(self, prompt: str) -> Optional[dict]:
+        try:
+            response = await self.llm_client.agenerate(prompt, max_tokens=10, caller="query_analysis")
+            return self._parse(response)
+        except LLMError as e:
+            logger.error(f"Помилка аналізу запиту ({type(e).__name__}): {str(e)}")
+            return None
+
+    def __call__(self, state: GraphState) -> dict:
+        query = state["query"]
+        decision = self._classify(query)
+        shadow = self.router is not None and self.router.should_shadow()
+        local = self._local_result(query, decision)
+        if local is not None and not shadow:
+            return local
+        return self._llm_result(query, decision, self._analyze(self._build_prompt(query)))
+
+    async def acall(self, state: GraphState) -> dict:
+        query = state["query"]
+        decision = await run_inference(self._classify, query)
+        shadow = self.router is not None and self.router.should_shadow()
+        local = self._local_result(query, decision)
+        if local is not None and not shadow:
+            return local
+        return self._llm_result(query, decision, await self._aanalyze(self._build_prompt(query)))
@@ -1,14 +1,90 @@
-from typing import Dict
-from app.services.vector_storage import VectorMemory
-from app.models.parameters import SearchParameters
+import asyncio
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+from app.services.inference import run_inference
+from app.services.vector_storage import VectorMemory, reciprocal_rank_fusion
+from app.models.parameters import MultiQueryParams, SearchParameters
 
 class RetrieveNode:
-    def __init__(self, vector_memory: VectorMemory):
+    def __init__(self, vector_memory: VectorMemory, multi_query_params: MultiQueryParams = MultiQueryParams()):
         self.vector_memory = vector_memory
+        self.multi_query_params = multi_query_params
+
+    def _params(self, query: str) -> SearchParameters:
+        return SearchParameters(query=query, top_k_retrieve=5)
+
+    @staticmethod
+    def _unwrap(docs) -> List[Document]:
+        # search() returns SearchHit; the graph state carries plain Documents.
+        unwrapped = []
+        for doc in docs:
+            if isinstance(doc, tuple):
+                doc = doc[1]
+            if hasattr(doc, "document"):
+                document = doc.document
+                if doc.score is not None:
+                    document.metadata = {**(document.metadata or {}), "score": doc.score}
+                doc = document
+            unwrapped.append(doc)
+        return unwrapped
+
+    def search(self, query: str) -> List[Document]:
+        return self._unwrap(self.vector_memory.search(self._params(query)))
+
+    async def asearch(self, query: str) -> List[Document]:
+        docs = await run_inference(self.vector_memory.search, self._params(query))
+        return self._unwrap(docs)
+
+    def _fuse(self, rankings) -> List[Document]:
+        return reciprocal_rank_fusion(
+            [self._unwrap(ranking) for ranking in rankings],
+            k=self.multi_query_params.rrf_k,
+            limit=self.multi_query_params.fused_top_k,
+        )
+
+    def search_many(self, queries: List[str]) -> List[Document]:
+        top_k = self.multi_query_params.top_k_per_query
+        if hasattr(self.vector_memory, "search_many"):
+            rankings = self.vector_memory.search_many(queries, top_k)
+        else:
+            rankings = [self.vector_memory.search(SearchParameters(query=q, top_k_retrieve=top_k)) for q in queries]
+        return self._fuse(rankings)
+
+    async def asearch_many(self, queries: List[str]) -> List[Document]:
+        top_k = self.multi_query_params.top_k_per_query
+        if hasattr(self.vector_memory, "search_many"):
+            # Queries are embedded in one batch and searched in one pass.
+            rankings = await run_inference(self.vector_memory.search_many, queries, top_k)
+        else:
+            rankings = await asyncio.gather(*(
+                run_inference(self.vector_memory.search, SearchParameters(query=q, top_k_retrieve=top_k))
+                for q in queries
+            ))
+        return self._fuse(rankings)
+
+    @staticmethod
+    def _prefetched(state: Dict):
+        # Speculative results are only valid for the query they were fetched for.
+        if state.get("prefetched_query") == state.get("query", ""):
+            return state.get("prefetched_docs")
+        return None
 
     def __call__(self, state: Dict) -> Dict:
-        query = state.get("query", "")
-        params = SearchParameters(query=query, top_k_retrieve=5)
-        docs = self.vector_memory.search(params)
-        state["docs"] = [doc[1] if isinstance(doc, tuple) else doc for doc in docs]
+        queries = state.get("queries") or []
+        if len(queries) > 1:
+            state["docs"] = self.search_many(queries)
+            return state
+        docs = self._prefetched(state)
+        state["docs"] = docs if docs is not None else self.search(state.get("query", ""))
+        return state
+
+    async def acall(self, state: Dict) -> Dict:
+        queries = state.get("queries") or []
+        if len(queries) > 1:
+            state["docs"] = await self.asearch_many(queries)
+            return state
+        docs = self._prefetched(state)
+        state["docs"] = docs if docs is not None else await self.asearch(state.get("query", ""))
         return state
@@ -1,22 +1,34 @@
 from app.graph.llm_client import LLMClient
+from app.graph.llm_errors import LLMError
 from app.graph.state_model import GraphState
 import logging
+import re
 
 logger = logging.getLogger("RewriteQueryNode")
 
 
 class RewriteQueryNode:
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, num_rewrites: int = 1):
         self.llm_client = llm_client
+        self.num_rewrites = num_rewrites
 
-    def __call__(self, state: GraphState) -> dict:
+    def _build_prompt(self, state: GraphState) -> str:
         original_query = state["input_query"]
         current_query = state["query"]
 
-        logger.info(f"Rewriting query (attempt {state['rewrite_attempts'] + 1})")
+        if self.num_rewrites > 1:
+            return f"""Перефразуй наступний запит у {self.num_rewrites} різних варіантах для семантичного пошуку в базі документів.
+
+Оригінальний запит: "{original_query}"
+Поточний запит: "{current_query}"
+
+Варіанти мають відрізнятися формулюванням і ключовими словами: синоніми, розшифровані скорочення, конкретніші терміни.
+Відповідай ЛИШЕ варіантами, кожен з нового рядка, без нумерації.
 
-        prompt = f"""Перефразуй наступний запит, щоб зробити його більш ефективним для семантичного пошуку в базі документів.
+Варіанти:"""
+
+        return f"""Перефразуй наступний запит, щоб зробити його більш ефективним для семантичного пошуку в базі документів.
 
 Оригінальний запит: "{original_query}"
 Поточний запит: "{current_query}"
@@ -25,18 +37,55 @@ class RewriteQueryNode:
 Відповідай ЛИШЕ переформульованим запитом, нічого іншого.
 
 Переформульований запит:"""
+
+    def _parse_many(self, state: GraphState, response: str) -> dict:
+        rewrites = []
+        for line in response.splitlines():
+            line = re.sub(r"^\s*(\d+[.)]|[-*•])\s*", "", line).strip().strip('"')
+            if line and line not in rewrites:
+                rewrites.append(line)
+        rewrites = rewrites[: self.num_rewrites] or [state["input_query"]]
+        logger.info(f"Query rewritten into {len(rewrites)} variants: {rewrites}")
+        return {
+            "query": rewrites[0],
+            # The original query is searched again and fused with the rewrites.
+            "queries": list(dict.fromkeys([state["input_query"], *rewrites])),
+            "rewrite_attempts": 1
+        }
+
+    def _parse(self, state: GraphState, response: str) -> dict:
+        if self.num_rewrites > 1:
+            return self._parse_many(state, response)
+        rewritten_query = response.strip()
+        if not rewritten_query:
+            rewritten_query = state["input_query"]
+        logger.info(f"Query rewritten: '{state['query']}' -> '{rewritten_query}'")
+        return {
+            "query": rewritten_query,
+            "rewrite_attempts": 1
+        }
+
+    def _fallback(self, state: GraphState, e: LLMError) -> dict:
+        logger.error(f"Query rewrite failed ({type(e).__name__}): {str(e)}")
+        query = f"{state['query']} пояснення визначення опис"
+        return {
+            "query": query,
+            "queries": [state["input_query"], query] if self.num_rewrites > 1 else [],
+            "rewrite_attempts": 1
+        }
+
+    def __call__(self, state: GraphState) -> dict:
+        logger.info(f"Rewriting query (attempt {state['rewrite_attempts'] + 1})")
+        prompt = self._build_prompt(state)
+        try:
+            return self._parse(state, self.llm_client.generate(prompt, caller="rewrite"))
+        except LLMError as e:
+            return self._fallback(state, e)
+
+    async def acall(self, state: GraphState) -> dict:
+        logger.info(f"Rewriting query (attempt {state['rewrite_attempts'] + 1})")
+        prompt = self._build_prompt(state)
         try:
-            rewritten_query = self.llm_client.generate(prompt).strip()
-            if not rewritten_query:
-                rewritten_query = original_query
-            logger.info(f"Query rewritten: '{current_query}' -> '{rewritten_query}'")
-            return {
-                "query": rewritten_query,
-                "rewrite_attempts": 1
-            }
-        except Exception as e:
-            logger.error(f"Query rewrite failed: {str(e)}")
-            return {
-                "query": f"{current_query} пояснення визначення опис",
-                "rewrite_attempts": 1
-            }
\ No newline at end of file
+            return self._parse(state, await self.llm_client.agenerate(prompt, caller="rewrite"))
+        except LLMError as e:
+            return self._fallback(state, e)
\ No newline at end of file
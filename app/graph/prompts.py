@@ -13,7 +13,12 @@ SYSTEM_PROMPT = """Ти — експертний AI-асистент з глиб
 - Відповідай природно, ніби володієш усією необхідною інформацією.
 """
 
-USER_PROMPT_TEMPLATE = """{context}
+HISTORY_TEMPLATE = """Попередня розмова з користувачем:
+{history}
+
+"""
+
+USER_PROMPT_TEMPLATE = """{history}{context}
 
 {query}
 
@@ -21,6 +26,6 @@ USER_PROMPT_TEMPLATE = """{context}
 
 def get_prompt_template() -> PromptTemplate:
     return PromptTemplate(
-        input_variables=["context", "query"],
+        input_variables=["history", "context", "query"],
         template=f"{SYSTEM_PROMPT}\n\n{USER_PROMPT_TEMPLATE}",
     )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List, Annotated, Dict, Any
+from typing import List, Annotated, Dict, Any, Optional
 
 from langchain_core.messages import AnyMessage
 from langgraph.graph import add_messages
@@ -23,4 +23,11 @@ class GraphState(TypedDict):
     sources: List[SourceInfo]
     rewrite_attempts: Annotated[int, lambda x, y: x + y]
     messages: Annotated[List[AnyMessage], add_messages]
-    enough_data: bool
\ No newline at end of file
+    enough_data: bool
+    need_external_info: bool
+    stream: bool
+    prefetched_query: Optional[str]
+    prefetched_docs: List[Document]
+    context_stats: Dict[str, Any]
+    history: str
+    queries: List[str]
\ No newline at end of file
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import os
+import signal
+
+from dotenv import load_dotenv
+
+from app.models.parameters import BiEncoderParams, CrossEncoderParams, InferenceSidecarParams
+from app.services.embedders import create_bi_embedder, create_cross_encoder
+from app.services.inference_sidecar import InferenceSidecarServer
+from app.services.telemetry import configure_logging
+
+configure_logging()
+
+logger = logging.getLogger("InferenceServer")
+
+
+async def serve(server: InferenceSidecarServer) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+    await server.serve(stop)
+
+
+def main() -> None:
+    load_dotenv()
+
+    # The sidecar owns the real models; EMBEDDER_BACKEND=sidecar is meant for its clients.
+    backend = "stub" if os.getenv("EMBEDDER_BACKEND", "hf").lower() == "stub" else "hf"
+    bi_embedder = create_bi_embedder(BiEncoderParams(), backend=backend)
+    cross_encoder = create_cross_encoder(CrossEncoderParams(), backend=backend)
+    bi_embedder.warm_up()
+    cross_encoder.warm_up()
+
+    params = InferenceSidecarParams(
+        socket_path=os.getenv("INFERENCE_SOCKET", InferenceSidecarParams.socket_path),
+        max_batch_size=int(os.getenv("SIDECAR_MAX_BATCH", str(InferenceSidecarParams.max_batch_size))),
+        max_wait_ms=float(os.getenv("SIDECAR_MAX_WAIT_MS", str(InferenceSidecarParams.max_wait_ms))),
+        batch_max_wait_ms=float(
+            os.getenv("SIDECAR_BATCH_MAX_WAIT_MS", str(InferenceSidecarParams.batch_max_wait_ms))
+        ),
+    )
+    logger.info("Inference server starting | backend=%s", backend)
+    asyncio.run(serve(InferenceSidecarServer(bi_embedder, cross_encoder, params)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import logging
+import os
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+from app.models.parameters import (
+    BatchWorker,
+    BiEncoderParams,
+    BulkIngestParams,
+    ChunkingParameters,
+    CrossEncoderParams,
+    JobQueueParams,
+    SharedIndexParams,
+)
+from app.services.documents_parser import DBNParser
+from app.services.embedders import create_bi_embedder, create_cross_encoder
+from app.services.ingestion import register_ingestion_jobs
+from app.services.job_queue import JobQueue
+from app.services.shared_index import SharedIndexWriter
+from app.services.telemetry import configure_logging
+from app.services.vector_storage import VectorMemory
+
+configure_logging()
+
+logger = logging.getLogger("IngestWorker")
+
+
+def main() -> None:
+    load_dotenv()
+
+    vector_memory = VectorMemory(
+        bi_embedder=create_bi_embedder(BiEncoderParams()),
+        cross_encoder=create_cross_encoder(CrossEncoderParams()),
+        persist_path=os.getenv("CHROMA_PERSIST_DIR", "./data/chroma_index"),
+    )
+    parser = DBNParser(ChunkingParameters(), BatchWorker())
+
+    job_queue = JobQueue(
+        JobQueueParams(
+            db_path=os.getenv("JOBS_DB_PATH", JobQueueParams.db_path),
+            num_workers=int(os.getenv("INGEST_WORKERS", "1")),
+        )
+    )
+    register_ingestion_jobs(
+        job_queue,
+        parser,
+        vector_memory,
+        BulkIngestParams(
+            num_workers=int(
+                os.getenv("BULK_INGEST_WORKERS", str(BulkIngestParams.num_workers))
+            ),
+        ),
+    )
+
+    writer = SharedIndexWriter(
+        vector_memory,
+        SharedIndexParams(root=os.getenv("SHARED_INDEX_DIR", SharedIndexParams.root)),
+    )
+    job_queue.add_listener(
+        lambda job, status: writer.mark_dirty() if status == "succeeded" else None
+    )
+
+    writer.publish()
+    writer.start()
+    job_queue.start()
+    logger.info("Ingest worker started")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    stop.wait()
+
+    job_queue.stop()
+    writer.stop()
+    logger.info("Ingest worker stopped")
+
+
+if __name__ == "__main__":
+    main()
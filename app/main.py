@@ -1,22 +1,45 @@
+from contextlib import asynccontextmanager
+import os
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import logging
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from app.routers.vdb_crud import router as vector_memory_router
-from app.routers.agent import router as agent_router
+from app.services.telemetry import REGISTRY, TraceMiddleware, configure_logging
+from app.services.uploads import RequestSizeLimitMiddleware
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Before the routers: they build models and agents at import time and log it.
+configure_logging()
+
+from app.routers.vdb_crud import router as vector_memory_router, job_queue, readiness, RAG_MODE, UPLOAD_PARAMS
+from app.routers.agent import router as agent_router, session_store, query_router
+from app.routers.jobs import router as jobs_router
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load in the background; the app serves /health and /ready meanwhile.
+    readiness.start()
+    # In reader mode ingestion is owned by `python -m app.ingest_worker`.
+    if RAG_MODE != "reader":
+        job_queue.start()
+    session_store.start()
+    yield
+    session_store.stop()
+    if query_router is not None:
+        query_router.stop()
+    job_queue.stop()
+    readiness.stop()
+
+
 app = FastAPI(
     title="Agentic RAG API",
     description="RAG system with LangGraph agent",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -25,7 +48,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+# X-Debug-Trace: 1 writes the request's span tree to TRACE_DIR.
+app.add_middleware(TraceMiddleware, trace_dir=os.getenv("TRACE_DIR", "./data/traces"))
+# Oversized uploads get 413 before Starlette spools the whole body to disk.
+app.add_middleware(RequestSizeLimitMiddleware, params=UPLOAD_PARAMS)
 
 
 @app.get("/health")
@@ -35,6 +63,19 @@ async def health_check():
         "service": "agentic-rag-api"
     }
 
+
+@app.get("/ready")
+async def ready():
+    # 503 until the encoders have run a forward pass and the index is open.
+    snapshot = readiness.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     return {
@@ -45,6 +86,7 @@ async def root():
 
 app.include_router(router=vector_memory_router)
 app.include_router(router=agent_router)
+app.include_router(router=jobs_router)
 
 if __name__ == "__main__":
     import uvicorn
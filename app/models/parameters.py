@@ -1,6 +1,5 @@
 from dataclasses import dataclass, field
 from typing import List, Optional
-import torch
 
 from langchain_core.documents import Document
 
@@ -22,9 +21,8 @@ class ChunkingParameters:
 @dataclass
 class BiEncoderParams:
     model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
-    device: Optional[str] = field(
-        default_factory=lambda: "cuda" if torch.cuda.is_available() else "cpu"
-    )
+    # None: cuda when available, else cpu (resolved by the encoder, so this module does not import torch).
+    device: Optional[str] = None
     max_length: int = 512
     normalize: bool = True
 
@@ -32,12 +30,52 @@ class BiEncoderParams:
 @dataclass
 class CrossEncoderParams:
     model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
-    device: Optional[str] = field(
-        default_factory=lambda: "cuda" if torch.cuda.is_available() else "cpu"
-    )
+    # None: cuda when available, else cpu.
+    device: Optional[str] = None
     max_length: int = 512
 
 
+@dataclass
+class InferenceSidecarParams:
+    socket_path: str = "./data/inference.sock"
+    # Requests from all clients that arrive while a batch is forming (or running)
+    # are merged into one forward pass of up to max_batch_size items.
+    max_batch_size: int = 64
+    max_wait_ms: float = 2.0
+    # Batch-class (ingestion) requests wait while interactive ones are queued,
+    # but not longer than this.
+    batch_max_wait_ms: float = 5000.0
+    rerank_batch_size: int = 32
+    # Largest accepted frame; guards the server against a corrupt length prefix.
+    max_frame_bytes: int = 256 * 1024 ** 2
+    connect_timeout_seconds: float = 5.0
+    request_timeout_seconds: float = 120.0
+
+
+@dataclass
+class InferenceSchedulerParams:
+    # Torch intra-op threads for each priority class; 0 keeps the torch default.
+    interactive_threads: int = 0
+    batch_threads: int = 0
+    # Batch (ingestion) micro-batches that may run at the same time.
+    batch_max_concurrency: int = 1
+    # Fraction of wall time batch micro-batches may keep a slot busy; 1.0 disables throttling.
+    batch_duty_cycle: float = 1.0
+    # Batch work resumes this long after the last interactive request finished.
+    batch_resume_delay_ms: float = 50.0
+    # A micro-batch held back longer than this runs anyway, so ingestion cannot starve.
+    batch_max_wait_ms: float = 5000.0
+
+
+@dataclass
+class StubEncoderParams:
+    # Hashed bag-of-words vectors: no weights to download, same output in every process.
+    dim: int = 384
+    # Simulated forward-pass cost, so load tests still see encoder queueing.
+    seconds_per_batch: float = 0.0
+    seconds_per_item: float = 0.0
+
+
 # @dataclass
 # class LLMSummarizerParams:
 #     model_name: str = "gpt-4o-mini"
@@ -64,6 +102,16 @@ class SearchParameters:
     rerank_threshold: float = 0.2
 
 
+@dataclass
+class MultiQueryParams:
+    # Rewrites produced by one LLM call; the original query is searched too.
+    num_rewrites: int = 3
+    top_k_per_query: int = 5
+    # Reciprocal rank fusion constant and the number of fused docs kept.
+    rrf_k: int = 60
+    fused_top_k: int = 8
+
+
 @dataclass
 class LLMParams:
     model_name: str = "gemini-2.5-flash"
@@ -74,4 +122,168 @@ class LLMParams:
 @dataclass
 class SearchHit:
     document: Document
-    score: Optional[float] = None
\ No newline at end of file
+    score: Optional[float] = None
+
+@dataclass
+class IngestStats:
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    def merge(self, other: "IngestStats") -> "IngestStats":
+        return IngestStats(
+            added=self.added + other.added,
+            removed=self.removed + other.removed,
+            unchanged=self.unchanged + other.unchanged,
+        )
+
+
+@dataclass
+class JobQueueParams:
+    db_path: str = "./data/jobs.sqlite3"
+    num_workers: int = 1
+    max_retries: int = 2
+    retry_backoff_seconds: float = 5.0
+    poll_interval_seconds: float = 0.5
+
+
+@dataclass
+class UploadParams:
+    upload_dir: str = "tmp/uploads"
+    max_bytes: int = 2 * 1024 ** 3
+    chunk_size: int = 1024 * 1024
+    # Allowance for multipart headers and boundaries when the whole request
+    # body is checked against max_bytes.
+    request_overhead_bytes: int = 1024 * 1024
+
+
+@dataclass
+class BulkIngestParams:
+    num_workers: int = 4
+    write_batch_chunks: int = 2048
+    max_pending_files: int = 16
+    # Decompressed size limits for archive members, checked against the
+    # declared size and again while extracting.
+    max_member_bytes: int = 256 * 1024 * 1024
+    max_archive_bytes: int = 4 * 1024 * 1024 * 1024
+
+
+@dataclass
+class SharedIndexParams:
+    root: str = "./data/shared_index"
+    keep_generations: int = 2
+    export_batch_size: int = 5000
+    min_publish_interval_seconds: float = 2.0
+
+
+@dataclass
+class QueryRouterParams:
+    examples_path: str = "./data/query_router/examples.json"
+    decision_log_path: str = "./data/query_router/decisions.jsonl"
+    # Minimum cosine-similarity margin between the two centroids.
+    min_margin: float = 0.04
+    min_examples_per_label: int = 3
+    # Share of confident decisions also checked by the LLM to track accuracy.
+    shadow_sample_rate: float = 0.02
+    # decisions.jsonl is rotated to decisions.jsonl.1 at this size, so at most
+    # twice this much query text is kept on disk.
+    decision_log_max_bytes: int = 10 * 1024 * 1024
+    # Decisions waiting for the background writer; further ones are dropped.
+    decision_log_queue_size: int = 1000
+
+
+@dataclass
+class GradeParams:
+    # "llm" always asks the LLM; "rerank" (opt-in) decides from cross-encoder scores
+    # and asks the LLM only in the uncertain band.
+    mode: str = "llm"
+    # Top score at or above accept_threshold -> enough data without the LLM.
+    accept_threshold: float = 0.7
+    # Top score below reject_threshold -> not enough data without the LLM.
+    reject_threshold: float = 0.1
+    # Scores in between are accepted outright only if at least
+    # min_supporting_docs docs reach support_threshold.
+    support_threshold: float = 0.4
+    min_supporting_docs: int = 2
+    # Platt scaling applied to the cross-encoder logit before thresholding; the
+    # identity default leaves raw sigmoid scores (fit with benchmarks.grade_calibration).
+    calibration_scale: float = 1.0
+    calibration_bias: float = 0.0
+
+
+@dataclass
+class ContextPackerParams:
+    # Prompt budget for retrieved context, in tokenizer tokens.
+    token_budget: int = 3000
+    # HF tokenizer used to count tokens; None reuses the bi-encoder's tokenizer.
+    tokenizer_name: Optional[str] = None
+    # Shortest suffix/prefix match treated as chunk overlap when merging.
+    min_overlap_chars: int = 20
+    mmr_lambda: float = 0.7
+    # Blocks at least this similar to an already selected block are dropped.
+    duplicate_threshold: float = 0.92
+    # A block that does not fit is truncated only if this many tokens remain.
+    min_block_tokens: int = 64
+
+
+@dataclass
+class ContextCompressorParams:
+    # Sentences kept across all blocks, before neighbours are added.
+    max_sentences: int = 12
+    # Sentences kept on each side of a selected sentence.
+    neighbors: int = 1
+    # Blocks with this many sentences or fewer are kept whole.
+    min_block_sentences: int = 3
+    batch_size: int = 64
+    # Longer sentences are cut for scoring only; the kept text is unchanged.
+    max_sentence_chars: int = 500
+
+
+@dataclass
+class LLMCacheParams:
+    db_path: str = "./data/llm_cache.sqlite3"
+    max_bytes: int = 64 * 1024 ** 2
+    # Entries older than this are ignored and purged; None keeps them until evicted.
+    ttl_seconds: Optional[float] = None
+
+
+@dataclass
+class LLMResilienceParams:
+    max_in_flight: int = 8
+    # Token bucket; requests_per_second <= 0 disables rate limiting.
+    requests_per_second: float = 5.0
+    burst: int = 10
+    max_retries: int = 3
+    backoff_base_seconds: float = 0.5
+    backoff_max_seconds: float = 8.0
+    # Fire a second request when the first runs longer than the latency quantile.
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+
+
+@dataclass
+class LocalLLMParams:
+    model_name: str = "local-stub"
+    # Simulated time to first token and decoding speed.
+    first_token_latency_seconds: float = 0.3
+    tokens_per_second: float = 60.0
+    answer_tokens: int = 120
+    # Rough chars-per-token ratio used for prompt/answer token counts.
+    chars_per_token: float = 4.0
+
+
+@dataclass
+class SessionParams:
+    max_sessions: int = 1000
+    # Sessions idle longer than this are evicted (and deleted from disk).
+    idle_ttl_seconds: float = 3600.0
+    eviction_interval_seconds: float = 60.0
+    # Approximate tokens of summary + turns before old turns are summarized.
+    history_token_budget: int = 1500
+    # Most recent turns always kept verbatim.
+    keep_recent_turns: int = 3
+    max_answer_chars: int = 1000
+    max_summary_chars: int = 2000
+    # SQLite file for persistence; None keeps sessions in memory only.
+    db_path: Optional[str] = None
@@ -1,27 +1,171 @@
-from fastapi import APIRouter, HTTPException
+from contextlib import contextmanager
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+import json
 import logging
-from typing import Dict, Optional
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
 
+from app.graph.agent_memory import LLMSummarizer, SessionStore
 from app.graph.agent_rag import RAGAgent
-from app.schemas.rag import RAGQueryRequest, RAGQueryResponse, SourceInfoResponse
+from app.graph.llm_client import LLMClient
+from app.graph.nodes.prefetch_node import SpeculationStats
+from app.models.parameters import (
+    ContextPackerParams,
+    GradeParams,
+    LLMCacheParams,
+    LLMResilienceParams,
+    MultiQueryParams,
+    SessionParams,
+)
+from app.services.context_compressor import ContextCompressor
+from app.services.context_packer import ContextPacker
+from app.services.inference_scheduler import get_inference_scheduler
+from app.services.llm_cache import LLMCache
+from app.services.query_router import EmbeddingQueryRouter
+from app.services.telemetry import Trace, current_trace, start_trace, summarize_trace
+from app.routers.vdb_crud import readiness, vector_memory
+from app.schemas.rag import RAGQueryRequest, RAGQueryResponse, RequestTimings, SourceInfoResponse
 
 logger = logging.getLogger("AgentRouter")
 
 router = APIRouter(prefix="/agent", tags=["Agent"])
 
-agents: Dict[str, RAGAgent] = {}
+LLM_CACHE = os.getenv("LLM_CACHE", "1") == "1"
+llm_cache: Optional[LLMCache] = (
+    LLMCache(
+        LLMCacheParams(
+            db_path=os.getenv("LLM_CACHE_PATH", LLMCacheParams.db_path),
+            max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", LLMCacheParams.max_bytes)),
+            ttl_seconds=float(os.environ["LLM_CACHE_TTL_SECONDS"]) if os.getenv("LLM_CACHE_TTL_SECONDS") else None,
+        )
+    )
+    if LLM_CACHE
+    else None
+)
+# One client for all sessions: the cache and the HTTP connection pool are shared.
+llm_client = LLMClient(
+    cache=llm_cache,
+    resilience=LLMResilienceParams(
+        max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", LLMResilienceParams.max_in_flight)),
+        requests_per_second=float(os.getenv("LLM_REQUESTS_PER_SECOND", LLMResilienceParams.requests_per_second)),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", LLMResilienceParams.max_retries)),
+        hedge=os.getenv("LLM_HEDGE", "0") == "1",
+    ),
+)
+
+MULTI_QUERY = os.getenv("MULTI_QUERY", "0") == "1"
+MULTI_QUERY_PARAMS = MultiQueryParams(
+    num_rewrites=int(os.getenv("MULTI_QUERY_REWRITES", MultiQueryParams.num_rewrites)),
+)
+
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "0") == "1"
+speculation_stats = SpeculationStats()
+
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "1") == "1"
+query_router: Optional[EmbeddingQueryRouter] = (
+    EmbeddingQueryRouter(vector_memory.bi_embedder) if QUERY_ROUTER else None
+)
+
+
+CONTEXT_PACKER = os.getenv("CONTEXT_PACKER", "1") == "1"
+context_packer: Optional[ContextPacker] = (
+    ContextPacker(
+        vector_memory.bi_embedder,
+        vector_memory,
+        ContextPackerParams(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", ContextPackerParams.token_budget)),
+        ),
+    )
+    if CONTEXT_PACKER
+    else None
+)
+
+if query_router is not None:
+    readiness.register("query_router", query_router.warm_up)
+if context_packer is not None:
+    readiness.register("context_packer", context_packer.warm_up)
+
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "0") == "1"
+context_compressor: Optional[ContextCompressor] = (
+    ContextCompressor(vector_memory.bi_embedder) if CONTEXT_COMPRESSION else None
+)
 
-default_agent = RAGAgent(max_rewrite_attempts=1)
+GRADE_PARAMS = GradeParams(
+    mode=os.getenv("GRADE_MODE", GradeParams.mode),
+    accept_threshold=float(os.getenv("GRADE_ACCEPT_THRESHOLD", GradeParams.accept_threshold)),
+    reject_threshold=float(os.getenv("GRADE_REJECT_THRESHOLD", GradeParams.reject_threshold)),
+    # Fitted with `python -m benchmarks.grade_calibration` on labeled queries.
+    calibration_scale=float(os.getenv("GRADE_CALIBRATION_SCALE", GradeParams.calibration_scale)),
+    calibration_bias=float(os.getenv("GRADE_CALIBRATION_BIAS", GradeParams.calibration_bias)),
+)
+
+
+def create_agent() -> RAGAgent:
+    return RAGAgent(
+        max_rewrite_attempts=1,
+        vector_memory=vector_memory,
+        speculative_retrieval=SPECULATIVE_RETRIEVAL,
+        speculation_stats=speculation_stats,
+        query_router=query_router,
+        grade_params=GRADE_PARAMS,
+        context_packer=context_packer,
+        context_compressor=context_compressor,
+        llm_client=llm_client,
+        multi_query=MULTI_QUERY,
+        multi_query_params=MULTI_QUERY_PARAMS,
+    )
+
+
+# Agents hold no per-session state, so one graph serves every session;
+# conversation history lives in the bounded session store.
+default_agent = create_agent()
 logger.info("Default RAGAgent initialized")
 
+session_store = SessionStore(
+    SessionParams(
+        max_sessions=int(os.getenv("SESSION_MAX", SessionParams.max_sessions)),
+        idle_ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", SessionParams.idle_ttl_seconds)),
+        history_token_budget=int(os.getenv("SESSION_HISTORY_TOKENS", SessionParams.history_token_budget)),
+        db_path=os.getenv("SESSION_DB_PATH") or None,
+    ),
+    summarizer=LLMSummarizer(llm_client),
+)
+
+
+def remember_turn(session_id: Optional[str], query: str, result: Dict[str, Any]) -> None:
+    sources = [src.get("source") for src in result.get("sources", []) if isinstance(src, dict)]
+    session_store.add_turn(session_id, query, result.get("answer", ""), sources)
+
+
+def remember_streamed_turn(session_id: Optional[str], query: str, turn: Dict[str, Any]) -> None:
+    if "result" in turn:
+        remember_turn(session_id, query, turn["result"])
 
-def get_or_create_agent(session_id: Optional[str] = None) -> RAGAgent:
-    if session_id is None:
-        return default_agent
-    if session_id not in agents:
-        logger.info(f"Creating new agent for session: {session_id}")
-        agents[session_id] = RAGAgent(max_rewrite_attempts=1)
-    return agents[session_id]
+
+@contextmanager
+def request_trace(debug: bool) -> Iterator[Optional[Trace]]:
+    # Without debug nothing is recorded per request; spans only feed /metrics.
+    if not debug:
+        yield None
+        return
+    trace = current_trace()
+    if trace is not None:
+        yield trace
+        return
+    with start_trace() as trace:
+        yield trace
+
+
+def build_timings(trace: Optional[Trace]) -> Optional[RequestTimings]:
+    if trace is None:
+        return None
+    summary = summarize_trace(trace)
+    # Counted from visited nodes: the rewrite_attempts state key is summed across supersteps.
+    rewrites = sum(1 for node in summary["nodes"] if node["node"] == "rewrite")
+    return RequestTimings(**summary, rewrite_iterations=rewrites)
 
 
 def determine_source_type(source: str, metadata: dict) -> str:
@@ -87,13 +231,18 @@ def convert_sources_to_response(sources: list) -> list:
 
 
 @router.post("/chat", response_model=RAGQueryResponse)
-def chat(request: RAGQueryRequest):
+async def chat(request: RAGQueryRequest, background_tasks: BackgroundTasks):
     try:
         session_id = request.session_id
         logger.info(f"Processing query: {request.query[:100]}... (session: {session_id or 'none'})")
 
-        agent = get_or_create_agent(session_id)
-        result = agent.run(request.query)
+        history = await run_in_threadpool(session_store.get_context, session_id)
+        with request_trace(request.debug) as trace:
+            result = await default_agent.arun(request.query, history=history)
+            timings = build_timings(trace)
+        # Summarizing an overgrown history may call the LLM, so the turn is stored
+        # in the threadpool after the response is sent.
+        background_tasks.add_task(remember_turn, session_id, request.query, result)
         answer = result.get("answer", "")
         sources_list = result.get("sources", [])
         sources_response = convert_sources_to_response(sources_list)
@@ -110,7 +259,8 @@ def chat(request: RAGQueryRequest):
             query_rewritten=result.get("query"),
             rewrite_attempts=result.get("rewrite_attempts", 0),
             session_id=session_id,
-            error=None
+            error=None,
+            timings=timings,
         )
 
     except Exception as e:
@@ -121,10 +271,61 @@ def chat(request: RAGQueryRequest):
         )
 
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_chat_events(
+        agent: RAGAgent,
+        request: RAGQueryRequest,
+        turn: Dict[str, Any],
+) -> AsyncIterator[str]:
+    """Yields SSE events; the final state is left in turn["result"] for the response's background task."""
+    session_id = request.session_id
+    try:
+        history = await run_in_threadpool(session_store.get_context, session_id)
+        with request_trace(request.debug) as trace:
+            async for event in agent.astream(request.query, history=history):
+                event_type = event.pop("type")
+                if event_type != "result":
+                    yield sse_event(event_type, event)
+                    continue
+
+                result = event["state"]
+                timings = build_timings(trace)
+                turn["result"] = result
+                sources_response = convert_sources_to_response(result.get("sources", []))
+                yield sse_event("sources", {
+                    "sources": [s.model_dump() for s in sources_response],
+                })
+                yield sse_event("done", {
+                    "answer": result.get("answer", ""),
+                    "query_rewritten": result.get("query"),
+                    "rewrite_attempts": result.get("rewrite_attempts", 0),
+                    "session_id": session_id,
+                    "timings": timings.model_dump() if timings else None,
+                })
+    except Exception as e:
+        logger.error(f"Streaming query failed: {str(e)}", exc_info=True)
+        yield sse_event("error", {"detail": f"Failed to process query: {str(e)}"})
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: RAGQueryRequest):
+    logger.info(f"Streaming query: {request.query[:100]}... (session: {request.session_id or 'none'})")
+    turn: Dict[str, Any] = {}
+    return StreamingResponse(
+        stream_chat_events(default_agent, request, turn),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Runs once the stream ends (or the client leaves), so `done` is not held back.
+        background=BackgroundTask(remember_streamed_turn, request.session_id, request.query, turn),
+    )
+
+
 @router.delete("/session/{session_id}")
 def delete_session(session_id: str):
-    if session_id in agents:
-        del agents[session_id]
+    if session_store.delete(session_id):
         logger.info(f"Deleted session: {session_id}")
         return {"status": "ok", "message": f"Session {session_id} deleted"}
     return {"status": "not_found", "message": f"Session {session_id} not found"}
@@ -132,7 +333,24 @@ def delete_session(session_id: str):
 
 @router.get("/sessions")
 def list_sessions():
+    sessions = session_store.list_sessions()
+    return {
+        "active_sessions": sessions,
+        "count": len(sessions)
+    }
+
+
+@router.get("/stats")
+def agent_stats():
     return {
-        "active_sessions": list(agents.keys()),
-        "count": len(agents)
-    }
\ No newline at end of file
+        "speculative_retrieval": SPECULATIVE_RETRIEVAL,
+        "multi_query": MULTI_QUERY,
+        "speculation": speculation_stats.snapshot(),
+        "query_router": query_router.get_stats() if query_router else None,
+        "context_packer": context_packer.get_stats() if context_packer else None,
+        "context_compressor": context_compressor.get_stats() if context_compressor else None,
+        "llm_cache": llm_cache.get_stats() if llm_cache else None,
+        "llm": llm_client.get_stats(),
+        "sessions": session_store.get_stats(),
+        "inference_scheduler": get_inference_scheduler().get_stats(),
+    }
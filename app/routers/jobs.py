@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException
+import logging
+from typing import Optional
+
+from app.routers.vdb_crud import job_queue
+from app.schemas.jobs import JobListResponse, JobStatusResponse
+
+logger = logging.getLogger("JobsRouter")
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("", response_model=JobListResponse)
+def list_jobs(status: Optional[str] = None, limit: int = 50):
+    jobs = job_queue.list_jobs(status=status, limit=limit)
+    return JobListResponse(
+        jobs=[JobStatusResponse(**job) for job in jobs],
+        total=len(jobs),
+    )
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatusResponse(**job)
+
+
+@router.delete("/{job_id}", response_model=JobStatusResponse)
+def cancel_job(job_id: str):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    logger.info(f"Cancel requested for job {job_id}: {job['status']}")
+    return JobStatusResponse(**job)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException
 from pathlib import Path
 import logging
 import os
@@ -8,39 +8,94 @@ from app.schemas.vector_storage import (
     SearchResponse,
     SearchResultItem,
     DeleteByMetadataRequest,
+    DirectoryIngestRequest,
 )
 from app.services.vector_storage import VectorMemory
 from app.services.documents_parser import DBNParser
+from app.services.bulk_ingestion import is_archive
+from app.services.inference_scheduler import INTERACTIVE, get_inference_scheduler
+from app.services.ingestion import register_ingestion_jobs
+from app.services.job_queue import JobQueue
+from app.services.readiness import Readiness
+from app.services.shared_index import SharedIndexReader
+from app.services.uploads import (
+    EmptyUploadError,
+    UploadTooLargeError,
+    remove_upload,
+    save_upload,
+)
 from app.models.parameters import (
     ChunkingParameters,
     BatchWorker,
+    BulkIngestParams,
+    JobQueueParams,
     SearchParameters,
+    SharedIndexParams,
+    UploadParams,
     BiEncoderParams,
     CrossEncoderParams
 )
-from app.services.embedders import HFBiEmbedder, HFCrossEncoder
+from app.services.embedders import create_bi_embedder, create_cross_encoder
 
 logger = logging.getLogger("VectorMemoryRouter")
 
 router = APIRouter(prefix="/vector-memory", tags=["Vector Memory"])
 
-UPLOAD_DIR = Path("tmp/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_PARAMS = UploadParams(
+    max_bytes=int(os.getenv("MAX_UPLOAD_BYTES", str(UploadParams.max_bytes))),
+)
+Path(UPLOAD_PARAMS.upload_dir).mkdir(parents=True, exist_ok=True)
+
+# "standalone": one process owns Chroma and runs ingestion workers.
+# "reader": API worker that searches the shared index published by
+# `python -m app.ingest_worker` and only enqueues write jobs.
+RAG_MODE = os.getenv("RAG_MODE", "standalone")
+SHARED_INDEX_DIR = os.getenv("SHARED_INDEX_DIR", SharedIndexParams.root)
 
 CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./data/chroma_index")
-logger.info(f"Chroma persist directory: {CHROMA_PERSIST_DIR}")
+logger.info(f"Mode: {RAG_MODE}, Chroma persist directory: {CHROMA_PERSIST_DIR}")
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "./data/jobs.sqlite3")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+
+BULK_INGEST_ROOT = Path(os.getenv("BULK_INGEST_ROOT", "./data/imports")).resolve()
+BULK_INGEST_WORKERS = int(
+    os.getenv("BULK_INGEST_WORKERS", str(BulkIngestParams.num_workers))
+)
 
 try:
-    vector_memory = VectorMemory(
-        bi_embedder=HFBiEmbedder(params=BiEncoderParams()),
-        cross_encoder=HFCrossEncoder(params=CrossEncoderParams()),
-        persist_path=CHROMA_PERSIST_DIR,
-    )
+    if RAG_MODE == "reader":
+        vector_memory = SharedIndexReader(
+            bi_embedder=create_bi_embedder(BiEncoderParams()),
+            cross_encoder=create_cross_encoder(CrossEncoderParams()),
+            params=SharedIndexParams(root=SHARED_INDEX_DIR),
+        )
+    else:
+        vector_memory = VectorMemory(
+            bi_embedder=create_bi_embedder(BiEncoderParams()),
+            cross_encoder=create_cross_encoder(CrossEncoderParams()),
+            persist_path=CHROMA_PERSIST_DIR,
+        )
     logger.info("VectorMemory initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize VectorMemory: {str(e)}")
     raise
 
+
+def check_index() -> None:
+    stats = vector_memory.get_stats()
+    if stats.get("status") != "ready":
+        raise RuntimeError(f"Vector index is {stats.get('status')}")
+
+
+# Encoders load lazily; the warm-up thread started in the app lifespan loads them
+# in the background and /ready reports when they (and the index) are usable.
+readiness = Readiness()
+readiness.register("bi_encoder", vector_memory.bi_embedder.warm_up)
+if vector_memory.cross_encoder is not None:
+    readiness.register("cross_encoder", vector_memory.cross_encoder.warm_up)
+readiness.register("vector_index", check_index)
+
 try:
     parser = DBNParser(ChunkingParameters(), BatchWorker())
     logger.info("DocumentParser initialized successfully")
@@ -49,46 +104,22 @@ except Exception as e:
     raise
 
 
-def index_file(path: Path):
-    try:
-        logger.info(f"[BG] Starting file indexing: {path}")
-        docs = parser.load(str(path), "file")
-
-        if not docs:
-            logger.warning(f"[BG] No documents parsed from {path}")
-            return
-
-        vector_memory.add_documents(docs)
-        logger.info(f"[BG] Successfully indexed {len(docs)} chunks from {path}")
-
-        try:
-            path.unlink()
-            logger.info(f"[BG] Deleted temporary file: {path}")
-        except Exception as e:
-            logger.warning(f"[BG] Failed to delete temp file: {str(e)}")
-
-    except Exception as e:
-        logger.error(f"[BG] Failed to index file {path}: {str(e)}")
-
-def index_url(url: str):
-    try:
-        logger.info(f"[BG] Starting URL indexing: {url}")
-        docs = parser.load(url, "url")
-
-        if not docs:
-            logger.warning(f"[BG] No content extracted from URL: {url}")
-            return
+job_queue = JobQueue(
+    JobQueueParams(db_path=JOBS_DB_PATH, num_workers=INGEST_WORKERS)
+)
+# Readers never start the workers, but need the cleanups for cancelled jobs.
+register_ingestion_jobs(
+    job_queue,
+    parser,
+    vector_memory,
+    BulkIngestParams(num_workers=BULK_INGEST_WORKERS),
+)
 
-        vector_memory.add_documents(docs)
-        logger.info(f"[BG] Successfully indexed {len(docs)} chunks from {url}")
-
-    except Exception as e:
-        logger.error(f"[BG] Failed to index URL {url}: {str(e)}")
 
 @router.post("/documents/file")
 async def add_from_file(
         file: UploadFile = File(...),
-        background_tasks: BackgroundTasks = None,
+        priority: int = 0,
 ):
 
     if not file.filename:
@@ -104,44 +135,117 @@ async def add_from_file(
         )
 
     try:
-        safe_filename = file.filename.encode('utf-8', errors='ignore').decode('utf-8')
-        path = UPLOAD_DIR / safe_filename
+        upload = await save_upload(file, UPLOAD_PARAMS)
+    except EmptyUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-        content = await file.read()
+    try:
+        job_id = job_queue.enqueue(
+            "file",
+            {
+                "path": str(upload.path),
+                "upload_dir": str(upload.upload_dir),
+                "sha256": upload.sha256,
+            },
+            priority=priority,
+        )
 
-        if not content:
-            raise HTTPException(status_code=400, detail="Empty file")
+        logger.info(f"File uploaded: {upload.path.name} ({upload.size_bytes} bytes), job {job_id}")
 
-        max_size = 50 * 1024 * 1024
-        if len(content) > max_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large: {len(content)} bytes (max: {max_size})"
-            )
+        return {
+            "status": "accepted",
+            "job_id": job_id,
+            "filename": upload.path.name,
+            "size_bytes": upload.size_bytes,
+            "sha256": upload.sha256,
+            "message": f"File is queued for indexing. Check /jobs/{job_id} to see progress."
+        }
 
-        path.write_bytes(content)
+    except Exception as e:
+        remove_upload(upload.upload_dir)
+        logger.error(f"Failed to upload file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
-        background_tasks.add_task(index_file, path)
+@router.post("/documents/archive")
+async def add_from_archive(
+        file: UploadFile = File(...),
+        priority: int = 0,
+):
+    if not file.filename or not is_archive(file.filename):
+        raise HTTPException(
+            status_code=400,
+            detail="Archive must be a .zip or .tar(.gz/.bz2/.xz) file"
+        )
 
-        logger.info(f"File uploaded: {safe_filename} ({len(content)} bytes)")
+    try:
+        upload = await save_upload(file, UPLOAD_PARAMS)
+    except EmptyUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
+    try:
+        job_id = job_queue.enqueue(
+            "archive",
+            {
+                "path": str(upload.path),
+                "upload_dir": str(upload.upload_dir),
+                "sha256": upload.sha256,
+            },
+            priority=priority,
+        )
+        logger.info(f"Archive uploaded: {upload.path.name} ({upload.size_bytes} bytes), job {job_id}")
         return {
             "status": "accepted",
-            "filename": safe_filename,
-            "size_bytes": len(content),
-            "message": "File is being processed in background"
+            "job_id": job_id,
+            "filename": upload.path.name,
+            "size_bytes": upload.size_bytes,
+            "sha256": upload.sha256,
+            "message": f"Archive is queued for indexing. Check /jobs/{job_id} for per-file status."
         }
 
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Failed to upload file: {str(e)}")
+        remove_upload(upload.upload_dir)
+        logger.error(f"Failed to queue archive: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+@router.post("/documents/directory")
+def add_from_directory(request: DirectoryIngestRequest):
+    directory = Path(request.path).resolve()
+
+    if not directory.is_relative_to(BULK_INGEST_ROOT):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Directory must be inside {BULK_INGEST_ROOT}"
+        )
+    if not directory.is_dir():
+        raise HTTPException(status_code=404, detail=f"Directory not found: {directory}")
+
+    try:
+        job_id = job_queue.enqueue(
+            "directory",
+            {"directory": str(directory)},
+            priority=request.priority,
+        )
+        logger.info(f"Directory queued for indexing: {directory}, job {job_id}")
+        return {
+            "status": "accepted",
+            "job_id": job_id,
+            "source": str(directory),
+            "message": f"Directory is queued for indexing. Check /jobs/{job_id} for per-file status."
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to queue directory: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue directory: {str(e)}")
+
+
 @router.post("/documents/url")
-def add_from_url(url: str, background_tasks: BackgroundTasks):
+def add_from_url(url: str, priority: int = 0):
     if not url or not url.strip():
         raise HTTPException(status_code=400, detail="URL is required")
 
@@ -153,12 +257,13 @@ def add_from_url(url: str, background_tasks: BackgroundTasks):
         )
 
     try:
-        background_tasks.add_task(index_url, url)
-        logger.info(f"URL queued for indexing: {url}")
+        job_id = job_queue.enqueue("url", {"url": url}, priority=priority)
+        logger.info(f"URL queued for indexing: {url}, job {job_id}")
         return {
             "status": "accepted",
+            "job_id": job_id,
             "source": url,
-            "message": "URL is being processed in background. Check /status to see progress."
+            "message": f"URL is queued for indexing. Check /jobs/{job_id} to see progress."
         }
 
     except Exception as e:
@@ -170,7 +275,8 @@ def add_from_url(url: str, background_tasks: BackgroundTasks):
 def search(request: SearchRequest):
     try:
         params = SearchParameters(**request.dict())
-        hits = vector_memory.search(params)
+        with get_inference_scheduler().slot(INTERACTIVE):
+            hits = vector_memory.search(params)
         return SearchResponse(
             results=[
                 SearchResultItem(
@@ -197,6 +303,14 @@ def delete_by_metadata(request: DeleteByMetadataRequest):
             status_code=400,
             detail="Filter metadata is required"
         )
+    if RAG_MODE == "reader":
+        job_id = job_queue.enqueue("delete", {"filter_metadata": request.filter_metadata})
+        return {
+            "status": "accepted",
+            "job_id": job_id,
+            "filter": request.filter_metadata,
+            "message": f"Delete is queued. Check /jobs/{job_id} to see progress."
+        }
     try:
         vector_memory.delete_documents(request.filter_metadata)
         return {
@@ -215,6 +329,13 @@ def delete_by_metadata(request: DeleteByMetadataRequest):
 
 @router.delete("/clear")
 def clear():
+    if RAG_MODE == "reader":
+        job_id = job_queue.enqueue("clear", {}, priority=100)
+        return {
+            "status": "accepted",
+            "job_id": job_id,
+            "message": f"Clear is queued. Check /jobs/{job_id} to see progress."
+        }
     try:
         vector_memory.clear()
         return {
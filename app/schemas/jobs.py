@@ -0,0 +1,27 @@
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    stage: Optional[str]
+    priority: int
+    attempts: int
+    max_retries: int
+    pages_parsed: int
+    chunks_embedded: int
+    throughput_chunks_per_sec: float
+    elapsed_seconds: float
+    cancel_requested: bool
+    error: Optional[str]
+    result: Optional[Dict[str, Any]]
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+
+class JobListResponse(BaseModel):
+    jobs: List[JobStatusResponse]
+    total: int
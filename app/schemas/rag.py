@@ -30,6 +30,7 @@ class SourceInfoResponse(BaseModel):
 class RAGQueryRequest(BaseModel):
     query: str = Field(..., min_length=1, description="Питання користувача")
     session_id: Optional[str] = Field(None, description="ID сесії для контексту (опціонально)")
+    debug: bool = Field(False, description="Повернути розбивку часу та витрат (timings)")
 
     class Config:
         json_schema_extra = {
@@ -40,6 +41,32 @@ class RAGQueryRequest(BaseModel):
         }
 
 
+class NodeTiming(BaseModel):
+    node: str = Field(..., description="Вузол графа")
+    ms: float = Field(..., description="Час виконання, мс")
+
+
+class LLMCallTiming(BaseModel):
+    caller: Optional[str] = Field(None, description="Вузол, що викликав LLM")
+    ms: float = Field(..., description="Час виклику, мс")
+    input_tokens: Optional[int] = Field(None, description="Токени запиту")
+    output_tokens: Optional[int] = Field(None, description="Токени відповіді")
+    streamed: bool = Field(False, description="Потокова генерація")
+
+
+class RequestTimings(BaseModel):
+    total_ms: float = Field(..., description="Загальний час обробки, мс")
+    nodes: List[NodeTiming] = Field(default_factory=list, description="Відвідані вузли у порядку виконання")
+    llm_calls: int = Field(0, description="Кількість викликів LLM (без кешованих)")
+    llm: List[LLMCallTiming] = Field(default_factory=list)
+    input_tokens: int = Field(0, description="Сумарні токени запитів до LLM")
+    output_tokens: int = Field(0, description="Сумарні токени відповідей LLM")
+    retrieval_candidates: int = Field(0, description="Кандидатів, повернутих векторним пошуком")
+    cache_hits: int = Field(0, description="Влучання в кеш LLM")
+    cache_misses: int = Field(0, description="Промахи кешу LLM")
+    rewrite_iterations: int = Field(0, description="Ітерацій переформулювання")
+
+
 class RAGQueryResponse(BaseModel):
     answer: str = Field(..., description="Згенерована відповідь")
     sources: List[SourceInfoResponse] = Field(
@@ -50,6 +77,7 @@ class RAGQueryResponse(BaseModel):
     rewrite_attempts: int = Field(0, description="Кількість спроб переформулювання")
     session_id: Optional[str] = Field(None, description="ID сесії")
     error: Optional[str] = Field(None, description="Помилка")
+    timings: Optional[RequestTimings] = Field(None, description="Розбивка часу та витрат (лише з debug=true)")
 
     class Config:
         json_schema_extra = {
@@ -21,4 +21,9 @@ class SearchResponse(BaseModel):
 
 
 class DeleteByMetadataRequest(BaseModel):
-    filter_metadata: Dict[str, Any]
\ No newline at end of file
+    filter_metadata: Dict[str, Any]
+
+
+class DirectoryIngestRequest(BaseModel):
+    path: str
+    priority: int = 0
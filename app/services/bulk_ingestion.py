@@ -0,0 +1,285 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from app.models.parameters import BatchWorker, BulkIngestParams, ChunkingParameters
+from app.services.documents_parser import DBNParser
+from app.services.job_queue import JobContext
+from app.services.vector_storage import VectorMemory
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+_worker_parser: Optional[DBNParser] = None
+
+
+def _init_worker(chunk_params: ChunkingParameters) -> None:
+    global _worker_parser
+    _worker_parser = DBNParser(chunk_params, BatchWorker(num_workers=1))
+
+
+def _parse_file(path: str, source_name: str) -> Tuple[int, List[Document]]:
+    pages: List[Document] = _worker_parser.load_pages(path, "file", source_name)
+    return len(pages), _worker_parser.chunk(pages)
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_supported(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in DBNParser.SUPPORTED_EXTENSIONS
+
+
+class ArchiveLimitError(ValueError):
+    pass
+
+
+def iter_archive(path: str) -> Iterator[Tuple[str, int, IO[bytes]]]:
+    """Yields (name, declared decompressed size, stream) for every regular file."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, info.file_size, member
+    elif tarfile.is_tarfile(path):
+        # Stream mode reads members sequentially without random access.
+        with tarfile.open(path, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                member: Optional[IO[bytes]] = archive.extractfile(info)
+                if member is not None:
+                    yield info.name, info.size, member
+    else:
+        raise ValueError(f"Unsupported archive format: {path}")
+
+
+def copy_limited(src: IO[bytes], dst: IO[bytes], limit: int, chunk_size: int = 1024 * 1024) -> int:
+    """Copies at most limit bytes; declared sizes can lie, so the stream is counted too."""
+    copied: int = 0
+    while True:
+        chunk: bytes = src.read(chunk_size)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if copied > limit:
+            raise ArchiveLimitError(f"exceeds {limit} bytes when decompressed")
+        dst.write(chunk)
+
+
+def iter_directory(root: str) -> Iterator[Tuple[str, str]]:
+    real_root: Path = Path(root).resolve()
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            full_path: str = os.path.join(dirpath, filename)
+            # The caller checked only the directory itself; a symlink inside it may point anywhere.
+            if not Path(full_path).resolve().is_relative_to(real_root):
+                logger.warning("Skipping file outside the ingest directory: %s", full_path)
+                continue
+            yield os.path.relpath(full_path, root), full_path
+
+
+class BulkIngestor:
+    def __init__(
+        self,
+        vector_memory: VectorMemory,
+        chunk_params: ChunkingParameters = ChunkingParameters(),
+        params: BulkIngestParams = BulkIngestParams(),
+    ) -> None:
+        self.vector_memory: VectorMemory = vector_memory
+        self.chunk_params: ChunkingParameters = chunk_params
+        self.params: BulkIngestParams = params
+
+    def index_archive(self, ctx: JobContext) -> Dict[str, Any]:
+        path: str = ctx.payload["path"]
+        staging_dir: str = tempfile.mkdtemp(
+            prefix="bulk-",
+            dir=ctx.payload.get("upload_dir"),
+        )
+        try:
+            return self._run(ctx, self._stage_archive(path, staging_dir))
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def index_directory(self, ctx: JobContext) -> Dict[str, Any]:
+        root: str = ctx.payload["directory"]
+        files = (
+            (name, full_path, False, None)
+            for name, full_path in iter_directory(root)
+        )
+        return self._run(ctx, files)
+
+    def _stage_archive(
+        self,
+        path: str,
+        staging_dir: str,
+    ) -> Iterator[Tuple[str, str, bool, Optional[str]]]:
+        member_error: str = f"file exceeds {self.params.max_member_bytes} bytes when decompressed"
+        archive_error: str = f"archive exceeds {self.params.max_archive_bytes} bytes when decompressed"
+        remaining: int = self.params.max_archive_bytes
+        for idx, (name, size, member) in enumerate(iter_archive(path)):
+            if not is_supported(name):
+                yield name, "", False, None
+                continue
+            if size > self.params.max_member_bytes:
+                yield name, "", False, member_error
+                continue
+            if size > remaining:
+                # The rest of the archive is not extracted either.
+                yield name, "", False, archive_error
+                break
+            member_dir: str = os.path.join(staging_dir, str(idx))
+            os.makedirs(member_dir, exist_ok=True)
+            staged_path: str = os.path.join(member_dir, os.path.basename(name))
+            limit: int = min(self.params.max_member_bytes, remaining)
+            try:
+                with open(staged_path, "wb") as out:
+                    remaining -= copy_limited(member, out, limit)
+            except ArchiveLimitError:
+                shutil.rmtree(member_dir, ignore_errors=True)
+                # What was decompressed before the limit hit counts towards the archive.
+                remaining -= limit
+                logger.warning("Archive member %s is larger than its declared size of %d bytes", name, size)
+                if limit < self.params.max_member_bytes:
+                    yield name, "", False, archive_error
+                    break
+                yield name, "", False, member_error
+                continue
+            yield name, staged_path, True, None
+
+    def _run(
+        self,
+        ctx: JobContext,
+        files: Iterator[Tuple[str, str, bool, Optional[str]]],
+    ) -> Dict[str, Any]:
+        statuses: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[Future, Tuple[str, str, bool]] = {}
+        buffer: List[Document] = []
+        buffered_files: List[str] = []
+        totals: Dict[str, int] = {
+            "pages": 0,
+            "chunks": 0,
+            "added": 0,
+            "removed": 0,
+            "unchanged": 0,
+        }
+
+        def flush() -> None:
+            if not buffer:
+                return
+            ctx.update(stage="embedding")
+            embedded_before: int = totals["added"]
+            stats = self.vector_memory.add_documents(
+                buffer,
+                progress=lambda n: ctx.update(chunks_embedded=embedded_before + n),
+            )
+            totals["added"] += stats.added
+            totals["removed"] += stats.removed
+            totals["unchanged"] += stats.unchanged
+            for name in buffered_files:
+                statuses[name]["status"] = "indexed"
+            buffer.clear()
+            buffered_files.clear()
+            ctx.update(
+                stage="parsing",
+                chunks_embedded=totals["added"],
+                result=self._result(statuses, totals),
+            )
+
+        def collect(done: Set[Future]) -> None:
+            for future in done:
+                name, staged_path, is_staged = pending.pop(future)
+                try:
+                    pages, chunks = future.result()
+                except Exception as e:
+                    logger.warning("Failed to parse %s: %s", name, e)
+                    statuses[name] = {"status": "failed", "error": str(e)}
+                    continue
+                finally:
+                    if is_staged:
+                        shutil.rmtree(os.path.dirname(staged_path), ignore_errors=True)
+
+                totals["pages"] += pages
+                totals["chunks"] += len(chunks)
+                statuses[name] = {
+                    "status": "parsed" if chunks else "empty",
+                    "pages": pages,
+                    "chunks": len(chunks),
+                }
+                if chunks:
+                    buffer.extend(chunks)
+                    buffered_files.append(name)
+            ctx.update(pages_parsed=totals["pages"])
+            if len(buffer) >= self.params.write_batch_chunks:
+                flush()
+
+        ctx.update(stage="parsing")
+        with ProcessPoolExecutor(
+            max_workers=self.params.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.chunk_params,),
+        ) as executor:
+            try:
+                for name, file_path, is_staged, error in files:
+                    if error:
+                        statuses[name] = {"status": "failed", "error": error}
+                        continue
+                    if not file_path or not is_supported(name):
+                        statuses[name] = {"status": "skipped", "error": "unsupported file type"}
+                        continue
+                    future: Future = executor.submit(_parse_file, file_path, name)
+                    pending[future] = (name, file_path, is_staged)
+
+                    # Bound the number of staged files waiting for a worker.
+                    if len(pending) >= self.params.max_pending_files:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                flush()
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        result: Dict[str, Any] = self._result(statuses, totals)
+        logger.info(
+            "Bulk ingest complete | files=%d pages=%d chunks=%d added=%d removed=%d unchanged=%d",
+            len(statuses),
+            totals["pages"],
+            totals["chunks"],
+            totals["added"],
+            totals["removed"],
+            totals["unchanged"],
+        )
+        return result
+
+    @staticmethod
+    def _result(
+        statuses: Dict[str, Dict[str, Any]],
+        totals: Dict[str, int],
+    ) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for status in statuses.values():
+            counts[status["status"]] = counts.get(status["status"], 0) + 1
+        return {
+            **totals,
+            "files_total": len(statuses),
+            "files_by_status": counts,
+            "files": statuses,
+        }
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source: str, text_hash: str) -> str:
+    source_digest: str = hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+    return f"{source_digest}:{text_hash[:32]}"
+
+
+class ChunkManifest:
+    def __init__(self, path: str) -> None:
+        self.path: Path = Path(path)
+        self._lock: threading.Lock = threading.Lock()
+        self._sources: Dict[str, Set[str]] = self._read()
+
+    def _read(self) -> Dict[str, Set[str]]:
+        if not self.path.exists():
+            return {}
+        try:
+            raw: Dict[str, List[str]] = json.loads(
+                self.path.read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError):
+            logger.exception("Failed to read chunk manifest: %s", self.path)
+            return {}
+        return {source: set(hashes) for source, hashes in raw.items()}
+
+    def _write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path: Path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {source: sorted(hashes) for source, hashes in self._sources.items()},
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.path)
+
+    def get(self, source: str) -> Set[str]:
+        with self._lock:
+            return set(self._sources.get(source, set()))
+
+    def set(self, source: str, hashes: Iterable[str]) -> None:
+        with self._lock:
+            hashes = set(hashes)
+            if hashes:
+                self._sources[source] = hashes
+            else:
+                self._sources.pop(source, None)
+            self._write()
+
+    def discard(self, source: str, hashes: Iterable[str]) -> None:
+        with self._lock:
+            remaining: Set[str] = self._sources.get(source, set()) - set(hashes)
+            if remaining:
+                self._sources[source] = remaining
+            else:
+                self._sources.pop(source, None)
+            self._write()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sources = {}
+            self._write()
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return list(self._sources)
@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.models.parameters import ContextCompressorParams
+from app.services.context_packer import ContextBlock
+from app.services.embedders import HFBiEmbedder
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+class ContextCompressor:
+    def __init__(
+        self,
+        bi_embedder: HFBiEmbedder,
+        params: ContextCompressorParams = ContextCompressorParams(),
+    ) -> None:
+        self.bi_embedder: HFBiEmbedder = bi_embedder
+        self.params: ContextCompressorParams = params
+
+        self._stats_lock: threading.Lock = threading.Lock()
+        self._totals: Dict[str, int] = {
+            "requests": 0,
+            "chars_in": 0,
+            "chars_out": 0,
+        }
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        # Sorting by length keeps padding inside each batch small.
+        order: np.ndarray = np.argsort([len(text) for text in texts])
+        vectors: np.ndarray = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(texts), self.params.batch_size):
+            idx: np.ndarray = order[start : start + self.params.batch_size]
+            batch: np.ndarray = (
+                self.bi_embedder.get_embeddings(
+                    [texts[i][: self.params.max_sentence_chars] for i in idx]
+                )
+                .cpu().numpy().astype(np.float32)
+            )
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[idx] = batch
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9, None)
+
+    def compress(self, query: str, blocks: List[ContextBlock]) -> List[ContextBlock]:
+        sentences: List[List[str]] = [split_sentences(block.text) for block in blocks]
+        # (block index, sentence index) for every sentence that competes for selection.
+        candidates: List[Tuple[int, int]] = [
+            (b, s)
+            for b, block_sentences in enumerate(sentences)
+            if len(block_sentences) > self.params.min_block_sentences
+            for s in range(len(block_sentences))
+        ]
+        if not candidates:
+            return blocks
+
+        texts: List[str] = [query] + [sentences[b][s] for b, s in candidates]
+        vectors: np.ndarray = self._embed(texts)
+        scores: np.ndarray = vectors[1:] @ vectors[0]
+
+        keep: Dict[int, set] = {}
+        for rank, idx in enumerate(np.argsort(-scores)):
+            b, s = candidates[idx]
+            # Each block keeps its best sentence so every citation still has text.
+            if rank >= self.params.max_sentences and b in keep:
+                continue
+            window = range(
+                max(0, s - self.params.neighbors),
+                min(len(sentences[b]), s + self.params.neighbors + 1),
+            )
+            keep.setdefault(b, set()).update(window)
+
+        chars_in: int = sum(len(block.text) for block in blocks)
+        for b, kept in keep.items():
+            parts: List[str] = []
+            previous: int = -2
+            for s in sorted(kept):
+                if parts and s != previous + 1:
+                    parts.append("…")
+                parts.append(sentences[b][s])
+                previous = s
+            blocks[b].text = " ".join(parts)
+        chars_out: int = sum(len(block.text) for block in blocks)
+
+        with self._stats_lock:
+            self._totals["requests"] += 1
+            self._totals["chars_in"] += chars_in
+            self._totals["chars_out"] += chars_out
+        logger.info(
+            "Context compressed | blocks=%d sentences=%d chars=%d->%d",
+            len(blocks),
+            len(candidates),
+            chars_in,
+            chars_out,
+        )
+        return blocks
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            totals: Dict[str, Any] = dict(self._totals)
+        totals["compression_ratio"] = (
+            totals["chars_out"] / totals["chars_in"] if totals["chars_in"] else 1.0
+        )
+        return totals
@@ -0,0 +1,292 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from transformers import AutoTokenizer
+
+from app.models.parameters import ContextPackerParams
+from app.services.embedders import HFBiEmbedder
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ContextBlock:
+    text: str
+    source: str
+    page: Optional[int]
+    score: Optional[float]
+    # Original retrieved chunks the block was built from, in merge order.
+    documents: List[Document] = field(default_factory=list)
+    tokens: int = 0
+
+
+@dataclass
+class PackedContext:
+    blocks: List[ContextBlock]
+    stats: Dict[str, int]
+
+
+def merge_overlapping(a: str, b: str, min_overlap: int) -> Optional[str]:
+    """Joins two chunk texts when one contains the other or a's tail is b's head."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    head: str = b[:min_overlap]
+    if len(head) < min_overlap:
+        return None
+    start: int = a.find(head)
+    while start != -1:
+        if b.startswith(a[start:]):
+            return a[:start] + b
+        start = a.find(head, start + 1)
+    return None
+
+
+class ContextPacker:
+    def __init__(
+        self,
+        bi_embedder: HFBiEmbedder,
+        vector_memory: Optional[Any] = None,
+        params: ContextPackerParams = ContextPackerParams(),
+    ) -> None:
+        self.bi_embedder: HFBiEmbedder = bi_embedder
+        self.vector_memory: Optional[Any] = vector_memory
+        self.params: ContextPackerParams = params
+
+        # Own tokenizer instance: fast tokenizers are not safe to share
+        # across threads with the embedder's truncation settings.
+        # Loaded by warm_up() or on first use.
+        self.tokenizer_name: str = params.tokenizer_name or bi_embedder.params.model_name
+        self._tokenizer = None
+        self._tokenizer_lock: threading.Lock = threading.Lock()
+        self._load_lock: threading.Lock = threading.Lock()
+
+        self._stats_lock: threading.Lock = threading.Lock()
+        self._totals: Dict[str, int] = {
+            "requests": 0,
+            "tokens_in": 0,
+            "tokens_out": 0,
+            "tokens_saved": 0,
+        }
+        logger.info(
+            "ContextPacker initialized | tokenizer=%s budget=%d",
+            self.tokenizer_name,
+            params.token_budget,
+        )
+
+    @property
+    def tokenizer(self) -> Any:
+        if self._tokenizer is None:
+            with self._load_lock:
+                if self._tokenizer is None:
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+        return self._tokenizer
+
+    def warm_up(self) -> None:
+        self.count_tokens(["warm-up"])
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        if not texts:
+            return []
+        with self._tokenizer_lock:
+            encoded = self.tokenizer(list(texts), add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        with self._tokenizer_lock:
+            encoded = self.tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                verbose=False,
+            )
+        offsets = encoded["offset_mapping"]
+        if len(offsets) <= max_tokens:
+            return text
+        return text[: offsets[max_tokens - 1][1]].rstrip() + "…"
+
+    def merge(self, items: Sequence[Tuple[Document, Optional[float]]]) -> List[ContextBlock]:
+        groups: Dict[Tuple[str, Any], List[ContextBlock]] = {}
+        for doc, score in items:
+            metadata: Dict[str, Any] = doc.metadata or {}
+            source: str = metadata.get("source") or metadata.get("title") or ""
+            page = metadata.get("page", metadata.get("page_number"))
+            block = ContextBlock(
+                text=doc.page_content,
+                source=source,
+                page=page,
+                score=score,
+                documents=[doc],
+            )
+            group: List[ContextBlock] = groups.setdefault((source, page), [])
+
+            # Merging can chain: a merged block may now overlap another one.
+            merged: bool = True
+            while merged:
+                merged = False
+                for idx, other in enumerate(group):
+                    text = (
+                        merge_overlapping(other.text, block.text, self.params.min_overlap_chars)
+                        or merge_overlapping(block.text, other.text, self.params.min_overlap_chars)
+                    )
+                    if text is None:
+                        continue
+                    scores = [s for s in (other.score, block.score) if s is not None]
+                    block = ContextBlock(
+                        text=text,
+                        source=source,
+                        page=page,
+                        score=max(scores) if scores else None,
+                        documents=other.documents + block.documents,
+                    )
+                    group.pop(idx)
+                    merged = True
+                    break
+            group.append(block)
+
+        return [block for group in groups.values() for block in group]
+
+    def _embed_blocks(self, blocks: List[ContextBlock]) -> np.ndarray:
+        stored: Dict[str, List[float]] = {}
+        ids: List[str] = [doc.id for block in blocks for doc in block.documents if doc.id]
+        if ids and self.vector_memory is not None:
+            try:
+                stored = self.vector_memory.get_embeddings(ids)
+            except Exception as e:
+                logger.warning("Failed to load stored embeddings: %s", e)
+
+        vectors: List[Optional[np.ndarray]] = []
+        missing: List[int] = []
+        for idx, block in enumerate(blocks):
+            found = [stored[doc.id] for doc in block.documents if doc.id in stored]
+            if len(found) == len(block.documents):
+                vectors.append(np.mean(np.asarray(found, dtype=np.float32), axis=0))
+            else:
+                vectors.append(None)
+                missing.append(idx)
+
+        if missing:
+            embedded: np.ndarray = (
+                self.bi_embedder.get_embeddings([blocks[idx].text for idx in missing])
+                .cpu().numpy().astype(np.float32)
+            )
+            for idx, vector in zip(missing, embedded):
+                vectors[idx] = vector
+
+        matrix: np.ndarray = np.stack(vectors)
+        return matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-9, None)
+
+    def dedupe(self, query: str, blocks: List[ContextBlock]) -> Tuple[List[ContextBlock], int]:
+        """MMR selection over block embeddings; near-duplicates are dropped, the rest ranked."""
+        if len(blocks) < 2:
+            return blocks, 0
+
+        embeddings: np.ndarray = self._embed_blocks(blocks)
+        if all(block.score is not None for block in blocks):
+            relevance: np.ndarray = np.asarray([block.score for block in blocks], dtype=np.float32)
+        else:
+            query_vec: np.ndarray = self.bi_embedder.get_embedding(query).cpu().numpy().astype(np.float32)
+            query_vec /= max(float(np.linalg.norm(query_vec)), 1e-9)
+            relevance = embeddings @ query_vec
+            for block, rel in zip(blocks, relevance):
+                if block.score is None:
+                    block.score = float(rel)
+
+        similarity: np.ndarray = embeddings @ embeddings.T
+        lam: float = self.params.mmr_lambda
+        remaining: np.ndarray = np.ones(len(blocks), dtype=bool)
+        max_sim: np.ndarray = np.full(len(blocks), -np.inf, dtype=np.float32)
+        selected: List[int] = []
+        dropped: int = 0
+
+        while remaining.any():
+            redundancy: np.ndarray = np.where(np.isfinite(max_sim), max_sim, 0.0)
+            mmr: np.ndarray = np.where(remaining, lam * relevance - (1 - lam) * redundancy, -np.inf)
+            best: int = int(np.argmax(mmr))
+            remaining[best] = False
+            if max_sim[best] >= self.params.duplicate_threshold:
+                dropped += 1
+                continue
+            selected.append(best)
+            max_sim = np.maximum(max_sim, similarity[best])
+
+        return [blocks[idx] for idx in selected], dropped
+
+    def pack(self, blocks: List[ContextBlock]) -> Tuple[List[ContextBlock], int]:
+        ordered: List[ContextBlock] = sorted(
+            blocks,
+            key=lambda block: block.score if block.score is not None else float("-inf"),
+            reverse=True,
+        )
+        for block, tokens in zip(ordered, self.count_tokens([b.text for b in ordered])):
+            block.tokens = tokens
+
+        packed: List[ContextBlock] = []
+        remaining: int = self.params.token_budget
+        truncated: int = 0
+        for block in ordered:
+            if block.tokens <= remaining:
+                packed.append(block)
+                remaining -= block.tokens
+            elif remaining >= self.params.min_block_tokens:
+                block.text = self.truncate(block.text, remaining)
+                block.tokens = remaining
+                packed.append(block)
+                remaining = 0
+                truncated += 1
+        return packed, truncated
+
+    def assemble(
+        self,
+        query: str,
+        items: Sequence[Tuple[Document, Optional[float]]],
+        compress: Optional[Callable[[str, List[ContextBlock]], List[ContextBlock]]] = None,
+    ) -> PackedContext:
+        tokens_in: int = sum(self.count_tokens([doc.page_content for doc, _ in items]))
+        blocks: List[ContextBlock] = self.merge(items)
+        merged_chunks: int = len(items) - len(blocks)
+        blocks, duplicates = self.dedupe(query, blocks)
+        if compress is not None:
+            blocks = compress(query, blocks)
+        blocks, truncated = self.pack(blocks)
+        tokens_out: int = sum(block.tokens for block in blocks)
+
+        stats: Dict[str, int] = {
+            "chunks_in": len(items),
+            "chunks_merged": merged_chunks,
+            "duplicates_dropped": duplicates,
+            "blocks_out": len(blocks),
+            "blocks_truncated": truncated,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+        }
+        with self._stats_lock:
+            self._totals["requests"] += 1
+            for key in ("tokens_in", "tokens_out", "tokens_saved"):
+                self._totals[key] += stats[key]
+
+        logger.info(
+            "Context packed | chunks=%d merged=%d duplicates=%d blocks=%d tokens=%d->%d saved=%d",
+            stats["chunks_in"],
+            merged_chunks,
+            duplicates,
+            len(blocks),
+            tokens_in,
+            tokens_out,
+            stats["tokens_saved"],
+        )
+        return PackedContext(blocks=blocks, stats=stats)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            totals: Dict[str, Any] = dict(self._totals)
+        totals["avg_tokens_saved"] = (
+            totals["tokens_saved"] / totals["requests"] if totals["requests"] else 0.0
+        )
+        return totals
@@ -4,25 +4,25 @@ import os
 import re
 from abc import abstractmethod
 from concurrent.futures import ThreadPoolExecutor
-from typing import Iterable, List, Literal, Protocol
+from typing import TYPE_CHECKING, Iterable, List, Literal, Optional, Protocol
 
 import requests
-from langchain_community.document_loaders import (
-    Docx2txtLoader,
-    PyPDFLoader,
-    WebBaseLoader,
-)
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app.models.parameters import BatchWorker, ChunkingParameters
 
+# The loaders and the splitter pull in langchain_community and transformers
+# (seconds of import time); they are imported where they are first used.
+if TYPE_CHECKING:
+    from langchain_community.document_loaders import (
+        BSHTMLLoader,
+        Docx2txtLoader,
+        PyPDFLoader,
+        TextLoader,
+        WebBaseLoader,
+    )
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)s] %(asctime)s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -38,6 +38,8 @@ class DocumentsParser(Protocol):
 
 
 class DBNParser(DocumentsParser):
+    SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".doc", ".txt", ".md", ".html", ".htm"}
+
     def __init__(
         self,
         chunk_params: ChunkingParameters = ChunkingParameters(),
@@ -47,13 +49,7 @@ class DBNParser(DocumentsParser):
         self.max_workers: int = processor_params.num_workers
         self.batch_size: int = processor_params.batch_size
 
-        self.splitter: RecursiveCharacterTextSplitter = (
-            RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_params.chunk_size,
-                chunk_overlap=self.chunk_params.chunk_overlap,
-                separators=self.chunk_params.h_separator,
-            )
-        )
+        self._splitter: Optional[RecursiveCharacterTextSplitter] = None
 
         logger.info(
             "DBNParser initialized | chunk_size=%d overlap=%d workers=%d batch=%d",
@@ -63,10 +59,32 @@ class DBNParser(DocumentsParser):
             self.batch_size,
         )
 
+    @property
+    def splitter(self) -> "RecursiveCharacterTextSplitter":
+        # Built on first use; a duplicate from a concurrent first call is harmless.
+        if self._splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            self._splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_params.chunk_size,
+                chunk_overlap=self.chunk_params.chunk_overlap,
+                separators=self.chunk_params.h_separator,
+            )
+        return self._splitter
+
     def load(
         self,
         source: str,
         source_type: Literal["url", "file"],
+        source_name: Optional[str] = None,
+    ) -> List[Document]:
+        return self.chunk(self.load_pages(source, source_type, source_name))
+
+    def load_pages(
+        self,
+        source: str,
+        source_type: Literal["url", "file"],
+        source_name: Optional[str] = None,
     ) -> List[Document]:
 
         logger.info(
@@ -79,14 +97,15 @@ class DBNParser(DocumentsParser):
             if source.lower().endswith(".pdf"):
                 return self._load_pdf_from_url(source)
 
-            documents: List[Document] = self._load_from_url(source)
+            return self._load_from_url(source)
 
         elif source_type == "file":
-            documents = self._load_from_file(source)
+            return self._load_from_file(source, source_name)
 
         else:
             raise ValueError("source_type must be 'url' or 'file'")
 
+    def chunk(self, documents: List[Document]) -> List[Document]:
         return self._chunk_documents_parallel(documents)
 
     def _load_pdf_from_url(self, url: str) -> List[Document]:
@@ -97,6 +116,8 @@ class DBNParser(DocumentsParser):
         except Exception:
             logger.exception("Failed to download PDF from URL: %s", url)
             return []
+        from langchain_community.document_loaders import PyPDFLoader
+
         try:
             pdf_file: io.BytesIO = io.BytesIO(response.content)
             loader: PyPDFLoader = PyPDFLoader(pdf_file)
@@ -116,13 +137,15 @@ class DBNParser(DocumentsParser):
                 url,
             )
 
-            return self._chunk_documents_parallel(documents)
+            return documents
 
         except Exception:
             logger.exception("Failed to parse PDF from URL: %s", url)
             return []
 
     def _load_from_url(self, url: str) -> List[Document]:
+        from langchain_community.document_loaders import WebBaseLoader
+
         loader: WebBaseLoader = WebBaseLoader(url)
         documents: List[Document] = loader.load()
 
@@ -134,15 +157,30 @@ class DBNParser(DocumentsParser):
 
         return documents
 
-    def _load_from_file(self, path: str) -> List[Document]:
+    def _load_from_file(
+        self,
+        path: str,
+        source_name: Optional[str] = None,
+    ) -> List[Document]:
+        from langchain_community.document_loaders import (
+            BSHTMLLoader,
+            Docx2txtLoader,
+            PyPDFLoader,
+            TextLoader,
+        )
+
         extension: str = os.path.splitext(path)[1].lower()
 
-        loader: PyPDFLoader | Docx2txtLoader
+        loader: PyPDFLoader | Docx2txtLoader | TextLoader | BSHTMLLoader
 
         if extension == ".pdf":
             loader = PyPDFLoader(path)
         elif extension in {".docx", ".doc"}:
             loader = Docx2txtLoader(path)
+        elif extension in {".txt", ".md"}:
+            loader = TextLoader(path, encoding="utf-8")
+        elif extension in {".html", ".htm"}:
+            loader = BSHTMLLoader(path, open_encoding="utf-8")
         else:
             raise ValueError(f"Unsupported file type: {extension}")
 
@@ -151,14 +189,14 @@ class DBNParser(DocumentsParser):
         for doc in documents:
             doc.metadata.update(
                 {
-                    "source": os.path.basename(path),
+                    "source": source_name or os.path.basename(path),
                     "file_type": extension,
                 }
             )
 
         logger.info(
             "Loaded documents from file | file=%s pages=%d",
-            os.path.basename(path),
+            source_name or os.path.basename(path),
             len(documents),
         )
 
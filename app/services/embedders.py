@@ -1,7 +1,13 @@
 from abc import abstractmethod
-from typing import Protocol
+from typing import Any, List, Optional, Protocol, Sequence, Tuple
 import logging
+import os
+import re
+import threading
+import time
+import zlib
 
+import numpy as np
 import torch
 from transformers import (
     AutoTokenizer,
@@ -9,7 +15,8 @@ from transformers import (
     AutoModelForSequenceClassification,
 )
 
-from app.models.parameters import BiEncoderParams, CrossEncoderParams
+from app.models.parameters import BiEncoderParams, CrossEncoderParams, StubEncoderParams
+from app.services.telemetry import span
 
 logger = logging.getLogger("Embedders")
 
@@ -19,20 +26,87 @@ class BiEmbedder(Protocol):
     def get_embedding(self, query: str) -> torch.Tensor:
         ...
 
+    @abstractmethod
+    def get_embeddings(self, texts: List[str]) -> torch.Tensor:
+        ...
+
+    def warm_up(self) -> None:
+        """Dummy forward pass, so the first request does not pay for loading and allocation."""
+        self.get_embeddings(["warm-up"])
+
+
+def resolve_device(device: Optional[str]) -> str:
+    return device or ("cuda" if torch.cuda.is_available() else "cpu")
 
-class HFBiEmbedder(BiEmbedder):
-    def __init__(self, params: BiEncoderParams):
+
+class _LazyHFModel:
+    """Tokenizer and weights are loaded on first use (or by warm_up), not in the constructor."""
+
+    kind = "Model"
+
+    def __init__(self, params: Any):
         self.params = params
-        self.device = params.device
-        self.tokenizer = AutoTokenizer.from_pretrained(params.model_name)
-        self.model = AutoModel.from_pretrained(params.model_name).to(self.device)
-        self.model.eval()
-        logger.info(f"BiEmbedder loaded: {params.model_name} on {self.device}")
+        self.device = resolve_device(params.device)
+        self._tokenizer = None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def _load_model(self) -> Any:
+        raise NotImplementedError
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> None:
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            started = time.perf_counter()
+            tokenizer = AutoTokenizer.from_pretrained(self.params.model_name)
+            model = self._load_model().to(self.device)
+            model.eval()
+            self._tokenizer = tokenizer
+            # Set last: a loaded model implies a loaded tokenizer.
+            self._model = model
+        logger.info(
+            f"{self.kind} loaded: {self.params.model_name} on {self.device} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    @property
+    def tokenizer(self) -> Any:
+        self.load()
+        return self._tokenizer
+
+    @property
+    def model(self) -> Any:
+        self.load()
+        return self._model
+
+
+class HFBiEmbedder(_LazyHFModel, BiEmbedder):
+    kind = "BiEmbedder"
+
+    def _load_model(self) -> Any:
+        return AutoModel.from_pretrained(self.params.model_name)
+
+    def warm_up(self) -> None:
+        # Load outside get_embeddings, which turns errors into zero vectors.
+        self.load()
+        super().warm_up()
 
     def get_embedding(self, query: str) -> torch.Tensor:
+        return self.get_embeddings([query])[0]
+
+    def get_embeddings(self, texts: List[str]) -> torch.Tensor:
+        if not texts:
+            return torch.empty(0, self.model.config.hidden_size, device=self.device)
         try:
             encoded = self.tokenizer(
-                query,
+                texts,
                 return_tensors="pt",
                 truncation=True,
                 padding=True,
@@ -40,7 +114,8 @@ class HFBiEmbedder(BiEmbedder):
                 return_attention_mask=True,
             ).to(self.device)
 
-            with torch.no_grad():
+            with span("embedder.forward", batch_size=len(texts)) as attrs, torch.no_grad():
+                attrs["input_tokens"] = int(encoded["attention_mask"].sum())
                 out = self.model(**encoded)
                 attention_mask = encoded['attention_mask']
                 token_embeddings = out.last_hidden_state
@@ -53,12 +128,12 @@ class HFBiEmbedder(BiEmbedder):
                 if self.params.normalize:
                     emb = torch.nn.functional.normalize(emb, p=2, dim=1)
 
-            return emb.squeeze(0)
+            return emb
 
         except Exception as e:
-            logger.error(f"Embedding error for text (len={len(query)}): {str(e)}")
-            # Fallback: повертаємо zero vector
-            return torch.zeros(self.model.config.hidden_size, device=self.device)
+            logger.error(f"Embedding error for batch (size={len(texts)}): {str(e)}")
+            # Fallback: повертаємо zero vectors
+            return torch.zeros(len(texts), self.model.config.hidden_size, device=self.device)
 
 
 class CrossEmbedder(Protocol):
@@ -66,18 +141,28 @@ class CrossEmbedder(Protocol):
     def get_score(self, query: str, doc_text: str) -> float:
         ...
 
+    @abstractmethod
+    def get_scores(self, query: str, doc_texts: List[str]) -> List[float]:
+        ...
 
-class HFCrossEncoder(CrossEmbedder):
+    @abstractmethod
+    def get_pair_scores(self, pairs: Sequence[Tuple[str, str]]) -> List[float]:
+        """Scores (query, document) pairs that may belong to different queries."""
+        ...
+
+    def warm_up(self) -> None:
+        self.get_scores("warm-up", ["warm-up"])
 
-    def __init__(self, params: CrossEncoderParams):
-        self.params = params
-        self.device = params.device
-        self.tokenizer = AutoTokenizer.from_pretrained(params.model_name)
-        self.model = AutoModelForSequenceClassification.from_pretrained(
-            params.model_name
-        ).to(self.device)
-        self.model.eval()
-        logger.info(f"CrossEncoder loaded: {params.model_name} on {self.device}")
+
+class HFCrossEncoder(_LazyHFModel, CrossEmbedder):
+    kind = "CrossEncoder"
+
+    def _load_model(self) -> Any:
+        return AutoModelForSequenceClassification.from_pretrained(self.params.model_name)
+
+    def warm_up(self) -> None:
+        self.load()
+        super().warm_up()
 
     def get_score(self, query: str, doc_text: str) -> float:
         try:
@@ -100,4 +185,163 @@ class HFCrossEncoder(CrossEmbedder):
             return float(score.item())
         except Exception as e:
             logger.error(f"Scoring error: {str(e)}")
-            return 0.0
\ No newline at end of file
+            return 0.0
+
+    def get_scores(self, query: str, doc_texts: List[str], batch_size: int = 16) -> List[float]:
+        return self.get_pair_scores([(query, text) for text in doc_texts], batch_size)
+
+    def get_pair_scores(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 16) -> List[float]:
+        scores: List[float] = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            try:
+                inputs = self.tokenizer(
+                    [query for query, _ in batch],
+                    [text for _, text in batch],
+                    return_tensors="pt",
+                    truncation=True,
+                    padding=True,
+                    max_length=self.params.max_length,
+                    return_attention_mask=True,
+                ).to(self.device)
+
+                with span("reranker.forward", batch_size=len(batch)) as attrs, torch.no_grad():
+                    attrs["input_tokens"] = int(inputs["attention_mask"].sum())
+                    logits = self.model(**inputs).logits
+                    if logits.shape[-1] == 2:
+                        batch_scores = torch.softmax(logits, dim=1)[:, 1]
+                    else:
+                        batch_scores = torch.sigmoid(logits).squeeze(-1)
+                scores.extend(float(score) for score in batch_scores.tolist())
+            except Exception as e:
+                logger.error(f"Scoring error for batch (size={len(batch)}): {str(e)}")
+                scores.extend([0.0] * len(batch))
+        return scores
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _simulate_forward(params: StubEncoderParams, batch_size: int) -> None:
+    delay = params.seconds_per_batch + params.seconds_per_item * batch_size
+    if delay > 0:
+        time.sleep(delay)
+
+
+class StubBiEmbedder(BiEmbedder):
+    """Feature-hashed bag of words; texts sharing words get similar vectors."""
+
+    loaded = True
+
+    def __init__(
+            self,
+            params: BiEncoderParams = BiEncoderParams(),
+            stub_params: StubEncoderParams = StubEncoderParams(),
+    ):
+        self.params = params
+        self.stub_params = stub_params
+        self.device = "cpu"
+        logger.info(f"Stub BiEmbedder: dim={stub_params.dim}")
+
+    def load(self) -> None:
+        pass
+
+    def get_embedding(self, query: str) -> torch.Tensor:
+        return self.get_embeddings([query])[0]
+
+    def get_embeddings(self, texts: List[str]) -> torch.Tensor:
+        dim = self.stub_params.dim
+        emb = np.zeros((len(texts), dim), dtype=np.float32)
+        with span("embedder.forward", batch_size=len(texts)) as attrs:
+            n_tokens = 0
+            for row, text in enumerate(texts):
+                tokens = _tokens(text)
+                n_tokens += len(tokens)
+                for token in tokens:
+                    h = zlib.crc32(token.encode("utf-8"))
+                    emb[row, h % dim] += 1.0 if h & 0x80000000 else -1.0
+            attrs["input_tokens"] = n_tokens
+            _simulate_forward(self.stub_params, len(texts))
+        if self.params.normalize and len(texts):
+            norms = np.linalg.norm(emb, axis=1, keepdims=True)
+            emb /= np.maximum(norms, 1e-9)
+        return torch.from_numpy(emb)
+
+
+class StubCrossEncoder(CrossEmbedder):
+    """Scores a document by the share of query words it contains."""
+
+    loaded = True
+
+    def __init__(
+            self,
+            params: CrossEncoderParams = CrossEncoderParams(),
+            stub_params: StubEncoderParams = StubEncoderParams(),
+    ):
+        self.params = params
+        self.stub_params = stub_params
+        self.device = "cpu"
+        logger.info("Stub CrossEncoder loaded")
+
+    def load(self) -> None:
+        pass
+
+    def get_score(self, query: str, doc_text: str) -> float:
+        return self.get_scores(query, [doc_text])[0]
+
+    def get_scores(self, query: str, doc_texts: List[str], batch_size: int = 16) -> List[float]:
+        return self.get_pair_scores([(query, text) for text in doc_texts], batch_size)
+
+    def get_pair_scores(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 16) -> List[float]:
+        scores: List[float] = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            with span("reranker.forward", batch_size=len(batch)) as attrs:
+                tokens = [(set(_tokens(query)), set(_tokens(text))) for query, text in batch]
+                attrs["input_tokens"] = sum(len(q) + len(d) for q, d in tokens)
+                scores.extend(len(q & d) / len(q) if q else 0.0 for q, d in tokens)
+                _simulate_forward(self.stub_params, len(batch))
+        return scores
+
+
+def _stub_params() -> StubEncoderParams:
+    return StubEncoderParams(
+        dim=int(os.getenv("STUB_ENCODER_DIM", StubEncoderParams.dim)),
+        seconds_per_batch=float(os.getenv("STUB_ENCODER_BATCH_SECONDS", StubEncoderParams.seconds_per_batch)),
+        seconds_per_item=float(os.getenv("STUB_ENCODER_ITEM_SECONDS", StubEncoderParams.seconds_per_item)),
+    )
+
+
+def _backend(backend: Optional[str]) -> str:
+    return (backend or os.getenv("EMBEDDER_BACKEND", "hf")).lower()
+
+
+def create_bi_embedder(params: BiEncoderParams = BiEncoderParams(), backend: Optional[str] = None) -> BiEmbedder:
+    # EMBEDDER_BACKEND=stub runs without model downloads or a GPU (load tests, CI);
+    # "sidecar" sends batches to `python -m app.inference_server` over INFERENCE_SOCKET.
+    backend = _backend(backend)
+    if backend == "stub":
+        return StubBiEmbedder(params, _stub_params())
+    if backend == "sidecar":
+        from app.services.inference_sidecar import RemoteBiEmbedder, get_sidecar_client
+
+        return RemoteBiEmbedder(params, get_sidecar_client())
+    return HFBiEmbedder(params)
+
+
+def create_cross_encoder(
+        params: CrossEncoderParams = CrossEncoderParams(),
+        backend: Optional[str] = None,
+) -> CrossEmbedder:
+    backend = _backend(backend)
+    if backend == "stub":
+        return StubCrossEncoder(params, _stub_params())
+    if backend == "sidecar":
+        from app.services.inference_sidecar import RemoteCrossEncoder, get_sidecar_client
+
+        return RemoteCrossEncoder(params, get_sidecar_client())
+    return HFCrossEncoder(params)
@@ -0,0 +1,48 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.services.inference_scheduler import INTERACTIVE, Ticket, get_inference_scheduler
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock: threading.Lock = threading.Lock()
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers: int = int(os.getenv("INFERENCE_WORKERS", "4"))
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix="inference",
+                )
+                logger.info("Inference executor started | workers=%d", max_workers)
+    return _executor
+
+
+async def run_inference(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    # Unlike asyncio.to_thread, run_in_executor does not carry context
+    # variables over; copy them so spans land in the caller's trace.
+    ctx: contextvars.Context = contextvars.copy_context()
+    scheduler = get_inference_scheduler()
+    # Submitted before it queues for an executor thread, so ingestion yields as soon as a query arrives.
+    ticket: Ticket = scheduler.submit(INTERACTIVE)
+    try:
+        return await loop.run_in_executor(
+            get_inference_executor(),
+            functools.partial(ctx.run, scheduler.run, ticket, fn, *args, **kwargs),
+        )
+    finally:
+        scheduler.withdraw(ticket)
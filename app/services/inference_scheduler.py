@@ -0,0 +1,248 @@
+"""Priority scheduling for encoder work that shares the CPU.
+
+Interactive work (retrieval, reranking and packing for live queries) and batch
+work (embedding ingested documents) take a slot before each call or
+micro-batch. Batch micro-batches wait while interactive work is queued or
+running, so a large ingest yields to live queries between micro-batches; they
+can also be throttled to a fraction of wall time.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+from app.models.parameters import InferenceSchedulerParams
+from app.services.telemetry import REGISTRY, Counter, Histogram
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+T = TypeVar("T")
+
+QUEUE_SECONDS: Histogram = REGISTRY.histogram(
+    "rag_inference_queue_seconds", "Time inference work waited for a scheduler slot.", ["priority"]
+)
+RUN_SECONDS: Histogram = REGISTRY.histogram(
+    "rag_inference_run_seconds", "Time inference work held a scheduler slot.", ["priority"]
+)
+ITEMS: Counter = REGISTRY.counter(
+    "rag_inference_items_total",
+    "Items run through the scheduler (texts per batch micro-batch, one per interactive call).",
+    ["priority"],
+)
+YIELDS: Counter = REGISTRY.counter(
+    "rag_inference_yields_total", "Batch micro-batches held back, by the priority class they yielded to.", ["priority"]
+)
+
+
+_current: threading.local = threading.local()
+
+
+def current_priority() -> str:
+    """Class of the slot the calling thread holds; work outside any slot counts as interactive."""
+    return getattr(_current, "priority", INTERACTIVE)
+
+
+@dataclass
+class Ticket:
+    priority: str
+    items: int = 1
+    submitted: float = field(default_factory=time.perf_counter)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    withdrawn: bool = False
+    # Class of the enclosing slot on the same thread, restored on finish.
+    outer_priority: Optional[str] = None
+
+
+class InferenceScheduler:
+    def __init__(self, params: InferenceSchedulerParams = InferenceSchedulerParams()) -> None:
+        if not 0 < params.batch_duty_cycle <= 1:
+            raise ValueError("batch_duty_cycle must be in (0, 1]")
+        self.params: InferenceSchedulerParams = params
+        self._cond: threading.Condition = threading.Condition()
+        self._waiting: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+        self._active: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+        self._interactive_idle_since: float = 0.0
+        self._batch_not_before: float = 0.0
+        self._stats: Dict[str, Dict[str, float]] = {
+            p: {"requests": 0, "items": 0, "queue_seconds": 0.0, "run_seconds": 0.0} for p in PRIORITIES
+        }
+        self._yields: int = 0
+
+    def submit(self, priority: str, items: int = 1) -> Ticket:
+        """Registers work as queued; queued interactive work already holds batch work back."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}")
+        with self._cond:
+            self._waiting[priority] += 1
+        return Ticket(priority, items)
+
+    def _batch_delay(self, ticket: Ticket, now: float) -> Optional[float]:
+        """Seconds until a batch ticket may be rechecked (None: until notified); 0 when it may start."""
+        if self._active[BATCH] >= self.params.batch_max_concurrency:
+            return None
+        if now < self._batch_not_before:
+            return self._batch_not_before - now
+        starve_at: float = ticket.submitted + self.params.batch_max_wait_ms / 1000
+        if now >= starve_at:
+            return 0.0
+        if self._waiting[INTERACTIVE] or self._active[INTERACTIVE]:
+            return starve_at - now
+        resume_at: float = self._interactive_idle_since + self.params.batch_resume_delay_ms / 1000
+        return max(0.0, min(resume_at, starve_at) - now)
+
+    def start(self, ticket: Ticket) -> None:
+        """Blocks until the ticket may run; interactive tickets never wait."""
+        with self._cond:
+            if ticket.priority == BATCH:
+                yielded: bool = False
+                while True:
+                    delay: Optional[float] = self._batch_delay(ticket, time.perf_counter())
+                    if delay == 0:
+                        break
+                    if not yielded and (self._waiting[INTERACTIVE] or self._active[INTERACTIVE]):
+                        yielded = True
+                        self._yields += 1
+                        YIELDS.inc(priority=INTERACTIVE)
+                    self._cond.wait(delay)
+            if not ticket.withdrawn:
+                self._waiting[ticket.priority] -= 1
+            self._active[ticket.priority] += 1
+            ticket.started = time.perf_counter()
+        # Remote encoders (the inference sidecar) pass this class on with each request.
+        ticket.outer_priority = current_priority()
+        _current.priority = ticket.priority
+        self._apply_threads(ticket.priority)
+
+    def finish(self, ticket: Ticket) -> None:
+        with self._cond:
+            if ticket.started is None or ticket.finished is not None:
+                return
+            _current.priority = ticket.outer_priority or INTERACTIVE
+            now: float = time.perf_counter()
+            ticket.finished = now
+            self._active[ticket.priority] -= 1
+            if ticket.priority == INTERACTIVE and not self._active[INTERACTIVE]:
+                self._interactive_idle_since = now
+            elif ticket.priority == BATCH and self.params.batch_duty_cycle < 1:
+                duty: float = self.params.batch_duty_cycle
+                self._batch_not_before = max(self._batch_not_before, now + (now - ticket.started) * (1 - duty) / duty)
+            stats: Dict[str, float] = self._stats[ticket.priority]
+            stats["requests"] += 1
+            stats["items"] += ticket.items
+            stats["queue_seconds"] += ticket.started - ticket.submitted
+            stats["run_seconds"] += now - ticket.started
+            self._cond.notify_all()
+        QUEUE_SECONDS.observe(ticket.started - ticket.submitted, priority=ticket.priority)
+        RUN_SECONDS.observe(now - ticket.started, priority=ticket.priority)
+        ITEMS.inc(ticket.items, priority=ticket.priority)
+
+    def withdraw(self, ticket: Ticket) -> None:
+        """Drops a ticket that was submitted but will never start (e.g. a cancelled request)."""
+        with self._cond:
+            if ticket.started is None and not ticket.withdrawn:
+                ticket.withdrawn = True
+                self._waiting[ticket.priority] -= 1
+                self._cond.notify_all()
+
+    def _apply_threads(self, priority: str) -> None:
+        threads: int = self.params.interactive_threads if priority == INTERACTIVE else self.params.batch_threads
+        # With the OpenMP backend of CPU builds this is a per-thread setting, so
+        # interactive and ingestion threads each keep their share of cores.
+        if threads <= 0:
+            return
+        # Imported here so the graph nodes importing app.services.inference do not pull in torch.
+        import torch
+
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+
+    def run(self, ticket: Ticket, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self.start(ticket)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.finish(ticket)
+
+    @contextmanager
+    def slot(self, priority: str, items: int = 1) -> Iterator[Ticket]:
+        ticket: Ticket = self.submit(priority, items)
+        self.start(ticket)
+        try:
+            yield ticket
+        finally:
+            self.finish(ticket)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            classes: Dict[str, Dict[str, Any]] = {}
+            for priority, stats in self._stats.items():
+                requests: float = stats["requests"]
+                classes[priority] = {
+                    "waiting": self._waiting[priority],
+                    "active": self._active[priority],
+                    "requests": int(requests),
+                    "items": int(stats["items"]),
+                    "avg_queue_ms": round(stats["queue_seconds"] / requests * 1000, 2) if requests else None,
+                    "avg_run_ms": round(stats["run_seconds"] / requests * 1000, 2) if requests else None,
+                }
+            return {
+                "classes": classes,
+                "batch_yields": self._yields,
+                "interactive_threads": self.params.interactive_threads,
+                "batch_threads": self.params.batch_threads,
+                "batch_duty_cycle": self.params.batch_duty_cycle,
+            }
+
+
+def _default_threads() -> Dict[str, int]:
+    cpus: int = os.cpu_count() or 1
+    if cpus < 4:
+        return {"interactive": 0, "batch": 0}
+    batch: int = max(1, cpus // 4)
+    return {"interactive": cpus - batch, "batch": batch}
+
+
+_scheduler: Optional[InferenceScheduler] = None
+_scheduler_lock: threading.Lock = threading.Lock()
+
+
+def get_inference_scheduler() -> InferenceScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                threads: Dict[str, int] = _default_threads()
+                params = InferenceSchedulerParams(
+                    interactive_threads=int(os.getenv("SCHEDULER_INTERACTIVE_THREADS", threads["interactive"])),
+                    batch_threads=int(os.getenv("SCHEDULER_BATCH_THREADS", threads["batch"])),
+                    batch_max_concurrency=int(
+                        os.getenv("SCHEDULER_BATCH_CONCURRENCY", InferenceSchedulerParams.batch_max_concurrency)
+                    ),
+                    batch_duty_cycle=float(
+                        os.getenv("SCHEDULER_BATCH_DUTY_CYCLE", InferenceSchedulerParams.batch_duty_cycle)
+                    ),
+                    batch_resume_delay_ms=float(
+                        os.getenv("SCHEDULER_BATCH_RESUME_MS", InferenceSchedulerParams.batch_resume_delay_ms)
+                    ),
+                    batch_max_wait_ms=float(
+                        os.getenv("SCHEDULER_BATCH_MAX_WAIT_MS", InferenceSchedulerParams.batch_max_wait_ms)
+                    ),
+                )
+                _scheduler = InferenceScheduler(params)
+                logger.info(
+                    "Inference scheduler started | interactive_threads=%d batch_threads=%d "
+                    "batch_concurrency=%d duty_cycle=%.2f",
+                    params.interactive_threads,
+                    params.batch_threads,
+                    params.batch_max_concurrency,
+                    params.batch_duty_cycle,
+                )
+    return _scheduler
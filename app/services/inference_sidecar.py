@@ -0,0 +1,523 @@
+"""Shared encoder process for several API workers, over a Unix domain socket.
+
+Frames are ``u32 length | u8 op | u8 priority | payload`` (little-endian;
+``length`` counts the op and priority bytes and the payload; priority is 0 for
+interactive and 1 for batch work, and 0 in replies). Strings travel as
+``u32 count | u32 byte_len * count | utf-8 bytes`` and float arrays as raw
+float32, so no JSON sits on the hot path:
+
+    EMBED  request: strings                        reply: u32 rows | u32 dim | f32[rows * dim]
+    SCORE  request: strings (query, doc, ...)      reply: u32 n | f32[n]
+    INFO   request: empty                          reply: utf-8 JSON (model names, stats)
+    ERROR  reply only: utf-8 message
+
+Each connection carries one request at a time; clients keep a pool of
+connections. Requests from all connections are merged into shared batches of
+one priority class, and interactive batches go first, as in the in-process
+InferenceScheduler.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+import torch
+
+from app.models.parameters import BiEncoderParams, CrossEncoderParams, InferenceSidecarParams
+from app.services.embedders import BiEmbedder, CrossEmbedder
+from app.services.inference_scheduler import BATCH, INTERACTIVE, PRIORITIES, current_priority
+from app.services.telemetry import span
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+OP_EMBED = 1
+OP_SCORE = 2
+OP_INFO = 3
+OP_ERROR = 255
+
+_HEADER = struct.Struct("<IBB")
+_PRIORITY_CODES: Dict[str, int] = {INTERACTIVE: 0, BATCH: 1}
+_U32 = struct.Struct("<I")
+_SHAPE = struct.Struct("<II")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class InferenceSidecarError(RuntimeError):
+    pass
+
+
+def pack_frame(op: int, payload: bytes, priority: str = INTERACTIVE) -> bytes:
+    return _HEADER.pack(len(payload) + 2, op, _PRIORITY_CODES[priority]) + payload
+
+
+def pack_strings(texts: Sequence[str]) -> bytes:
+    encoded: List[bytes] = [text.encode("utf-8") for text in texts]
+    return struct.pack(f"<I{len(encoded)}I", len(encoded), *map(len, encoded)) + b"".join(encoded)
+
+
+def unpack_strings(buf: memoryview) -> List[str]:
+    (count,) = _U32.unpack_from(buf, 0)
+    lengths: Tuple[int, ...] = struct.unpack_from(f"<{count}I", buf, _U32.size)
+    offset: int = _U32.size * (count + 1)
+    texts: List[str] = []
+    for length in lengths:
+        texts.append(bytes(buf[offset:offset + length]).decode("utf-8"))
+        offset += length
+    if offset != len(buf):
+        raise ValueError("Malformed string list")
+    return texts
+
+
+def pack_matrix(matrix: np.ndarray) -> bytes:
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+    return _SHAPE.pack(*matrix.shape) + matrix.tobytes()
+
+
+def unpack_matrix(buf: memoryview) -> np.ndarray:
+    rows, dim = _SHAPE.unpack_from(buf, 0)
+    # Copy: frombuffer over the reply is read-only, and torch wants a writable array.
+    return np.frombuffer(buf, dtype="<f4", count=rows * dim, offset=_SHAPE.size).reshape(rows, dim).copy()
+
+
+def pack_vector(values: Sequence[float]) -> bytes:
+    vector: np.ndarray = np.asarray(values, dtype="<f4")
+    return _U32.pack(len(vector)) + vector.tobytes()
+
+
+def unpack_vector(buf: memoryview) -> List[float]:
+    (count,) = _U32.unpack_from(buf, 0)
+    return np.frombuffer(buf, dtype="<f4", count=count, offset=_U32.size).tolist()
+
+
+class _Batcher(Generic[T, R]):
+    """Merges concurrent submissions into one call of ``run`` on a dedicated thread.
+
+    A batch closes when it reaches ``max_items`` or ``max_wait`` after its first
+    request; requests arriving while a batch runs form the next one. Batches
+    hold one priority class: interactive requests are served first, and a batch
+    request waiting longer than ``batch_max_wait`` goes ahead of them once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[List[T]], Sequence[R]],
+        max_items: int,
+        max_wait: float,
+        batch_max_wait: float,
+    ) -> None:
+        self.name: str = name
+        self.run: Callable[[List[T]], Sequence[R]] = run
+        self.max_items: int = max_items
+        self.max_wait: float = max_wait
+        self.batch_max_wait: float = batch_max_wait
+        self._queues: Dict[str, Deque[Tuple[List[T], asyncio.Future, float]]] = {p: deque() for p in PRIORITIES}
+        self._arrived: asyncio.Event = asyncio.Event()
+        # One thread per model: forward passes of the same model never overlap.
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sidecar-{name}")
+        self._task: Optional[asyncio.Task] = None
+        # Requests taken off the queues but not answered yet (forming or running batch).
+        self._pending: List[Tuple[List[T], asyncio.Future, float]] = []
+        self._stopped: bool = False
+        self.stats: Dict[str, Dict[str, int]] = {p: {"requests": 0, "batches": 0, "items": 0} for p in PRIORITIES}
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # Fail everything still waiting so clients get an error instead of a timeout.
+        waiting: List[Tuple[List[T], asyncio.Future, float]] = self._pending
+        for queue in self._queues.values():
+            waiting.extend(queue)
+            queue.clear()
+        for _, future, _ in waiting:
+            if not future.done():
+                future.set_exception(InferenceSidecarError("Inference sidecar is shutting down"))
+        self._pending = []
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, items: List[T], priority: str = INTERACTIVE) -> Sequence[R]:
+        if self._stopped:
+            raise InferenceSidecarError("Inference sidecar is shutting down")
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._queues[priority].append((items, future, loop.time()))
+        self._arrived.set()
+        return await future
+
+    def _timed_run(self, items: List[T], requests: int, priority: str) -> Sequence[R]:
+        with span(f"sidecar.{self.name}", batch_size=len(items), requests=requests, priority=priority):
+            return self.run(items)
+
+    def _next_priority(self, now: float) -> str:
+        batch_queue = self._queues[BATCH]
+        if not self._queues[INTERACTIVE]:
+            return BATCH
+        if batch_queue and now - batch_queue[0][2] >= self.batch_max_wait:
+            return BATCH
+        return INTERACTIVE
+
+    async def _wait_for_request(self, timeout: Optional[float]) -> bool:
+        self._arrived.clear()
+        try:
+            await asyncio.wait_for(self._arrived.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _collect(self) -> Tuple[str, List[Tuple[List[T], asyncio.Future, float]]]:
+        loop = asyncio.get_running_loop()
+        while not any(self._queues.values()):
+            await self._wait_for_request(None)
+        priority: str = self._next_priority(loop.time())
+        queue = self._queues[priority]
+        batch: List[Tuple[List[T], asyncio.Future, float]] = [queue.popleft()]
+        self._pending = batch
+        size: int = len(batch[0][0])
+        deadline: float = loop.time() + self.max_wait
+        while size < self.max_items:
+            if queue:
+                item = queue.popleft()
+                batch.append(item)
+                size += len(item[0])
+                continue
+            # Ingestion does not hold a forward pass open once a live query is waiting.
+            if priority == BATCH and self._queues[INTERACTIVE]:
+                break
+            timeout: float = deadline - loop.time()
+            if timeout <= 0 or not await self._wait_for_request(timeout):
+                break
+        return priority, batch
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            priority, batch = await self._collect()
+            flat: List[T] = [x for items, _, _ in batch for x in items]
+            stats: Dict[str, int] = self.stats[priority]
+            stats["requests"] += len(batch)
+            stats["batches"] += 1
+            stats["items"] += len(flat)
+            try:
+                results: Sequence[R] = await loop.run_in_executor(
+                    self._executor, self._timed_run, flat, len(batch), priority
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._pending = []
+                continue
+
+            offset: int = 0
+            for items, future, _ in batch:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(items)])
+                offset += len(items)
+            self._pending = []
+
+
+class InferenceSidecarServer:
+    def __init__(
+        self,
+        bi_embedder: BiEmbedder,
+        cross_encoder: CrossEmbedder,
+        params: InferenceSidecarParams = InferenceSidecarParams(),
+    ) -> None:
+        self.bi_embedder: BiEmbedder = bi_embedder
+        self.cross_encoder: CrossEmbedder = cross_encoder
+        self.params: InferenceSidecarParams = params
+        self.embedding_dim: int = int(bi_embedder.get_embeddings(["warm-up"]).shape[-1])
+        self._embed: Optional[_Batcher[str, np.ndarray]] = None
+        self._score: Optional[_Batcher[Tuple[str, str], float]] = None
+        self._connections: int = 0
+        self._in_flight: int = 0
+        self._idle: Optional[asyncio.Condition] = None
+        self._handlers: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._started: float = time.time()
+
+    def _run_embed(self, texts: List[str]) -> np.ndarray:
+        return self.bi_embedder.get_embeddings(texts).cpu().numpy()
+
+    def _run_score(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        return self.cross_encoder.get_pair_scores(pairs, batch_size=self.params.rerank_batch_size)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "embedding_dim": self.embedding_dim,
+            "bi_encoder": self.bi_embedder.params.model_name,
+            "cross_encoder": self.cross_encoder.params.model_name,
+            "connections": self._connections,
+            "uptime_seconds": round(time.time() - self._started, 1),
+            "embed": dict(self._embed.stats) if self._embed else None,
+            "score": dict(self._score.stats) if self._score else None,
+        }
+
+    async def _dispatch(self, op: int, priority: str, payload: memoryview) -> bytes:
+        if op == OP_EMBED:
+            texts: List[str] = unpack_strings(payload)
+            if not texts:
+                return pack_matrix(np.zeros((0, self.embedding_dim), dtype=np.float32))
+            return pack_matrix(np.asarray(await self._embed.submit(texts, priority)))
+        if op == OP_SCORE:
+            flat: List[str] = unpack_strings(payload)
+            if len(flat) % 2:
+                raise ValueError("SCORE expects (query, document) pairs")
+            pairs: List[Tuple[str, str]] = list(zip(flat[0::2], flat[1::2]))
+            return pack_vector(await self._score.submit(pairs, priority) if pairs else [])
+        if op == OP_INFO:
+            return json.dumps(self.info()).encode("utf-8")
+        raise ValueError(f"Unknown op {op}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections += 1
+        self._handlers[asyncio.current_task()] = writer
+        try:
+            while True:
+                length, op, priority_code = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                if length < 2 or length > self.params.max_frame_bytes or priority_code >= len(PRIORITIES):
+                    writer.write(pack_frame(OP_ERROR, f"Invalid frame header {length}/{priority_code}".encode()))
+                    await writer.drain()
+                    return
+                payload: bytes = await reader.readexactly(length - 2)
+                priority: str = PRIORITIES[priority_code]
+                self._in_flight += 1
+                try:
+                    try:
+                        reply_op, reply = op, await self._dispatch(op, priority, memoryview(payload))
+                    except InferenceSidecarError as e:
+                        reply_op, reply = OP_ERROR, f"{type(e).__name__}: {e}".encode("utf-8")
+                    except Exception as e:
+                        logger.exception("Sidecar request failed | op=%d", op)
+                        reply_op, reply = OP_ERROR, f"{type(e).__name__}: {e}".encode("utf-8")
+                    writer.write(pack_frame(reply_op, reply))
+                    await writer.drain()
+                finally:
+                    self._in_flight -= 1
+                    async with self._idle:
+                        self._idle.notify_all()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections -= 1
+            self._handlers.pop(asyncio.current_task(), None)
+            writer.close()
+
+    def _batcher(self, name: str, run: Callable[[List[Any]], Sequence[Any]]) -> _Batcher:
+        return _Batcher(
+            name,
+            run,
+            self.params.max_batch_size,
+            self.params.max_wait_ms / 1000,
+            self.params.batch_max_wait_ms / 1000,
+        )
+
+    async def serve(self, stop: asyncio.Event) -> None:
+        path: Path = Path(self.params.socket_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A socket left behind by a crashed server would make bind() fail.
+        path.unlink(missing_ok=True)
+
+        self._idle = asyncio.Condition()
+        self._embed = self._batcher("embed", self._run_embed)
+        self._score = self._batcher("score", self._run_score)
+        self._embed.start()
+        self._score.start()
+
+        server = await asyncio.start_unix_server(self._handle, path=str(path), limit=self.params.max_frame_bytes)
+        os.chmod(path, 0o660)
+        logger.info(
+            "Inference sidecar listening | socket=%s dim=%d max_batch=%d max_wait_ms=%.1f",
+            path,
+            self.embedding_dim,
+            self.params.max_batch_size,
+            self.params.max_wait_ms,
+        )
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            await self._embed.stop()
+            await self._score.stop()
+            # Let handlers send the shutdown errors before the loop tears them down.
+            try:
+                async with self._idle:
+                    await asyncio.wait_for(self._idle.wait_for(lambda: not self._in_flight), timeout=5.0)
+            except asyncio.TimeoutError:
+                logger.warning("Sidecar stopped with %d unanswered requests", self._in_flight)
+            # Closing the idle connections ends their handlers before the loop cancels them.
+            handlers: List[asyncio.Task] = list(self._handlers)
+            for writer in self._handlers.values():
+                writer.close()
+            if handlers:
+                await asyncio.wait(handlers, timeout=1.0)
+            path.unlink(missing_ok=True)
+            logger.info("Inference sidecar stopped | %s", json.dumps(self.info()))
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    buf: bytearray = bytearray(size)
+    view: memoryview = memoryview(buf)
+    received: int = 0
+    while received < size:
+        n: int = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Sidecar closed the connection")
+        received += n
+    return buf
+
+
+class SidecarClient:
+    """Thread-safe client; each in-flight request uses its own pooled connection."""
+
+    def __init__(self, params: InferenceSidecarParams = InferenceSidecarParams(), max_idle: int = 16) -> None:
+        self.params: InferenceSidecarParams = params
+        self.max_idle: int = max_idle
+        self._idle: List[socket.socket] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.params.connect_timeout_seconds)
+        try:
+            sock.connect(self.params.socket_path)
+        except OSError as e:
+            sock.close()
+            raise InferenceSidecarError(f"Cannot connect to inference sidecar at {self.params.socket_path}: {e}") from e
+        sock.settimeout(self.params.request_timeout_seconds)
+        return sock
+
+    def _release(self, sock: socket.socket) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def request(self, op: int, payload: bytes, priority: str = INTERACTIVE) -> memoryview:
+        frame: bytes = pack_frame(op, payload, priority)
+        for attempt in range(2):
+            with self._lock:
+                sock: Optional[socket.socket] = self._idle.pop() if self._idle else None
+            reused: bool = sock is not None
+            sock = sock or self._connect()
+            try:
+                sock.sendall(frame)
+                length, reply_op, _ = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+                reply: bytearray = _recv_exact(sock, length - 2)
+            except OSError as e:
+                sock.close()
+                # A pooled connection may predate a sidecar restart; retry once on a fresh one.
+                if reused and attempt == 0:
+                    continue
+                raise InferenceSidecarError(f"Inference sidecar request failed: {e}") from e
+            self._release(sock)
+            if reply_op == OP_ERROR:
+                raise InferenceSidecarError(reply.decode("utf-8", "replace"))
+            return memoryview(reply)
+        raise InferenceSidecarError("Inference sidecar request failed")
+
+    def embed(self, texts: Sequence[str], priority: str = INTERACTIVE) -> np.ndarray:
+        return unpack_matrix(self.request(OP_EMBED, pack_strings(texts), priority))
+
+    def score(self, pairs: Sequence[Tuple[str, str]], priority: str = INTERACTIVE) -> List[float]:
+        flat: List[str] = [text for pair in pairs for text in pair]
+        return unpack_vector(self.request(OP_SCORE, pack_strings(flat), priority))
+
+    def info(self) -> Dict[str, Any]:
+        return json.loads(bytes(self.request(OP_INFO, b"")))
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+_client: Optional[SidecarClient] = None
+_client_lock: threading.Lock = threading.Lock()
+
+
+def get_sidecar_client() -> SidecarClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SidecarClient(
+                    InferenceSidecarParams(
+                        socket_path=os.getenv("INFERENCE_SOCKET", InferenceSidecarParams.socket_path),
+                    )
+                )
+    return _client
+
+
+class RemoteBiEmbedder(BiEmbedder):
+    """Bi-encoder served by the inference sidecar; errors raise instead of returning zero vectors."""
+
+    def __init__(self, params: BiEncoderParams, client: SidecarClient) -> None:
+        self.params = params
+        self.client = client
+        self.device = "cpu"
+        self._dim: Optional[int] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._dim is not None
+
+    def load(self) -> None:
+        info: Dict[str, Any] = self.client.info()
+        self._dim = info["embedding_dim"]
+        if info["bi_encoder"] != self.params.model_name:
+            logger.warning("Sidecar serves %s, expected %s", info["bi_encoder"], self.params.model_name)
+
+    def get_embedding(self, query: str) -> torch.Tensor:
+        return self.get_embeddings([query])[0]
+
+    def get_embeddings(self, texts: List[str]) -> torch.Tensor:
+        # The scheduler slot this thread holds tells ingestion from live queries.
+        priority: str = current_priority()
+        with span("sidecar.client.embed", batch_size=len(texts), priority=priority):
+            return torch.from_numpy(self.client.embed(texts, priority))
+
+
+class RemoteCrossEncoder(CrossEmbedder):
+    def __init__(self, params: CrossEncoderParams, client: SidecarClient) -> None:
+        self.params = params
+        self.client = client
+        self.device = "cpu"
+        self.loaded = False
+
+    def load(self) -> None:
+        self.client.info()
+        self.loaded = True
+
+    def get_score(self, query: str, doc_text: str) -> float:
+        return self.get_scores(query, [doc_text])[0]
+
+    def get_scores(self, query: str, doc_texts: List[str], batch_size: int = 16) -> List[float]:
+        return self.get_pair_scores([(query, text) for text in doc_texts])
+
+    def get_pair_scores(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 16) -> List[float]:
+        if not pairs:
+            return []
+        priority: str = current_priority()
+        with span("sidecar.client.score", batch_size=len(pairs), priority=priority):
+            return self.client.score(pairs, priority)
@@ -0,0 +1,112 @@
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+from langchain_core.documents import Document
+
+from app.models.parameters import BulkIngestParams
+from app.services.bulk_ingestion import BulkIngestor
+from app.services.documents_parser import DBNParser
+from app.services.job_queue import JobContext, JobQueue
+from app.services.uploads import remove_upload
+from app.services.vector_storage import VectorMemory
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class Ingestor:
+    def __init__(
+        self,
+        parser: DBNParser,
+        vector_memory: VectorMemory,
+    ) -> None:
+        self.parser: DBNParser = parser
+        self.vector_memory: VectorMemory = vector_memory
+
+    def index_file(self, ctx: JobContext) -> Dict[str, Any]:
+        path: str = ctx.payload["path"]
+        return self._index(ctx, path, "file")
+
+    def index_url(self, ctx: JobContext) -> Dict[str, Any]:
+        url: str = ctx.payload["url"]
+        return self._index(ctx, url, "url")
+
+    def delete(self, ctx: JobContext) -> Dict[str, Any]:
+        filter_metadata: Dict[str, Any] = ctx.payload["filter_metadata"]
+        ctx.update(stage="deleting")
+        self.vector_memory.delete_documents(filter_metadata)
+        return {"filter": filter_metadata}
+
+    def clear(self, ctx: JobContext) -> Dict[str, Any]:
+        ctx.update(stage="clearing")
+        self.vector_memory.clear()
+        return {"cleared": True}
+
+    @staticmethod
+    def cleanup_file(payload: Dict[str, Any]) -> None:
+        if payload.get("upload_dir"):
+            remove_upload(Path(payload["upload_dir"]))
+            logger.info("Deleted upload directory: %s", payload["upload_dir"])
+            return
+        path: Path = Path(payload["path"])
+        try:
+            path.unlink(missing_ok=True)
+            logger.info("Deleted temporary file: %s", path)
+        except OSError as e:
+            logger.warning("Failed to delete temp file %s: %s", path, e)
+
+    def _index(
+        self,
+        ctx: JobContext,
+        source: str,
+        source_type: str,
+    ) -> Dict[str, Any]:
+        ctx.update(stage="parsing")
+        pages: List[Document] = self.parser.load_pages(source, source_type)
+
+        ctx.update(stage="chunking", pages_parsed=len(pages))
+        docs: List[Document] = self.parser.chunk(pages)
+        if not docs:
+            logger.warning("No documents parsed from %s", source)
+            return {"source": source, "chunks": 0, "added": 0, "removed": 0, "unchanged": 0}
+
+        ctx.update(stage="embedding")
+        stats = self.vector_memory.add_documents(
+            docs,
+            progress=lambda n: ctx.update(chunks_embedded=n),
+        )
+        logger.info(
+            "Indexed %s | chunks=%d added=%d removed=%d unchanged=%d",
+            source,
+            len(docs),
+            stats.added,
+            stats.removed,
+            stats.unchanged,
+        )
+        return {
+            "source": source,
+            "chunks": len(docs),
+            "added": stats.added,
+            "removed": stats.removed,
+            "unchanged": stats.unchanged,
+        }
+
+
+def register_ingestion_jobs(
+    job_queue: JobQueue,
+    parser: DBNParser,
+    vector_memory: VectorMemory,
+    bulk_params: BulkIngestParams = BulkIngestParams(),
+) -> None:
+    ingestor: Ingestor = Ingestor(parser, vector_memory)
+    bulk_ingestor: BulkIngestor = BulkIngestor(
+        vector_memory,
+        parser.chunk_params,
+        bulk_params,
+    )
+    job_queue.register("file", ingestor.index_file, cleanup=Ingestor.cleanup_file)
+    job_queue.register("url", ingestor.index_url)
+    job_queue.register("archive", bulk_ingestor.index_archive, cleanup=Ingestor.cleanup_file)
+    job_queue.register("directory", bulk_ingestor.index_directory)
+    job_queue.register("delete", ingestor.delete)
+    job_queue.register("clear", ingestor.clear)
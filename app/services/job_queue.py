@@ -0,0 +1,398 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.models.parameters import JobQueueParams
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_retries INTEGER NOT NULL,
+    pages_parsed INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_pending
+    ON jobs (status, priority DESC, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    def __init__(self, queue: "JobQueue", job: Dict[str, Any]) -> None:
+        self.queue: JobQueue = queue
+        self.job_id: str = job["id"]
+        self.payload: Dict[str, Any] = job["payload"]
+        self.attempt: int = job["attempts"]
+
+    def update(
+        self,
+        stage: Optional[str] = None,
+        pages_parsed: Optional[int] = None,
+        chunks_embedded: Optional[int] = None,
+        result: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.queue._update_progress(
+            self.job_id,
+            stage=stage,
+            pages_parsed=pages_parsed,
+            chunks_embedded=chunks_embedded,
+            result=result,
+        )
+        self.check_cancelled()
+
+    def check_cancelled(self) -> None:
+        if self.queue._cancel_requested(self.job_id):
+            raise JobCancelled(self.job_id)
+
+
+JobHandler = Callable[[JobContext], Optional[Dict[str, Any]]]
+JobCleanup = Callable[[Dict[str, Any]], None]
+JobListener = Callable[[Dict[str, Any], str], None]
+
+
+class JobQueue:
+    def __init__(self, params: JobQueueParams = JobQueueParams()) -> None:
+        self.params: JobQueueParams = params
+        self._handlers: Dict[str, JobHandler] = {}
+        self._cleanups: Dict[str, JobCleanup] = {}
+        self._listeners: List[JobListener] = []
+        self._claim_lock: threading.Lock = threading.Lock()
+        self._stop: threading.Event = threading.Event()
+        self._workers: List[threading.Thread] = []
+
+        Path(self.params.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+        logger.info(
+            "JobQueue initialized | db=%s workers=%d max_retries=%d",
+            self.params.db_path,
+            self.params.num_workers,
+            self.params.max_retries,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection = sqlite3.connect(
+            self.params.db_path,
+            timeout=30,
+            isolation_level=None,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def register(
+        self,
+        kind: str,
+        handler: JobHandler,
+        cleanup: Optional[JobCleanup] = None,
+    ) -> None:
+        self._handlers[kind] = handler
+        if cleanup is not None:
+            self._cleanups[kind] = cleanup
+
+    def add_listener(self, listener: JobListener) -> None:
+        self._listeners.append(listener)
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int = 0,
+    ) -> str:
+        job_id: str = uuid.uuid4().hex
+        now: float = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, stage,"
+                " max_retries, created_at, available_at)"
+                " VALUES (?, ?, ?, ?, 'queued', 'queued', ?, ?, ?)",
+                (
+                    job_id,
+                    kind,
+                    json.dumps(payload, ensure_ascii=False),
+                    priority,
+                    self.params.max_retries,
+                    now,
+                    now,
+                ),
+            )
+        logger.info(
+            "Job enqueued | id=%s kind=%s priority=%d",
+            job_id,
+            kind,
+            priority,
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        query: str = "SELECT * FROM jobs"
+        args: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            args = (status,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, args + (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now: float = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', stage = 'cancelled',"
+                " finished_at = ? WHERE id = ? AND status = 'queued'",
+                (now, job_id),
+            )
+            cancelled_queued: bool = cursor.rowcount > 0
+            if not cancelled_queued:
+                conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1"
+                    " WHERE id = ? AND status = 'running'",
+                    (job_id,),
+                )
+
+        job: Optional[Dict[str, Any]] = self.get(job_id)
+        if job and cancelled_queued:
+            self._cleanup(job)
+        if job:
+            logger.info("Job cancel requested | id=%s status=%s", job_id, job["status"])
+        return job
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'requeued'"
+                " WHERE status = 'running'",
+            )
+        if cursor.rowcount:
+            logger.warning("Requeued %d interrupted jobs", cursor.rowcount)
+
+        self._stop.clear()
+        for idx in range(self.params.num_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"ingest-worker-{idx}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+        logger.info("JobQueue started | workers=%d", len(self._workers))
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        self._workers = []
+        logger.info("JobQueue stopped")
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job: Optional[Dict[str, Any]] = self._claim()
+            except sqlite3.Error:
+                logger.exception("Failed to claim job")
+                job = None
+            if job is None:
+                self._stop.wait(self.params.poll_interval_seconds)
+                continue
+            self._run(job)
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        if not self._handlers:
+            return None
+        now: float = time.time()
+        with self._claim_lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued'"
+                    " AND available_at <= ? AND kind IN ({})"
+                    " ORDER BY priority DESC, created_at LIMIT 1".format(
+                        ",".join("?" * len(self._handlers))
+                    ),
+                    (now, *self._handlers),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', stage = 'starting',"
+                    " attempts = attempts + 1, started_at = ?, error = NULL,"
+                    " pages_parsed = 0, chunks_embedded = 0"
+                    " WHERE id = ?",
+                    (now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job: Dict[str, Any] = self._row_to_job(row)
+        job["attempts"] += 1
+        job["status"] = "running"
+        return job
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        handler: JobHandler = self._handlers[job["kind"]]
+        ctx: JobContext = JobContext(self, job)
+        logger.info(
+            "Job started | id=%s kind=%s attempt=%d",
+            job["id"],
+            job["kind"],
+            job["attempts"],
+        )
+        try:
+            ctx.check_cancelled()
+            result: Optional[Dict[str, Any]] = handler(ctx)
+        except JobCancelled:
+            self._finish(job, "cancelled", stage="cancelled")
+            logger.info("Job cancelled | id=%s", job["id"])
+            return
+        except Exception as e:
+            if job["attempts"] <= job["max_retries"]:
+                delay: float = self.params.retry_backoff_seconds * (
+                    2 ** (job["attempts"] - 1)
+                )
+                with closing(self._connect()) as conn:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', stage = 'retrying',"
+                        " error = ?, available_at = ? WHERE id = ?",
+                        (str(e), time.time() + delay, job["id"]),
+                    )
+                logger.warning(
+                    "Job failed, retrying in %.1fs | id=%s attempt=%d error=%s",
+                    delay,
+                    job["id"],
+                    job["attempts"],
+                    e,
+                )
+                return
+            self._finish(job, "failed", stage="failed", error=str(e))
+            logger.error("Job failed | id=%s error=%s", job["id"], e)
+            return
+
+        self._finish(job, "succeeded", stage="done", result=result)
+        logger.info("Job succeeded | id=%s", job["id"])
+
+    def _finish(
+        self,
+        job: Dict[str, Any],
+        status: str,
+        stage: str,
+        error: Optional[str] = None,
+        result: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?,"
+                " result = COALESCE(?, result), finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    stage,
+                    error,
+                    json.dumps(result, ensure_ascii=False) if result else None,
+                    time.time(),
+                    job["id"],
+                ),
+            )
+        self._cleanup(job)
+        for listener in self._listeners:
+            try:
+                listener(job, status)
+            except Exception:
+                logger.exception("Job listener failed | id=%s", job["id"])
+
+    def _cleanup(self, job: Dict[str, Any]) -> None:
+        cleanup: Optional[JobCleanup] = self._cleanups.get(job["kind"])
+        if cleanup is None:
+            return
+        try:
+            cleanup(job["payload"])
+        except Exception:
+            logger.exception("Job cleanup failed | id=%s", job["id"])
+
+    def _update_progress(
+        self,
+        job_id: str,
+        stage: Optional[str],
+        pages_parsed: Optional[int],
+        chunks_embedded: Optional[int],
+        result: Optional[Dict[str, Any]],
+    ) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = COALESCE(?, stage),"
+                " pages_parsed = COALESCE(?, pages_parsed),"
+                " chunks_embedded = COALESCE(?, chunks_embedded),"
+                " result = COALESCE(?, result) WHERE id = ?",
+                (
+                    stage,
+                    pages_parsed,
+                    chunks_embedded,
+                    json.dumps(result, ensure_ascii=False) if result else None,
+                    job_id,
+                ),
+            )
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job: Dict[str, Any] = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+
+        started_at: Optional[float] = job["started_at"]
+        elapsed: float = 0.0
+        if started_at:
+            elapsed = (job["finished_at"] or time.time()) - started_at
+        job["elapsed_seconds"] = elapsed
+        job["throughput_chunks_per_sec"] = (
+            job["chunks_embedded"] / elapsed if elapsed > 0 else 0.0
+        )
+        return job
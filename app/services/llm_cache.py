@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.models.parameters import LLMCacheParams
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed
+    ON responses (accessed_at);
+"""
+
+
+def cache_key(model: str, params: Dict[str, Any], prompt: str) -> str:
+    prompt_hash: str = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    material: str = json.dumps(
+        {"model": model, "params": params, "prompt": prompt_hash},
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, params: LLMCacheParams = LLMCacheParams()) -> None:
+        self.params: LLMCacheParams = params
+        Path(params.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._local: threading.local = threading.local()
+        self._write_lock: threading.Lock = threading.Lock()
+        self._stats_lock: threading.Lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        with self._write_lock:
+            self._conn().executescript(_SCHEMA)
+            self._total_bytes: int = self._conn().execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+        logger.info(
+            "LLM cache opened | path=%s size=%d max_bytes=%d ttl=%s",
+            params.db_path,
+            self._total_bytes,
+            params.max_bytes,
+            params.ttl_seconds,
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.params.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _record(self, caller: Optional[str], hit: bool) -> None:
+        with self._stats_lock:
+            stats: Dict[str, int] = self._stats.setdefault(
+                caller or "unknown",
+                {"hits": 0, "misses": 0},
+            )
+            stats["hits" if hit else "misses"] += 1
+
+    def get(self, key: str, caller: Optional[str] = None) -> Optional[str]:
+        now: float = time.time()
+        with closing(self._conn().cursor()) as cur:
+            row = cur.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row and self.params.ttl_seconds is not None and now - row[1] > self.params.ttl_seconds:
+                row = None
+            if row:
+                cur.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (now, key),
+                )
+        self._record(caller, row is not None)
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        size: int = len(value.encode("utf-8"))
+        if size > self.params.max_bytes:
+            return
+        now: float = time.time()
+        with self._write_lock, closing(self._conn().cursor()) as cur:
+            previous = cur.execute(
+                "SELECT size FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            cur.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.params.max_bytes:
+                self._evict(cur, now)
+
+    def _evict(self, cur: sqlite3.Cursor, now: float) -> None:
+        if self.params.ttl_seconds is not None:
+            cur.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (now - self.params.ttl_seconds,),
+            )
+        # Evict least recently used entries down to 90% to avoid evicting on every write.
+        target: int = int(self.params.max_bytes * 0.9)
+        total: int = cur.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        evicted: int = 0
+        while total > target:
+            rows = cur.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                cur.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+                if total <= target:
+                    break
+        self._total_bytes = total
+        logger.info("LLM cache evicted %d entries | size=%d", evicted, total)
+
+    def clear(self) -> None:
+        with self._write_lock:
+            self._conn().execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            callers: Dict[str, Dict[str, Any]] = {
+                caller: {
+                    **stats,
+                    "hit_rate": stats["hits"] / (stats["hits"] + stats["misses"]),
+                }
+                for caller, stats in self._stats.items()
+            }
+        return {"size_bytes": self._total_bytes, "callers": callers}
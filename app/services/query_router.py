@@ -0,0 +1,329 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.models.parameters import QueryRouterParams
+from app.services.embedders import BiEmbedder
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+RETRIEVE = "retrieve"
+DIRECT = "direct"
+LABELS = (RETRIEVE, DIRECT)
+
+# Seed set used until examples_path exists; mirrors the LLM prompt's examples.
+DEFAULT_EXAMPLES: Dict[str, List[str]] = {
+    RETRIEVE: [
+        "Що сказано в документі про умови договору?",
+        "Які показники продажів у звіті за Q3?",
+        "Яка процедура відпустки описана в регламенті?",
+        "Знайди в інструкції вимоги до безпеки",
+        "Які терміни подання вказані в положенні?",
+        "Що написано на сторінці 5 звіту?",
+        "What does the policy document say about refunds?",
+        "Summarize section 3 of the uploaded report",
+    ],
+    DIRECT: [
+        "Що таке штучний інтелект?",
+        "Скільки буде 2 + 2?",
+        "Привіт, як справи?",
+        "Переклади слово 'book' українською",
+        "Поясни, що таке фотосинтез",
+        "Хто написав «Кобзар»?",
+        "What is machine learning?",
+        "Tell me a joke",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    need_external_info: bool
+    margin: float
+    confident: bool
+
+
+class EmbeddingQueryRouter:
+    def __init__(
+        self,
+        bi_embedder: BiEmbedder,
+        params: QueryRouterParams = QueryRouterParams(),
+    ) -> None:
+        self.bi_embedder: BiEmbedder = bi_embedder
+        self.params: QueryRouterParams = params
+        self.examples_path: Path = Path(params.examples_path)
+        self.decision_log_path: Path = Path(params.decision_log_path)
+        self.rotated_log_path: Path = self.decision_log_path.with_name(self.decision_log_path.name + ".1")
+
+        self._lock: threading.Lock = threading.Lock()
+        self._centroids: Optional[np.ndarray] = None
+        # Fitting embeds every example, so it waits for warm_up() or the first query.
+        self._fit_lock: threading.Lock = threading.Lock()
+        self._fitted: bool = False
+        self._stats: Dict[str, int] = {
+            "classified": 0,
+            "llm_fallback": 0,
+            "shadow_checked": 0,
+            "shadow_agreed": 0,
+            "log_dropped": 0,
+        }
+        # Decisions are appended by a background thread so routing never waits on disk.
+        self._log_queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(
+            maxsize=params.decision_log_queue_size
+        )
+        self._log_writer: Optional[threading.Thread] = None
+
+    def warm_up(self) -> None:
+        if self._fitted:
+            return
+        with self._fit_lock:
+            if not self._fitted:
+                self.fit(self.load_examples())
+
+    def load_examples(self) -> Dict[str, List[str]]:
+        if not self.examples_path.exists():
+            return DEFAULT_EXAMPLES
+        try:
+            return json.loads(self.examples_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.exception("Failed to read router examples: %s", self.examples_path)
+            return DEFAULT_EXAMPLES
+
+    def save_examples(self, examples: Dict[str, List[str]]) -> None:
+        self.examples_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path: Path = self.examples_path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(examples, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.examples_path)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return self.bi_embedder.get_embeddings(texts).cpu().numpy().astype(np.float32)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms: np.ndarray = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.clip(norms, 1e-9, None)
+
+    def fit(self, examples: Dict[str, List[str]]) -> None:
+        if any(len(examples.get(label, [])) < self.params.min_examples_per_label for label in LABELS):
+            logger.warning(
+                "Not enough router examples (need %d per label); LLM routing only",
+                self.params.min_examples_per_label,
+            )
+            with self._lock:
+                self._centroids = None
+                self._fitted = True
+            return
+
+        centroids: List[np.ndarray] = [
+            self._normalize(self._embed(examples[label])).mean(axis=0)
+            for label in LABELS
+        ]
+        with self._lock:
+            self._centroids = self._normalize(np.stack(centroids))
+            self._fitted = True
+        logger.info(
+            "Query router fitted | %s",
+            " ".join(f"{label}={len(examples[label])}" for label in LABELS),
+        )
+
+    def classify(self, query: str) -> Optional[RouteDecision]:
+        self.warm_up()
+        with self._lock:
+            centroids: Optional[np.ndarray] = self._centroids
+        if centroids is None:
+            return None
+
+        vector: np.ndarray = self._normalize(self._embed([query])[0])
+        similarities: np.ndarray = centroids @ vector
+        best: int = int(np.argmax(similarities))
+        margin: float = float(abs(similarities[0] - similarities[1]))
+        confident: bool = margin >= self.params.min_margin
+
+        with self._lock:
+            self._stats["classified" if confident else "llm_fallback"] += 1
+        return RouteDecision(
+            need_external_info=LABELS[best] == RETRIEVE,
+            margin=margin,
+            confident=confident,
+        )
+
+    def should_shadow(self) -> bool:
+        return random.random() < self.params.shadow_sample_rate
+
+    def record_shadow(self, decision: RouteDecision, llm_need_external: bool) -> None:
+        with self._lock:
+            self._stats["shadow_checked"] += 1
+            if decision.need_external_info == llm_need_external:
+                self._stats["shadow_agreed"] += 1
+
+    def log_decision(
+        self,
+        query: str,
+        need_external_info: bool,
+        source: str,
+        margin: Optional[float] = None,
+    ) -> None:
+        record: Dict[str, Any] = {
+            "ts": time.time(),
+            "query": query,
+            "label": RETRIEVE if need_external_info else DIRECT,
+            "source": source,
+            "margin": margin,
+        }
+        with self._lock:
+            if self._log_writer is None or not self._log_writer.is_alive():
+                self._log_writer = threading.Thread(
+                    target=self._write_loop, name="router-decision-log", daemon=True
+                )
+                self._log_writer.start()
+            try:
+                self._log_queue.put_nowait(record)
+            except queue.Full:
+                self._stats["log_dropped"] += 1
+
+    def _write_loop(self) -> None:
+        while True:
+            record: Optional[Dict[str, Any]] = self._log_queue.get()
+            if record is None:
+                return
+            try:
+                self._append_decision(record)
+            except OSError as e:
+                logger.warning("Failed to log routing decision: %s", e)
+
+    def _append_decision(self, record: Dict[str, Any]) -> None:
+        self.decision_log_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if self.decision_log_path.stat().st_size >= self.params.decision_log_max_bytes:
+                os.replace(self.decision_log_path, self.rotated_log_path)
+        except FileNotFoundError:
+            pass
+        with self.decision_log_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def stop(self) -> None:
+        """Writes out the queued decisions and stops the writer thread."""
+        with self._lock:
+            writer: Optional[threading.Thread] = self._log_writer
+            self._log_writer = None
+        if writer is not None and writer.is_alive():
+            self._log_queue.put(None)
+            writer.join(timeout=5)
+
+    def iter_decisions(self) -> Iterator[Dict[str, Any]]:
+        for path in (self.rotated_log_path, self.decision_log_path):
+            if not path.exists():
+                continue
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def retrain(self, sources: tuple = ("llm", "manual")) -> Dict[str, int]:
+        """Adds logged decisions from trusted sources to the examples and refits."""
+        examples: Dict[str, List[str]] = {
+            label: list(queries) for label, queries in self.load_examples().items()
+        }
+        known = {query for queries in examples.values() for query in queries}
+        added: Dict[str, int] = {label: 0 for label in LABELS}
+
+        for record in self.iter_decisions():
+            if record.get("source") not in sources or record.get("label") not in LABELS:
+                continue
+            query: str = record.get("query", "").strip()
+            if not query or query in known:
+                continue
+            examples.setdefault(record["label"], []).append(query)
+            known.add(query)
+            added[record["label"]] += 1
+
+        self.save_examples(examples)
+        self.fit(examples)
+        return added
+
+    def evaluate(self) -> Dict[str, Any]:
+        """Leave-one-out accuracy over the stored examples."""
+        examples: Dict[str, List[str]] = self.load_examples()
+        queries: List[str] = [q for label in LABELS for q in examples.get(label, [])]
+        labels: np.ndarray = np.array(
+            [idx for idx, label in enumerate(LABELS) for _ in examples.get(label, [])]
+        )
+        if not queries:
+            return {"examples": 0}
+
+        vectors: np.ndarray = self._normalize(self._embed(queries))
+        sums: np.ndarray = np.stack([vectors[labels == i].sum(axis=0) for i in range(len(LABELS))])
+        counts: np.ndarray = np.bincount(labels, minlength=len(LABELS)).astype(np.float32)
+
+        correct: int = 0
+        confident: int = 0
+        confident_correct: int = 0
+        for vector, label in zip(vectors, labels):
+            held_out_sums: np.ndarray = sums.copy()
+            held_out_sums[label] -= vector
+            held_out_counts: np.ndarray = counts.copy()
+            held_out_counts[label] -= 1
+            centroids: np.ndarray = self._normalize(
+                held_out_sums / np.clip(held_out_counts[:, None], 1, None)
+            )
+            similarities: np.ndarray = centroids @ vector
+            hit: bool = int(np.argmax(similarities)) == int(label)
+            correct += int(hit)
+            if abs(similarities[0] - similarities[1]) >= self.params.min_margin:
+                confident += 1
+                confident_correct += int(hit)
+
+        return {
+            "examples": len(queries),
+            "accuracy": correct / len(queries),
+            "coverage": confident / len(queries),
+            "confident_accuracy": confident_correct / confident if confident else None,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        total: int = stats["classified"] + stats["llm_fallback"]
+        stats["llm_fallback_ratio"] = stats["llm_fallback"] / total if total else 0.0
+        stats["shadow_agreement"] = (
+            stats["shadow_agreed"] / stats["shadow_checked"]
+            if stats["shadow_checked"]
+            else None
+        )
+        return stats
+
+
+def main() -> None:
+    from app.models.parameters import BiEncoderParams
+    from app.services.embedders import HFBiEmbedder
+    from app.services.telemetry import configure_logging
+
+    parser = argparse.ArgumentParser(description="Retrain or evaluate the query router")
+    parser.add_argument("command", choices=["retrain", "evaluate"])
+    args = parser.parse_args()
+
+    configure_logging()
+    router = EmbeddingQueryRouter(HFBiEmbedder(BiEncoderParams()))
+    if args.command == "retrain":
+        print(json.dumps({"added": router.retrain(), **router.evaluate()}, indent=2))
+    else:
+        print(json.dumps(router.evaluate(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
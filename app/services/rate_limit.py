@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple, Union
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self._tokens: float = capacity
+        self._updated: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Takes tokens now and returns how long the caller must wait before using them."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now: float = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        delay: float = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens: float = 1.0) -> None:
+        delay: float = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class InFlightLimiter:
+    """Bounded semaphore usable from threads and from any event loop.
+
+    Waiters of both kinds queue in one FIFO; release() hands the slot straight
+    to the oldest waiter, so nothing polls and nobody is overtaken.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self._taken: int = 0
+        # threading.Event for thread waiters, (loop, future) for coroutine waiters.
+        self._waiters: Deque[Union[threading.Event, Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = deque()
+        self._lock: threading.Lock = threading.Lock()
+
+    def _try_take(self) -> bool:
+        if self._taken < self.limit and not self._waiters:
+            self._taken += 1
+            return True
+        return False
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._try_take():
+                return
+            event: threading.Event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_take():
+                return
+            waiter: Tuple[asyncio.AbstractEventLoop, asyncio.Future] = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                queued: bool = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            # Already handed a slot: give it back. A grant still in flight sees
+            # the cancelled future and passes the slot on itself.
+            if not queued and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                if self._taken <= 0:
+                    raise ValueError("InFlightLimiter released too many times")
+                self._taken -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(self._grant, future)
+        except RuntimeError:
+            # The waiter's loop is closed; pass the slot on.
+            self.release()
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock: threading.Lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
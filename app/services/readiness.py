@@ -0,0 +1,92 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Warms up models and indexes in a background thread and tracks what is usable.
+
+    Components are registered with a warm-up callable (model load plus a dummy
+    forward pass, index open, ...). Failed warm-ups are retried until they pass,
+    so a reader becomes ready once the writer publishes its first index.
+    """
+
+    def __init__(self, retry_seconds: float = 10.0) -> None:
+        self.retry_seconds: float = retry_seconds
+        self._components: List[Tuple[str, Callable[[], Any]]] = []
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._stop: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+
+    def register(self, name: str, warm_up: Callable[[], Any]) -> None:
+        with self._lock:
+            self._components.append((name, warm_up))
+            self._state[name] = {"status": "pending", "seconds": None, "error": None, "attempts": 0}
+
+    def _warm(self, name: str, warm_up: Callable[[], Any]) -> bool:
+        with self._lock:
+            self._state[name].update(status="loading")
+            self._state[name]["attempts"] += 1
+        started: float = time.perf_counter()
+        try:
+            warm_up()
+        except Exception as e:
+            with self._lock:
+                self._state[name].update(status="failed", error=f"{type(e).__name__}: {e}")
+            logger.warning("Warm-up failed | component=%s error=%s", name, e)
+            return False
+        seconds: float = time.perf_counter() - started
+        with self._lock:
+            self._state[name].update(status="ready", seconds=round(seconds, 3), error=None)
+        logger.info("Component ready | component=%s seconds=%.2f", name, seconds)
+        return True
+
+    def run(self) -> bool:
+        """Warms up every component not ready yet; True once all are."""
+        with self._lock:
+            pending: List[Tuple[str, Callable[[], Any]]] = [
+                (name, warm_up) for name, warm_up in self._components
+                if self._state[name]["status"] != "ready"
+            ]
+        ok: bool = True
+        for name, warm_up in pending:
+            if self._stop.is_set():
+                return False
+            ok = self._warm(name, warm_up) and ok
+        return ok
+
+    def _loop(self) -> None:
+        while not self.run():
+            if self._stop.wait(self.retry_seconds):
+                return
+        logger.info("All components ready in %.1fs", time.perf_counter() - self._started_at)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._loop, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            # A model load cannot be interrupted; do not hold up shutdown for it.
+            self._thread.join(timeout=1)
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(state["status"] == "ready" for state in self._state.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            components: Dict[str, Dict[str, Any]] = {name: dict(state) for name, state in self._state.items()}
+        return {
+            "ready": all(state["status"] == "ready" for state in components.values()),
+            "components": components,
+        }
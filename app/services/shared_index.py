@@ -0,0 +1,365 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.models.parameters import SearchHit, SearchParameters, SharedIndexParams
+from app.services.embedders import HFBiEmbedder, HFCrossEncoder
+from app.services.telemetry import span
+from app.services.vector_storage import VectorMemory, rerank_documents
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+
+
+class ReadOnlyIndexError(RuntimeError):
+    pass
+
+
+class _BlobWriter:
+    def __init__(self, path: Path) -> None:
+        self._file = path.open("wb")
+        self.offsets: List[int] = [0]
+
+    def append(self, value: str) -> None:
+        data: bytes = value.encode("utf-8")
+        self._file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self, offsets_path: Path) -> None:
+        self._file.close()
+        np.save(offsets_path, np.asarray(self.offsets, dtype=np.int64))
+
+
+class _BlobReader:
+    def __init__(self, path: Path, offsets_path: Path) -> None:
+        self.offsets: np.ndarray = np.load(offsets_path, mmap_mode="r")
+        self.data: np.ndarray = (
+            np.memmap(path, dtype=np.uint8, mode="r")
+            if path.stat().st_size
+            else np.empty(0, dtype=np.uint8)
+        )
+
+    def __getitem__(self, idx: int) -> str:
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return self.data[start:end].tobytes().decode("utf-8")
+
+
+class _Generation:
+    def __init__(self, path: Path) -> None:
+        info: Dict[str, Any] = json.loads((path / "meta.json").read_text())
+        self.name: str = path.name
+        self.count: int = info["count"]
+        self.dim: int = info["dim"]
+
+        if self.count:
+            self.vectors: np.ndarray = np.memmap(
+                path / "vectors.f32",
+                dtype=np.float32,
+                mode="r",
+                shape=(self.count, self.dim),
+            )
+        else:
+            self.vectors = np.zeros((0, max(self.dim, 1)), dtype=np.float32)
+        self.sq_norms: np.ndarray = np.load(path / "sq_norms.npy", mmap_mode="r")
+        self.ids: _BlobReader = _BlobReader(path / "ids.bin", path / "ids.idx.npy")
+        self.texts: _BlobReader = _BlobReader(path / "texts.bin", path / "texts.idx.npy")
+        self.metadatas: _BlobReader = _BlobReader(path / "metas.bin", path / "metas.idx.npy")
+        self._rows: Optional[Dict[str, int]] = None
+
+    def rows(self) -> Dict[str, int]:
+        # Built on first use only; most readers never look vectors up by id.
+        if self._rows is None:
+            self._rows = {self.ids[idx]: idx for idx in range(self.count)}
+        return self._rows
+
+    def search(self, query: np.ndarray, top_k: int) -> np.ndarray:
+        if self.count == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64)
+        # Same ordering as Chroma's default L2 space; |q|^2 is constant.
+        distances: np.ndarray = self.sq_norms - 2.0 * (self.vectors @ query)
+        k: int = min(top_k, self.count)
+        idx: np.ndarray = np.argpartition(distances, k - 1)[:k]
+        return idx[np.argsort(distances[idx])]
+
+    def search_many(self, queries: np.ndarray, top_k: int) -> List[np.ndarray]:
+        if self.count == 0 or top_k <= 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        distances: np.ndarray = self.sq_norms[None, :] - 2.0 * (queries @ self.vectors.T)
+        k: int = min(top_k, self.count)
+        idx: np.ndarray = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order: np.ndarray = np.argsort(np.take_along_axis(distances, idx, axis=1), axis=1)
+        return list(np.take_along_axis(idx, order, axis=1))
+
+    def document(self, idx: int) -> Document:
+        return Document(
+            id=self.ids[idx],
+            page_content=self.texts[idx],
+            metadata=json.loads(self.metadatas[idx]),
+        )
+
+
+class SharedIndexWriter:
+    def __init__(
+        self,
+        vector_memory: VectorMemory,
+        params: SharedIndexParams = SharedIndexParams(),
+    ) -> None:
+        self.vector_memory: VectorMemory = vector_memory
+        self.params: SharedIndexParams = params
+        self.root: Path = Path(params.root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._dirty: threading.Event = threading.Event()
+        self._stop: threading.Event = threading.Event()
+        self._publisher: Optional[threading.Thread] = None
+
+    def publish(self) -> str:
+        started: float = time.perf_counter()
+        name: str = f"gen-{time.time_ns():020d}"
+        tmp_dir: Path = self.root / f".{name}.tmp"
+        tmp_dir.mkdir()
+
+        ids = _BlobWriter(tmp_dir / "ids.bin")
+        texts = _BlobWriter(tmp_dir / "texts.bin")
+        metas = _BlobWriter(tmp_dir / "metas.bin")
+        sq_norms: List[np.ndarray] = []
+        count: int = 0
+        dim: int = 0
+
+        with (tmp_dir / "vectors.f32").open("wb") as vectors:
+            for batch in self.vector_memory.export(self.params.export_batch_size):
+                embeddings: np.ndarray = np.asarray(
+                    batch["embeddings"],
+                    dtype=np.float32,
+                )
+                if embeddings.size == 0:
+                    continue
+                dim = embeddings.shape[1]
+                vectors.write(np.ascontiguousarray(embeddings).tobytes())
+                sq_norms.append(np.einsum("ij,ij->i", embeddings, embeddings))
+
+                for doc_id, text, metadata in zip(
+                    batch["ids"],
+                    batch["documents"],
+                    batch["metadatas"],
+                ):
+                    ids.append(doc_id)
+                    texts.append(text or "")
+                    metas.append(json.dumps(metadata or {}, ensure_ascii=False))
+                count += len(batch["ids"])
+
+        ids.close(tmp_dir / "ids.idx.npy")
+        texts.close(tmp_dir / "texts.idx.npy")
+        metas.close(tmp_dir / "metas.idx.npy")
+        np.save(
+            tmp_dir / "sq_norms.npy",
+            np.concatenate(sq_norms) if sq_norms else np.empty(0, dtype=np.float32),
+        )
+        (tmp_dir / "meta.json").write_text(
+            json.dumps({"count": count, "dim": dim, "created_at": time.time()})
+        )
+
+        os.rename(tmp_dir, self.root / name)
+        current_tmp: Path = self.root / f"{CURRENT_FILE}.tmp"
+        current_tmp.write_text(name)
+        os.replace(current_tmp, self.root / CURRENT_FILE)
+        self._collect_garbage(name)
+
+        logger.info(
+            "Shared index published | generation=%s count=%d dim=%d took=%.2fs",
+            name,
+            count,
+            dim,
+            time.perf_counter() - started,
+        )
+        return name
+
+    def mark_dirty(self) -> None:
+        self._dirty.set()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._publisher = threading.Thread(
+            target=self._publish_loop,
+            name="shared-index-publisher",
+            daemon=True,
+        )
+        self._publisher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._dirty.set()
+        if self._publisher:
+            self._publisher.join(timeout=30)
+
+    def _publish_loop(self) -> None:
+        while not self._stop.is_set():
+            self._dirty.wait()
+            if self._stop.is_set():
+                return
+            # Coalesce bursts of small ingests into a single publication.
+            self._stop.wait(self.params.min_publish_interval_seconds)
+            self._dirty.clear()
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Failed to publish shared index")
+
+    def _collect_garbage(self, current: str) -> None:
+        generations: List[Path] = sorted(self.root.glob("gen-*"))
+        for path in generations[: -self.params.keep_generations]:
+            if path.name != current:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+class SharedIndexReader:
+    def __init__(
+        self,
+        bi_embedder: HFBiEmbedder,
+        cross_encoder: Optional[HFCrossEncoder] = None,
+        params: SharedIndexParams = SharedIndexParams(),
+    ) -> None:
+        self.bi_embedder: HFBiEmbedder = bi_embedder
+        self.cross_encoder: Optional[HFCrossEncoder] = cross_encoder
+        self.params: SharedIndexParams = params
+        self.root: Path = Path(params.root)
+        self.persist_path: str = params.root
+
+        self._generation: Optional[_Generation] = None
+        self._current_stat: Optional[Tuple[int, int]] = None
+        self._lock: threading.Lock = threading.Lock()
+        self._refresh()
+
+        logger.info(
+            "SharedIndexReader initialized | root=%s generation=%s",
+            self.root,
+            self._generation.name if self._generation else None,
+        )
+
+    def _refresh(self) -> Optional[_Generation]:
+        try:
+            stat = (self.root / CURRENT_FILE).stat()
+        except FileNotFoundError:
+            return self._generation
+
+        key: Tuple[int, int] = (stat.st_ino, stat.st_mtime_ns)
+        if key == self._current_stat:
+            return self._generation
+
+        with self._lock:
+            if key == self._current_stat:
+                return self._generation
+            name: str = (self.root / CURRENT_FILE).read_text().strip()
+            if self._generation is None or self._generation.name != name:
+                try:
+                    self._generation = _Generation(self.root / name)
+                    logger.info(
+                        "Shared index generation loaded | generation=%s count=%d",
+                        name,
+                        self._generation.count,
+                    )
+                except (OSError, ValueError):
+                    logger.exception("Failed to load shared index generation %s", name)
+                    return self._generation
+            self._current_stat = key
+        return self._generation
+
+    def _retrieve(
+        self,
+        query: str,
+        top_k: int,
+    ) -> List[Document]:
+        generation: Optional[_Generation] = self._refresh()
+        if generation is None:
+            return []
+        query_vec: np.ndarray = (
+            self.bi_embedder.get_embedding(query).cpu().numpy().astype(np.float32)
+        )
+        with span("vector.search", backend="shared", top_k=top_k) as attrs:
+            documents: List[Document] = [
+                generation.document(int(idx))
+                for idx in generation.search(query_vec, top_k)
+            ]
+            attrs["candidates"] = len(documents)
+        return documents
+
+    def search(
+        self,
+        params: SearchParameters,
+    ) -> List[SearchHit]:
+
+        documents: List[Document] = self._retrieve(
+            params.query,
+            params.top_k_retrieve,
+        )
+
+        if not params.use_reranking:
+            return [SearchHit(doc) for doc in documents]
+
+        hits: List[SearchHit] = rerank_documents(
+            self.cross_encoder,
+            params.query,
+            documents,
+            params.rerank_threshold,
+        )
+
+        return hits[: params.top_k_reranking]
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+    ) -> List[List[SearchHit]]:
+        generation: Optional[_Generation] = self._refresh()
+        if generation is None or not queries:
+            return [[] for _ in queries]
+        query_vecs: np.ndarray = (
+            self.bi_embedder.get_embeddings(list(queries)).cpu().numpy().astype(np.float32)
+        )
+        with span("vector.search", backend="shared", top_k=top_k, batch_size=len(queries)) as attrs:
+            rankings: List[List[SearchHit]] = [
+                [SearchHit(generation.document(int(idx))) for idx in rows]
+                for rows in generation.search_many(query_vecs, top_k)
+            ]
+            attrs["candidates"] = sum(len(hits) for hits in rankings)
+        return rankings
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        generation: Optional[_Generation] = self._refresh()
+        if generation is None:
+            return {}
+        rows: Dict[str, int] = generation.rows()
+        return {
+            doc_id: generation.vectors[rows[doc_id]].tolist()
+            for doc_id in ids
+            if doc_id in rows
+        }
+
+    def add_documents(self, *args, **kwargs):
+        raise ReadOnlyIndexError("Shared index readers are read-only")
+
+    def delete_documents(self, *args, **kwargs):
+        raise ReadOnlyIndexError("Shared index readers are read-only")
+
+    def clear(self):
+        raise ReadOnlyIndexError("Shared index readers are read-only")
+
+    def get_stats(self) -> Dict[str, Any]:
+        generation: Optional[_Generation] = self._refresh()
+        return {
+            "status": "ready" if generation else "empty",
+            "num_documents": generation.count if generation else 0,
+            "persist_path": self.persist_path,
+            "generation": generation.name if generation else None,
+            "mode": "reader",
+            "has_cross_encoder": self.cross_encoder is not None,
+        }
@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "[%(levelname)s] %(asctime)s | %(name)s | %(message)s"
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+SIZE_BUCKETS: Tuple[float, ...] = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def configure_logging() -> None:
+    """Single logging setup for the API and the worker processes."""
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format=LOG_FORMAT,
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts: List[str] = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: Tuple[str, ...] = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key: Tuple[str, ...] = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines: List[str] = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: Tuple[str, ...] = tuple(label_names)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum, count.
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key: Tuple[str, ...] = tuple(str(labels.get(name, "")) for name in self.label_names)
+        idx: int = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[idx] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines: List[str] = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative: int = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le: str = f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+                cumulative += counts[-1]
+                inf: str = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, inf)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total[0]:g}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics: List[Any] = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY: MetricsRegistry = MetricsRegistry()
+
+SPAN_SECONDS: Histogram = REGISTRY.histogram(
+    "rag_span_duration_seconds", "Duration of instrumented operations.", ["span"]
+)
+SPAN_ERRORS: Counter = REGISTRY.counter(
+    "rag_span_errors_total", "Instrumented operations that raised.", ["span"]
+)
+BATCH_SIZE: Histogram = REGISTRY.histogram(
+    "rag_batch_size", "Items per embedder, reranker, search or write batch.", ["span"], SIZE_BUCKETS
+)
+TOKENS: Counter = REGISTRY.counter(
+    "rag_tokens_total", "Tokens processed, by operation and direction.", ["span", "direction"]
+)
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    start: float
+    duration: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class Trace:
+    def __init__(self) -> None:
+        self.trace_id: str = uuid.uuid4().hex
+        self.started: float = time.perf_counter()
+        self.started_at: float = time.time()
+        self.spans: List[SpanRecord] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def add(self, record: SpanRecord) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans: List[SpanRecord] = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": round((s.start - self.started) * 1000, 3),
+                    "duration_ms": round(s.duration * 1000, 3),
+                    "attributes": s.attributes,
+                    **({"error": s.error} if s.error else {}),
+                }
+                for s in spans
+            ],
+        }
+
+
+def summarize_trace(trace: Trace) -> Dict[str, Any]:
+    """Per-request breakdown: node wall times, LLM calls and tokens, search candidates, cache hits."""
+    with trace._lock:
+        spans: List[SpanRecord] = sorted(trace.spans, key=lambda s: s.start)
+
+    def ms(seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    llm_calls: List[Dict[str, Any]] = [
+        {
+            "caller": s.attributes.get("caller"),
+            "ms": ms(s.duration),
+            "input_tokens": s.attributes.get("input_tokens"),
+            "output_tokens": s.attributes.get("output_tokens"),
+            "streamed": s.name == "llm.stream",
+        }
+        for s in spans
+        if s.name in ("llm.generate", "llm.stream")
+    ]
+    lookups: List[SpanRecord] = [s for s in spans if s.name == "llm.cache_lookup"]
+    hits: int = sum(1 for s in lookups if s.attributes.get("hit"))
+    return {
+        "total_ms": ms(time.perf_counter() - trace.started),
+        "nodes": [{"node": s.name[len("node."):], "ms": ms(s.duration)} for s in spans if s.name.startswith("node.")],
+        "llm_calls": len(llm_calls),
+        "llm": llm_calls,
+        "input_tokens": sum(call["input_tokens"] or 0 for call in llm_calls),
+        "output_tokens": sum(call["output_tokens"] or 0 for call in llm_calls),
+        "retrieval_candidates": sum(
+            s.attributes.get("candidates", 0) for s in spans if s.name == "vector.search"
+        ),
+        "cache_hits": hits,
+        "cache_misses": len(lookups) - hits,
+    }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("rag_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace() -> Iterator[Trace]:
+    trace: Trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Times the block into rag_span_duration_seconds; the yielded dict takes attributes set inside it.
+
+    ``batch_size``, ``input_tokens`` and ``output_tokens`` attributes also feed
+    the batch and token metrics.
+    """
+    started: float = time.perf_counter()
+    error: Optional[str] = None
+    try:
+        yield attributes
+    except GeneratorExit:
+        # A consumer closing a streaming generator early is not a failure.
+        raise
+    except BaseException as e:
+        error = type(e).__name__
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        duration: float = time.perf_counter() - started
+        SPAN_SECONDS.observe(duration, span=name)
+        if attributes.get("batch_size") is not None:
+            BATCH_SIZE.observe(attributes["batch_size"], span=name)
+        for direction in ("input", "output"):
+            tokens = attributes.get(f"{direction}_tokens")
+            if tokens:
+                TOKENS.inc(tokens, span=name, direction=direction)
+        trace: Optional[Trace] = _current_trace.get()
+        if trace is not None:
+            trace.add(SpanRecord(name, started, duration, attributes, error))
+
+
+class TraceMiddleware:
+    """Pure ASGI middleware, so streamed responses are traced to the last byte.
+
+    Requests carrying ``X-Debug-Trace: 1`` get an ``X-Trace-Id`` response header and
+    their span tree is written to ``trace_dir/<trace_id>.json``.
+    """
+
+    def __init__(self, app: Any, trace_dir: str = "./data/traces") -> None:
+        self.app: Any = app
+        self.trace_dir: Path = Path(trace_dir)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers: Dict[bytes, bytes] = dict(scope.get("headers") or [])
+        if headers.get(b"x-debug-trace", b"").lower() not in (b"1", b"true"):
+            await self.app(scope, receive, send)
+            return
+
+        with start_trace() as trace:
+            async def send_with_trace_id(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"x-trace-id", trace.trace_id.encode())]
+                await send(message)
+
+            with span("http.request", path=scope.get("path"), method=scope.get("method")):
+                await self.app(scope, receive, send_with_trace_id)
+        self._export(trace)
+
+    def _export(self, trace: Trace) -> None:
+        try:
+            self.trace_dir.mkdir(parents=True, exist_ok=True)
+            path: Path = self.trace_dir / f"{trace.trace_id}.json"
+            path.write_text(json.dumps(trace.to_dict(), ensure_ascii=False, default=str, indent=2))
+            logger.info("Trace exported | id=%s spans=%d", trace.trace_id, len(trace.spans))
+        except OSError as e:
+            logger.warning("Failed to export trace %s: %s", trace.trace_id, e)
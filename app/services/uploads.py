@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from app.models.parameters import UploadParams
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class UploadError(ValueError):
+    pass
+
+
+class EmptyUploadError(UploadError):
+    pass
+
+
+class UploadTooLargeError(UploadError):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    upload_dir: Path
+    size_bytes: int
+    sha256: str
+
+
+def safe_filename(filename: str) -> str:
+    name: str = Path(filename.replace("\\", "/")).name
+    return name.encode("utf-8", errors="ignore").decode("utf-8")
+
+
+class RequestSizeLimitMiddleware:
+    """Pure ASGI middleware answering 413 to request bodies over the upload limit.
+
+    Starlette spools a multipart body to a temporary file before the route
+    runs, so without it save_upload would see an oversized file only after it
+    was received in full. Content-Length is checked up front; bodies without
+    it are counted as they arrive.
+    """
+
+    def __init__(self, app: Any, params: UploadParams = UploadParams()) -> None:
+        self.app: Any = app
+        self.max_bytes: int = params.max_bytes + params.request_overhead_bytes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers: Dict[bytes, bytes] = dict(scope.get("headers") or [])
+        length: bytes = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received: int = 0
+        exceeded: bool = False
+        started: bool = False
+
+        async def receive_limited() -> Dict[str, Any]:
+            nonlocal received, exceeded
+            message: Dict[str, Any] = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise UploadTooLargeError(f"Request body larger than {self.max_bytes} bytes")
+            return message
+
+        async def send_unless_exceeded(message: Dict[str, Any]) -> None:
+            nonlocal started
+            # The app's own error for the aborted body is replaced by the 413.
+            if exceeded:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, receive_limited, send_unless_exceeded)
+        except Exception:
+            if not exceeded or started:
+                raise
+        if exceeded and not started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        logger.warning("Rejected request body over %d bytes | path=%s", self.max_bytes, scope.get("path"))
+        response = JSONResponse(
+            {"detail": f"Request body too large: more than {self.max_bytes} bytes"},
+            status_code=413,
+        )
+        await response(scope, receive, send)
+
+
+async def save_upload(
+    file: UploadFile,
+    params: UploadParams = UploadParams(),
+) -> StoredUpload:
+    """Copies the upload into its own directory, checking the exact file size.
+
+    By this point Starlette has already spooled the request body;
+    RequestSizeLimitMiddleware is what stops an oversized body while it is
+    still arriving.
+    """
+    # Every upload gets its own directory so equal filenames never collide,
+    # while the basename (used as the document source) stays intact.
+    upload_dir: Path = Path(params.upload_dir) / uuid.uuid4().hex
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    path: Path = upload_dir / safe_filename(file.filename or "upload")
+
+    digest = hashlib.sha256()
+    size: int = 0
+    try:
+        with path.open("wb") as out:
+            while chunk := await file.read(params.chunk_size):
+                size += len(chunk)
+                if size > params.max_bytes:
+                    raise UploadTooLargeError(
+                        f"File too large: more than {params.max_bytes} bytes"
+                    )
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+
+        if size == 0:
+            raise EmptyUploadError("Empty file")
+
+    except BaseException:
+        remove_upload(upload_dir)
+        raise
+
+    logger.info(
+        "Upload stored | file=%s size=%d sha256=%s",
+        path,
+        size,
+        digest.hexdigest()[:12],
+    )
+    return StoredUpload(
+        path=path,
+        upload_dir=upload_dir,
+        size_bytes=size,
+        sha256=digest.hexdigest(),
+    )
+
+
+def remove_upload(upload_dir: Path) -> None:
+    shutil.rmtree(upload_dir, ignore_errors=True)
@@ -1,19 +1,17 @@
 import logging
+import threading
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
-from app.models.parameters import SearchHit, SearchParameters
+from app.models.parameters import IngestStats, SearchHit, SearchParameters
+from app.services.chunk_manifest import ChunkManifest, chunk_hash, chunk_id
 from app.services.embedders import HFBiEmbedder, HFCrossEncoder
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(levelname)s] %(asctime)s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+from app.services.inference_scheduler import BATCH, get_inference_scheduler
+from app.services.telemetry import span
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -22,7 +20,7 @@ class HFEmbeddingWrapper(Embeddings):
     def __init__(
         self,
         embedder: HFBiEmbedder,
-        batch_size: int = 16,
+        batch_size: int = 32,
     ) -> None:
         self.embedder: HFBiEmbedder = embedder
         self.batch_size: int = batch_size
@@ -36,10 +34,11 @@ class HFEmbeddingWrapper(Embeddings):
         for start in range(0, len(texts), self.batch_size):
             batch: List[str] = texts[start : start + self.batch_size]
 
-            batch_embeddings: List[List[float]] = [
-                self.embedder.get_embedding(text).cpu().tolist()
-                for text in batch
-            ]
+            # Document embedding is ingestion work: each micro-batch yields to live queries.
+            with get_inference_scheduler().slot(BATCH, items=len(batch)):
+                batch_embeddings: List[List[float]] = (
+                    self.embedder.get_embeddings(batch).cpu().tolist()
+                )
 
             embeddings.extend(batch_embeddings)
 
@@ -60,6 +59,51 @@ class HFEmbeddingWrapper(Embeddings):
         return embedding
 
 
+def rerank_documents(
+    cross_encoder: Optional[HFCrossEncoder],
+    query: str,
+    documents: List[Document],
+    threshold: float,
+) -> List[SearchHit]:
+    if not cross_encoder:
+        return [SearchHit(doc) for doc in documents]
+
+    with span("rerank", batch_size=len(documents)):
+        scores: List[float] = cross_encoder.get_scores(
+            query,
+            [doc.page_content for doc in documents],
+        )
+    hits: List[SearchHit] = [
+        SearchHit(doc, score)
+        for doc, score in zip(documents, scores)
+        if score >= threshold
+    ]
+
+    hits.sort(
+        key=lambda hit: hit.score or 0.0,
+        reverse=True,
+    )
+
+    return hits
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]],
+    k: int = 60,
+    limit: Optional[int] = None,
+) -> List[Document]:
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key: str = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+
+    fused: List[str] = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in fused[:limit]]
+
+
 class VectorMemory:
     def __init__(
         self,
@@ -67,8 +111,12 @@ class VectorMemory:
         cross_encoder: Optional[HFCrossEncoder] = None,
         persist_path: str = "./data/chroma_index",
         collection_name: str = "documents",
+        write_batch_size: int = 256,
+        collection_metadata: Optional[Dict[str, Any]] = None,
     ):
         self.persist_path = persist_path
+        self.write_batch_size = write_batch_size
+        self.bi_embedder = bi_embedder
         self.cross_encoder = cross_encoder
         Path(self.persist_path).mkdir(
             parents=True,
@@ -83,42 +131,149 @@ class VectorMemory:
             collection_name=collection_name,
             persist_directory=self.persist_path,
             embedding_function=embedding_wrapper,
+            # e.g. {"hnsw:search_ef": 100}; only applied when the collection is created.
+            collection_metadata=collection_metadata,
         )
+        self._manifest: ChunkManifest = ChunkManifest(
+            str(Path(self.persist_path) / "chunk_manifest.json"),
+        )
+        self._write_lock: threading.Lock = threading.Lock()
         logger.info(
             "VectorMemory initialized | path=%s collection=%s",
             self.persist_path,
             collection_name,
         )
 
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(
+        self,
+        documents: List[Document],
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> IngestStats:
         if not documents:
             logger.warning("No documents to add")
-            return
-        self._vector_store.add_documents(documents)
+            return IngestStats()
+
+        by_source: Dict[str, List[Document]] = {}
+        for doc in documents:
+            source: str = str(doc.metadata.get("source") or "unknown")
+            by_source.setdefault(source, []).append(doc)
+
+        stats: IngestStats = IngestStats()
+        with self._write_lock:
+            for source, source_docs in by_source.items():
+                stats = stats.merge(
+                    self._sync_source(source, source_docs, progress, stats.added)
+                )
+
         logger.info(
-            "Documents added | count=%d",
-            len(documents),
+            "Documents synced | sources=%d added=%d removed=%d unchanged=%d",
+            len(by_source),
+            stats.added,
+            stats.removed,
+            stats.unchanged,
+        )
+        return stats
+
+    def _sync_source(
+        self,
+        source: str,
+        documents: List[Document],
+        progress: Optional[Callable[[int], None]] = None,
+        progress_offset: int = 0,
+    ) -> IngestStats:
+        chunks: Dict[str, Document] = {}
+        for doc in documents:
+            text_hash: str = chunk_hash(doc.page_content)
+            if text_hash in chunks:
+                continue
+            doc.metadata["chunk_hash"] = text_hash
+            chunks[text_hash] = doc
+
+        previous = self._manifest.get(source)
+        if not previous:
+            # Chunks indexed before the manifest existed carry random ids.
+            self._vector_store.delete(where={"source": source})
+
+        added: List[str] = [h for h in chunks if h not in previous]
+        removed: List[str] = [h for h in previous if h not in chunks]
+
+        if removed:
+            self._vector_store.delete(
+                ids=[chunk_id(source, h) for h in removed],
+            )
+
+        stored: set = (previous - set(removed)) | (chunks.keys() - set(added))
+        try:
+            for start in range(0, len(added), self.write_batch_size):
+                batch: List[str] = added[start : start + self.write_batch_size]
+                with span("chroma.write", batch_size=len(batch)):
+                    self._vector_store.add_documents(
+                        [chunks[h] for h in batch],
+                        ids=[chunk_id(source, h) for h in batch],
+                    )
+                stored.update(batch)
+                if progress:
+                    progress(progress_offset + start + len(batch))
+        finally:
+            self._manifest.set(source, stored)
+
+        logger.info(
+            "Source synced | source=%s added=%d removed=%d unchanged=%d",
+            source,
+            len(added),
+            len(removed),
+            len(chunks) - len(added),
+        )
+        return IngestStats(
+            added=len(added),
+            removed=len(removed),
+            unchanged=len(chunks) - len(added),
         )
 
     def delete_documents(
         self,
         filter_metadata: Dict[str, Any],
     ) -> None:
-        self._vector_store.delete(where=filter_metadata)
+        with self._write_lock:
+            matched = self._vector_store._collection.get(
+                where=filter_metadata,
+                include=["metadatas"],
+            )
+            ids: List[str] = matched.get("ids", [])
+            if ids:
+                self._vector_store.delete(ids=ids)
+
+            by_source: Dict[str, List[str]] = {}
+            for metadata in matched.get("metadatas") or []:
+                metadata = metadata or {}
+                if metadata.get("chunk_hash"):
+                    source: str = str(metadata.get("source") or "unknown")
+                    by_source.setdefault(source, []).append(
+                        metadata["chunk_hash"]
+                    )
+            for source, hashes in by_source.items():
+                self._manifest.discard(source, hashes)
+
         logger.info(
-            "Documents deleted | filter=%s",
+            "Documents deleted | filter=%s count=%d",
             filter_metadata,
+            len(ids),
         )
+
     def clear(self) -> None:
         collection = self._vector_store._collection
-        ids: List[str] = collection.get().get("ids", [])
+        # One critical section, so a concurrent ingest cannot slip chunks in
+        # between reading the ids and wiping the manifest.
+        with self._write_lock:
+            ids: List[str] = collection.get().get("ids", [])
+            if ids:
+                collection.delete(ids=ids)
+            self._manifest.clear()
 
         if not ids:
             logger.warning("Vector store already empty")
             return
 
-        collection.delete(ids=ids)
-
         logger.warning(
             "Vector store cleared | deleted=%d",
             len(ids),
@@ -132,7 +287,10 @@ class VectorMemory:
         retriever = self._vector_store.as_retriever(
             search_kwargs={"k": top_k},
         )
-        return retriever.invoke(query)
+        with span("vector.search", backend="chroma", top_k=top_k) as attrs:
+            documents: List[Document] = retriever.invoke(query)
+            attrs["candidates"] = len(documents)
+        return documents
 
     def _rerank(
         self,
@@ -140,26 +298,7 @@ class VectorMemory:
         documents: List[Document],
         threshold: float,
     ) -> List[SearchHit]:
-        if not self.cross_encoder:
-            return [SearchHit(doc) for doc in documents]
-
-        hits: List[SearchHit] = []
-
-        for doc in documents:
-            score: float = self.cross_encoder.get_score(
-                query,
-                doc.page_content,
-            )
-
-            if score >= threshold:
-                hits.append(SearchHit(doc, score))
-
-        hits.sort(
-            key=lambda hit: hit.score or 0.0,
-            reverse=True,
-        )
-
-        return hits
+        return rerank_documents(self.cross_encoder, query, documents, threshold)
 
     def search(
         self,
@@ -182,12 +321,60 @@ class VectorMemory:
 
         return hits[: params.top_k_reranking]
 
-    def get_stats(self) -> Dict[str, Any]:
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int,
+    ) -> List[List[SearchHit]]:
+        """One embedding batch and one collection query for all queries."""
+        if not queries:
+            return []
+        embeddings: List[List[float]] = (
+            self.bi_embedder.get_embeddings(list(queries)).cpu().tolist()
+        )
+        with span("vector.search", backend="chroma", top_k=top_k, batch_size=len(queries)) as attrs:
+            result = self._vector_store._collection.query(
+                query_embeddings=embeddings,
+                n_results=top_k,
+                include=["documents", "metadatas"],
+            )
+            attrs["candidates"] = sum(len(ids) for ids in result["ids"])
+        return [
+            [
+                SearchHit(Document(id=doc_id, page_content=text or "", metadata=metadata or {}))
+                for doc_id, text, metadata in zip(ids, texts, metadatas)
+            ]
+            for ids, texts, metadatas in zip(
+                result["ids"],
+                result["documents"],
+                result["metadatas"],
+            )
+        ]
+
+    def export(self, batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
         collection = self._vector_store._collection
-        ids: List[str] = collection.get().get("ids", [])
+        with self._write_lock:
+            total: int = collection.count()
+            for offset in range(0, total, batch_size):
+                yield collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=batch_size,
+                    offset=offset,
+                )
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        if not ids:
+            return {}
+        result = self._vector_store._collection.get(
+            ids=list(ids),
+            include=["embeddings"],
+        )
+        return dict(zip(result["ids"], result["embeddings"]))
+
+    def get_stats(self) -> Dict[str, Any]:
         return {
             "status": "ready",
-            "num_documents": len(ids),
+            "num_documents": self._vector_store._collection.count(),
             "persist_path": self.persist_path,
             "has_cross_encoder": self.cross_encoder is not None,
         }
\ No newline at end of file
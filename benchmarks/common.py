@@ -0,0 +1,138 @@
+import gc
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+def rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return peak / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages: int = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 ** 2
+    except OSError:
+        return rss_mb()
+
+
+def quantile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered: List[float] = sorted(values)
+    idx: float = (len(ordered) - 1) * q
+    low: int = int(idx)
+    high: int = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (idx - low)
+
+
+def measure(
+    fn: Callable[[], Any],
+    repeat: int = 5,
+    warmup: int = 1,
+    items: Optional[int] = None,
+    stateful: bool = False,
+) -> Dict[str, float]:
+    """Median/p95 wall time, Python heap peak and RSS growth of ``fn``.
+
+    tracemalloc slows allocation-heavy code severalfold, so the heap peak comes
+    from one extra untimed run. ``stateful`` functions cannot be re-run with the
+    same effect; they are traced during the timed runs instead.
+    """
+    for _ in range(warmup):
+        fn()
+
+    gc.collect()
+    rss_before: float = current_rss_mb()
+    timings: List[float] = []
+    if stateful:
+        tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            started: float = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+
+        if not stateful:
+            tracemalloc.start()
+            fn()
+        _, heap_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median: float = statistics.median(timings)
+    result: Dict[str, float] = {
+        "repeat": repeat,
+        "median_s": median,
+        "p95_s": quantile(timings, 0.95),
+        "min_s": min(timings),
+        "heap_peak_mb": heap_peak / 1024 ** 2,
+        "rss_growth_mb": current_rss_mb() - rss_before,
+    }
+    if items:
+        result["items"] = items
+        result["items_per_s"] = items / median if median > 0 else 0.0
+    return result
+
+
+def environment() -> Dict[str, Any]:
+    info: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+    }
+    try:
+        import torch
+
+        info["torch"] = torch.__version__
+        info["cuda"] = torch.cuda.is_available()
+        info["torch_threads"] = torch.get_num_threads()
+    except Exception:
+        pass
+    return info
+
+
+def write_results(path: Path, results: Dict[str, Any], **meta: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"meta": {**environment(), **meta}, "results": results}, indent=2, ensure_ascii=False)
+    )
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    metric: str = "median_s",
+) -> List[Dict[str, Any]]:
+    """Benchmarks whose metric grew by more than ``threshold`` (0.2 = 20%) over the baseline."""
+    regressions: List[Dict[str, Any]] = []
+    for name, current in sorted(results.items()):
+        previous: Optional[Dict[str, float]] = baseline.get(name)
+        if not previous or not previous.get(metric) or metric not in current:
+            continue
+        ratio: float = current[metric] / previous[metric]
+        if ratio > 1 + threshold:
+            regressions.append({
+                "benchmark": name,
+                "metric": metric,
+                "baseline": previous[metric],
+                "current": current[metric],
+                "ratio": ratio,
+            })
+    return regressions
+
+
+def load_baseline(path: Path) -> Dict[str, Dict[str, float]]:
+    return json.loads(path.read_text())["results"]
@@ -0,0 +1,169 @@
+import random
+import textwrap
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+UK_WORDS: List[str] = (
+    "бетон арматура фундамент плита стіна перекриття навантаження міцність клас марка "
+    "розчин цемент опалубка каркас колона балка ригель ґрунт основа деформація тріщина "
+    "вимоги норми проєктування будівля споруда конструкція розрахунок коефіцієнт "
+    "температура вологість морозостійкість водонепроникність захисний шар зварювання"
+).split()
+EN_WORDS: List[str] = (
+    "concrete reinforcement foundation slab wall floor load strength grade mix cement "
+    "formwork frame column beam girder soil base deformation crack requirements codes "
+    "design building structure calculation coefficient temperature humidity frost "
+    "resistance waterproofing cover welding inspection tolerance"
+).split()
+# PDFs use the standard Helvetica font, so their text is transliterated to Latin.
+_TRANSLIT: Dict[str, str] = dict(zip(
+    "абвгґдеєжзиіїйклмнопрстуфхцчшщьюя",
+    ["a", "b", "v", "h", "g", "d", "e", "ie", "zh", "z", "y", "i", "i", "i", "k", "l", "m", "n",
+     "o", "p", "r", "s", "t", "u", "f", "kh", "ts", "ch", "sh", "shch", "", "iu", "ia"],
+))
+
+
+def transliterate(text: str) -> str:
+    return "".join(_TRANSLIT.get(ch, _TRANSLIT.get(ch.lower(), ch)) for ch in text)
+
+
+class SyntheticCorpus:
+    """Deterministic multilingual documents: prose, section headers and tables."""
+
+    def __init__(self, seed: int = 13) -> None:
+        self.seed: int = seed
+
+    def _rng(self, *key: object) -> random.Random:
+        return random.Random(f"{self.seed}:{':'.join(map(str, key))}")
+
+    @staticmethod
+    def _sentence(rng: random.Random, words: List[str]) -> str:
+        sentence: str = " ".join(rng.choice(words) for _ in range(rng.randint(6, 18)))
+        return sentence[0].upper() + sentence[1:] + "."
+
+    def paragraph(self, rng: random.Random, lang: Optional[str] = None) -> str:
+        lang = lang or rng.choice(["uk", "uk", "en"])
+        words: List[str] = UK_WORDS if lang == "uk" else EN_WORDS
+        return " ".join(self._sentence(rng, words) for _ in range(rng.randint(3, 7)))
+
+    def table(self, rng: random.Random, rows: int = 6) -> str:
+        header: str = "| Клас | Міцність, МПа | Марка | Примітка |"
+        lines: List[str] = [header, "|---|---|---|---|"]
+        for _ in range(rows):
+            lines.append(
+                f"| C{rng.randint(8, 50)}/{rng.randint(10, 60)} | {rng.uniform(5, 60):.1f} "
+                f"| M{rng.choice([100, 150, 200, 250, 300, 350, 400])} | {rng.choice(UK_WORDS + EN_WORDS)} |"
+            )
+        return "\n".join(lines)
+
+    def text(self, doc_idx: int, sections: int = 4) -> str:
+        rng: random.Random = self._rng("doc", doc_idx)
+        parts: List[str] = []
+        for section in range(1, sections + 1):
+            parts.append(f"Розділ {section}. {rng.choice(UK_WORDS).capitalize()} {rng.choice(UK_WORDS)}")
+            for _ in range(rng.randint(2, 4)):
+                parts.append(self.paragraph(rng))
+            if rng.random() < 0.4:
+                parts.append(self.table(rng))
+        return "\n\n".join(parts)
+
+    def documents(self, n_docs: int, sections: int = 4) -> List[Document]:
+        return [
+            Document(
+                page_content=self.text(idx, sections),
+                metadata={"source": f"synthetic_{idx:05d}.md", "page": 0},
+            )
+            for idx in range(n_docs)
+        ]
+
+    def queries(self, n_queries: int) -> List[str]:
+        rng: random.Random = self._rng("queries")
+        return [
+            " ".join(rng.choice(UK_WORDS if i % 3 else EN_WORDS) for _ in range(rng.randint(3, 7)))
+            for i in range(n_queries)
+        ]
+
+    def labeled_queries(self, n_docs: int, n_queries: int) -> List[Dict[str, Any]]:
+        """Queries built from words of one prose sentence, labeled with that sentence.
+
+        Labels are text snippets rather than chunk ids, so one set serves every chunk size.
+        """
+        rng: random.Random = self._rng("labeled")
+        labeled: List[Dict[str, Any]] = []
+        for _ in range(n_queries):
+            doc_idx: int = rng.randrange(n_docs)
+            paragraphs: List[str] = [
+                p for p in self.text(doc_idx).split("\n\n")
+                if not p.startswith(("Розділ", "|"))
+            ]
+            sentence: str = rng.choice(rng.choice(paragraphs).split(". ")).rstrip(".")
+            words: List[str] = sentence.lower().split()
+            labeled.append({
+                "query": " ".join(rng.sample(words, min(len(words), rng.randint(4, 6)))),
+                "relevant": [{"source": f"synthetic_{doc_idx:05d}.md", "text": sentence}],
+            })
+        return labeled
+
+    def write_pdf(self, path: Path, pages: int, doc_idx: int = 0) -> Path:
+        """Long multi-page PDF with one synthetic section per page."""
+        rng: random.Random = self._rng("pdf", doc_idx)
+        page_lines: List[List[str]] = []
+        for page in range(pages):
+            text: str = transliterate(f"Section {page + 1}\n" + self.paragraph(rng) + "\n" + self.paragraph(rng))
+            lines: List[str] = [line for raw in text.splitlines() for line in textwrap.wrap(raw, 90)]
+            page_lines.append(lines[:60])
+        path.write_bytes(_pdf_bytes(page_lines))
+        return path
+
+    def write_files(self, root: Path, n_docs: int, pdf_pages: int = 50) -> List[Path]:
+        root.mkdir(parents=True, exist_ok=True)
+        paths: List[Path] = []
+        for idx, doc in enumerate(self.documents(n_docs)):
+            kind: str = ("md", "txt", "html")[idx % 3]
+            path: Path = root / f"synthetic_{idx:05d}.{kind}"
+            if kind == "html":
+                body: str = "".join(f"<p>{p}</p>" for p in doc.page_content.split("\n\n"))
+                path.write_text(f"<html><body>{body}</body></html>", encoding="utf-8")
+            else:
+                path.write_text(doc.page_content, encoding="utf-8")
+            paths.append(path)
+        paths.append(self.write_pdf(root / "synthetic_long.pdf", pdf_pages))
+        return paths
+
+
+def _pdf_escape(text: str) -> str:
+    return text.encode("latin-1", "replace").decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_bytes(pages: List[List[str]]) -> bytes:
+    # Minimal PDF 1.4 writer: catalog, page tree, Helvetica, one content stream per page.
+    objects: List[bytes] = []
+    n_pages: int = len(pages)
+    page_ids: List[int] = [4 + 2 * i for i in range(n_pages)]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(
+        f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {n_pages} >>".encode()
+    )
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for pid, lines in zip(page_ids, pages):
+        stream: str = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        data: bytes = stream.encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+
+    out: bytearray = bytearray(b"%PDF-1.4\n")
+    offsets: List[int] = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref: int = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,208 @@
+"""Fits the Platt scaling that GRADE_MODE=rerank applies to cross-encoder scores.
+
+    python -m benchmarks.grade_calibration --docs data/imports/dbn --labels data/eval/labels.jsonl
+    python -m benchmarks.grade_calibration --synthetic-docs 200 --synthetic-queries 100 --stub
+
+Uses the labeled queries of ``benchmarks.retrieval_eval``: for every query the
+top ``--top-k`` retrieved chunks are scored by the cross-encoder, and a chunk
+counts as relevant when it matches a labeled snippet. A logistic regression on
+the score logits gives ``calibration_scale`` and ``calibration_bias``, so the
+grade thresholds read as probabilities of relevance. The report also shows how
+the thresholds decide queries (accept / reject / ask the LLM) before and after
+calibration, where a query "has data" if any retrieved chunk is relevant.
+"""
+import argparse
+import logging
+import math
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.graph.nodes.grade_node import GradeNode
+from app.models.parameters import (
+    BiEncoderParams,
+    ChunkingParameters,
+    CrossEncoderParams,
+    GradeParams,
+    SearchParameters,
+)
+from app.services.documents_parser import DBNParser
+from app.services.embedders import create_bi_embedder, create_cross_encoder
+from app.services.vector_storage import VectorMemory
+from benchmarks.common import write_results
+from benchmarks.retrieval_eval import LabeledQuery, load_corpus, matches
+
+logger: logging.Logger = logging.getLogger("benchmarks.grade_calibration")
+
+_EPS = 1e-6
+
+
+def logit(score: float) -> float:
+    score = min(max(score, _EPS), 1 - _EPS)
+    return math.log(score / (1 - score))
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return np.exp(-np.logaddexp(0.0, -z))
+
+
+def fit_platt(logits: np.ndarray, labels: np.ndarray, iterations: int = 100) -> Tuple[float, float]:
+    """Newton's method with backtracking on the log loss of sigmoid(scale * logit + bias).
+
+    Targets are smoothed as in Platt (1999) so separable data does not push the
+    scale to infinity.
+    """
+    positives: int = int(labels.sum())
+    negatives: int = len(labels) - positives
+    targets: np.ndarray = np.where(labels > 0, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+    x: np.ndarray = np.stack([logits, np.ones_like(logits)], axis=1)
+
+    def loss(w: np.ndarray) -> float:
+        z: np.ndarray = x @ w
+        return float(np.sum(targets * np.logaddexp(0.0, -z) + (1 - targets) * np.logaddexp(0.0, z)))
+
+    w: np.ndarray = np.array([1.0, 0.0])
+    current: float = loss(w)
+    for _ in range(iterations):
+        p: np.ndarray = _sigmoid(x @ w)
+        gradient: np.ndarray = x.T @ (p - targets)
+        hessian: np.ndarray = (x * (p * (1 - p))[:, None]).T @ x + 1e-9 * np.eye(2)
+        step: np.ndarray = np.linalg.solve(hessian, gradient)
+        t: float = 1.0
+        while t > 1e-8 and loss(w - t * step) > current:
+            t /= 2
+        if t <= 1e-8:
+            break
+        w = w - t * step
+        previous, current = current, loss(w)
+        if previous - current < 1e-10:
+            break
+    return float(w[0]), float(w[1])
+
+
+def log_loss(probs: np.ndarray, labels: np.ndarray) -> float:
+    probs = np.clip(probs, _EPS, 1 - _EPS)
+    return float(-np.mean(labels * np.log(probs) + (1 - labels) * np.log(1 - probs)))
+
+
+def decisions(
+    scored: List[Tuple[List[float], List[bool]]],
+    params: GradeParams,
+) -> Dict[str, Any]:
+    """Query-level outcome of the grade thresholds on already scored candidates."""
+    node: GradeNode = GradeNode(llm_client=None, params=params)
+    counts: Dict[str, int] = {"accept": 0, "reject": 0, "llm": 0, "wrong_accept": 0, "wrong_reject": 0}
+    for raw_scores, relevant in scored:
+        calibrated: List[Tuple[Optional[Document], float]] = sorted(
+            ((None, node._calibrate(score)) for score in raw_scores), key=lambda item: item[1], reverse=True
+        )
+        decision: Optional[bool] = node._decide(calibrated)
+        has_data: bool = any(relevant)
+        if decision is None:
+            counts["llm"] += 1
+        elif decision:
+            counts["accept"] += 1
+            counts["wrong_accept"] += not has_data
+        else:
+            counts["reject"] += 1
+            counts["wrong_reject"] += has_data
+    decided: int = counts["accept"] + counts["reject"]
+    return {
+        **counts,
+        "llm_rate": counts["llm"] / len(scored) if scored else 0.0,
+        "decided_accuracy": (
+            1 - (counts["wrong_accept"] + counts["wrong_reject"]) / decided if decided else None
+        ),
+    }
+
+
+def score_candidates(
+    memory: VectorMemory,
+    queries: List[LabeledQuery],
+    top_k: int,
+) -> List[Tuple[List[float], List[bool]]]:
+    scored: List[Tuple[List[float], List[bool]]] = []
+    for labeled in queries:
+        hits = memory.search(SearchParameters(query=labeled.query, top_k_retrieve=top_k, use_reranking=False))
+        docs: List[Document] = [hit.document for hit in hits]
+        raw_scores: List[float] = memory.cross_encoder.get_scores(labeled.query, [d.page_content for d in docs])
+        relevant: List[bool] = [any(matches(doc, label) for label in labeled.relevant) for doc in docs]
+        scored.append((raw_scores, relevant))
+    return scored
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=Path, help="Directory of documents to index")
+    parser.add_argument("--labels", type=Path, help="Labeled queries (JSONL), required with --docs")
+    parser.add_argument("--synthetic-docs", type=int, default=200)
+    parser.add_argument("--synthetic-queries", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=ChunkingParameters.chunk_size)
+    parser.add_argument("--top-k", type=int, default=5, help="Retrieved chunks scored per query, as graded")
+    parser.add_argument("--stub", action="store_true",
+                        help="Use the hashed stub encoders (EMBEDDER_BACKEND=stub) instead of HF models")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--out", type=Path, default=Path("benchmarks/results/grade_calibration.json"))
+    args = parser.parse_args()
+
+    if args.stub:
+        os.environ["EMBEDDER_BACKEND"] = "stub"
+
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="rag-calibration-") as tmp:
+        workdir: Path = Path(tmp)
+        pages, queries = load_corpus(args, workdir)
+        chunker: DBNParser = DBNParser(ChunkingParameters(
+            chunk_size=args.chunk_size,
+            chunk_overlap=min(ChunkingParameters.chunk_overlap, args.chunk_size // 4),
+        ))
+        memory: VectorMemory = VectorMemory(
+            bi_embedder=create_bi_embedder(BiEncoderParams()),
+            cross_encoder=create_cross_encoder(CrossEncoderParams()),
+            persist_path=str(workdir / "index"),
+        )
+        memory.add_documents(chunker.chunk(pages))
+        scored = score_candidates(memory, queries, args.top_k)
+
+    raw: np.ndarray = np.array([score for scores, _ in scored for score in scores])
+    labels: np.ndarray = np.array([float(rel) for _, relevant in scored for rel in relevant])
+    if not len(labels) or labels.min() == labels.max():
+        raise SystemExit("Calibration needs both relevant and non-relevant retrieved chunks")
+
+    logits: np.ndarray = np.array([logit(score) for score in raw])
+    scale, bias = fit_platt(logits, labels)
+    calibrated: np.ndarray = _sigmoid(scale * logits + bias)
+
+    results: Dict[str, Any] = {
+        "pairs": len(labels),
+        "relevant_pairs": int(labels.sum()),
+        "queries": len(scored),
+        "calibration_scale": scale,
+        "calibration_bias": bias,
+        "log_loss_raw": log_loss(raw, labels),
+        "log_loss_calibrated": log_loss(calibrated, labels),
+        "decisions_raw": decisions(scored, GradeParams()),
+        "decisions_calibrated": decisions(
+            scored, GradeParams(calibration_scale=scale, calibration_bias=bias)
+        ),
+    }
+    print(f"{results['pairs']} (query, chunk) pairs, {results['relevant_pairs']} relevant, "
+          f"{results['queries']} queries")
+    print(f"log loss: raw={results['log_loss_raw']:.4f} calibrated={results['log_loss_calibrated']:.4f}")
+    for name in ("decisions_raw", "decisions_calibrated"):
+        d: Dict[str, Any] = results[name]
+        accuracy: str = f"{d['decided_accuracy']:.3f}" if d["decided_accuracy"] is not None else "n/a"
+        print(f"{name:22s} accept={d['accept']} reject={d['reject']} llm={d['llm']} "
+              f"llm_rate={d['llm_rate']:.2f} decided_accuracy={accuracy}")
+    print(f"\nGRADE_CALIBRATION_SCALE={scale:.4f}\nGRADE_CALIBRATION_BIAS={bias:.4f}")
+
+    write_results(args.out, results, top_k=args.top_k, chunk_size=args.chunk_size, stub=args.stub)
+    print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
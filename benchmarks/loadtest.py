@@ -0,0 +1,356 @@
+"""HTTP load test of ``app.main:app`` at increasing concurrency.
+
+    python -m benchmarks.loadtest --users 1 8 32 128 --duration 30
+    python -m benchmarks.loadtest --mix chat=0.6,stream=0.1,search=0.25,ingest=0.05 --rate 20
+
+The app runs in-process behind httpx's ASGI transport with stub encoders
+(EMBEDDER_BACKEND=stub) and the local LLM backend (LLM_BACKEND=local), in a
+throwaway data directory, so no network, model download or GPU is needed.
+
+Without ``--rate`` every user sends its next request as soon as the previous
+one returns (closed loop). With ``--rate`` requests arrive as a Poisson process
+and at most ``users`` are in flight; latency then counts from the scheduled
+arrival, so queueing behind busy users is included.
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import current_rss_mb, quantile, rss_mb, write_results
+from benchmarks.corpus import SyntheticCorpus
+
+logger: logging.Logger = logging.getLogger("benchmarks.loadtest")
+
+OPS: List[str] = ["chat", "stream", "search", "ingest"]
+
+
+@dataclass
+class Sample:
+    op: str
+    latency: float
+    ok: bool
+    error: Optional[str] = None
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in OPS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {op!r}, expected one of {OPS}")
+        mix[op] = float(weight or 1)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("Mix weights must sum to a positive number")
+    return mix
+
+
+def configure_environment(workdir: Path, args: argparse.Namespace) -> None:
+    # Must run before app.main is imported: the routers build models at import time.
+    os.environ.setdefault("LLM_BACKEND", "local")
+    os.environ.setdefault("EMBEDDER_BACKEND", "stub")
+    os.environ.setdefault("LOCAL_LLM_LATENCY_SECONDS", str(args.llm_latency))
+    os.environ.setdefault("LOCAL_LLM_TOKENS_PER_SECOND", str(args.llm_tokens_per_second))
+    # The packer loads a HF tokenizer, which would need a download.
+    os.environ.setdefault("CONTEXT_PACKER", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("CHROMA_PERSIST_DIR", str(workdir / "chroma_index"))
+    os.environ.setdefault("JOBS_DB_PATH", str(workdir / "jobs.sqlite3"))
+    os.environ.setdefault("LLM_CACHE_PATH", str(workdir / "llm_cache.sqlite3"))
+    os.environ.setdefault("TRACE_DIR", str(workdir / "traces"))
+    os.environ.setdefault("BULK_INGEST_ROOT", str(workdir / "imports"))
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, corpus: SyntheticCorpus, args: argparse.Namespace) -> None:
+        self.client: httpx.AsyncClient = client
+        self.corpus: SyntheticCorpus = corpus
+        self.queries: List[str] = corpus.queries(500)
+        self.turns_per_session: int = args.turns_per_session
+        self.ingested: int = 0
+        self.job_ids: List[str] = []
+        self.ops: Dict[str, Callable[[random.Random, str], Any]] = {
+            "chat": self.chat,
+            "stream": self.stream,
+            "search": self.search,
+            "ingest": self.ingest,
+        }
+
+    async def chat(self, rng: random.Random, session_id: str) -> httpx.Response:
+        return await self.client.post(
+            "/agent/chat",
+            json={"query": rng.choice(self.queries), "session_id": session_id},
+        )
+
+    async def stream(self, rng: random.Random, session_id: str) -> httpx.Response:
+        async with self.client.stream(
+            "POST",
+            "/agent/chat/stream",
+            json={"query": rng.choice(self.queries), "session_id": session_id},
+        ) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: error"):
+                    raise RuntimeError("stream error event")
+            return response
+
+    async def search(self, rng: random.Random, session_id: str) -> httpx.Response:
+        return await self.client.post(
+            "/vector-memory/search",
+            json={"query": rng.choice(self.queries), "top_k_retrieve": 20, "use_reranking": True},
+        )
+
+    async def ingest(self, rng: random.Random, session_id: str) -> httpx.Response:
+        self.ingested += 1
+        idx: int = 100_000 + self.ingested
+        response = await self.client.post(
+            "/vector-memory/documents/file",
+            files={"file": (f"load_{idx}.md", self.corpus.text(idx).encode("utf-8"), "text/markdown")},
+        )
+        if response.status_code < 400:
+            self.job_ids.append(response.json()["job_id"])
+        return response
+
+    async def call(self, op: str, rng: random.Random, session_id: str, started: Optional[float] = None) -> Sample:
+        started = started or time.perf_counter()
+        try:
+            response = await self.ops[op](rng, session_id)
+        except Exception as e:
+            return Sample(op, time.perf_counter() - started, False, type(e).__name__)
+        ok: bool = response.status_code < 400
+        return Sample(op, time.perf_counter() - started, ok, None if ok else f"HTTP {response.status_code}")
+
+
+def pick(rng: random.Random, mix: Dict[str, float]) -> str:
+    return rng.choices(list(mix), weights=list(mix.values()))[0]
+
+
+async def closed_loop(
+    workload: Workload,
+    users: int,
+    mix: Dict[str, float],
+    duration: float,
+    seed: int,
+) -> List[Sample]:
+    deadline: float = time.perf_counter() + duration
+    samples: List[Sample] = []
+
+    async def user(uid: int) -> None:
+        rng: random.Random = random.Random(f"{seed}:{users}:{uid}")
+        turn: int = 0
+        while time.perf_counter() < deadline:
+            # A new session every few turns, so the session store keeps growing.
+            session_id: str = f"load-{users}-{uid}-{turn // workload.turns_per_session}"
+            samples.append(await workload.call(pick(rng, mix), rng, session_id))
+            turn += 1
+
+    await asyncio.gather(*(user(uid) for uid in range(users)))
+    return samples
+
+
+async def open_loop(
+    workload: Workload,
+    users: int,
+    mix: Dict[str, float],
+    duration: float,
+    rate: float,
+    seed: int,
+) -> List[Sample]:
+    rng: random.Random = random.Random(f"{seed}:{users}:arrivals")
+    slots: asyncio.Semaphore = asyncio.Semaphore(users)
+    samples: List[Sample] = []
+    tasks: List[asyncio.Task] = []
+
+    async def request(idx: int, scheduled: float) -> None:
+        op_rng: random.Random = random.Random(f"{seed}:{users}:{idx}")
+        session_id: str = f"load-{users}-{idx // workload.turns_per_session}"
+        async with slots:
+            samples.append(await workload.call(pick(op_rng, mix), op_rng, session_id, scheduled))
+
+    started: float = time.perf_counter()
+    scheduled: float = started
+    idx: int = 0
+    while scheduled - started < duration:
+        delay: float = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request(idx, scheduled)))
+        idx += 1
+        scheduled += rng.expovariate(rate)
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    def stats(group: List[Sample]) -> Dict[str, Any]:
+        latencies: List[float] = [s.latency for s in group]
+        errors: List[Sample] = [s for s in group if not s.ok]
+        return {
+            "requests": len(group),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(group) if group else 0.0,
+            "throughput_rps": len(group) / elapsed if elapsed > 0 else 0.0,
+            "p50_ms": quantile(latencies, 0.50) * 1000,
+            "p95_ms": quantile(latencies, 0.95) * 1000,
+            "p99_ms": quantile(latencies, 0.99) * 1000,
+            "max_ms": max(latencies, default=0.0) * 1000,
+            "error_kinds": sorted({s.error for s in errors if s.error}),
+        }
+
+    report: Dict[str, Any] = {"all": stats(samples)}
+    for op in sorted({s.op for s in samples}):
+        report[op] = stats([s for s in samples if s.op == op])
+    return report
+
+
+async def wait_for_jobs(client: httpx.AsyncClient, job_ids: List[str], timeout: float) -> Dict[str, int]:
+    deadline: float = time.perf_counter() + timeout
+    statuses: Dict[str, str] = {}
+    while True:
+        for job_id in job_ids:
+            if statuses.get(job_id) in ("succeeded", "failed", "cancelled"):
+                continue
+            response = await client.get(f"/jobs/{job_id}")
+            statuses[job_id] = response.json()["status"] if response.status_code == 200 else "missing"
+        pending: int = sum(1 for status in statuses.values() if status in ("queued", "running"))
+        if not pending or time.perf_counter() > deadline:
+            break
+        await asyncio.sleep(0.2)
+    counts: Dict[str, int] = {}
+    for status in statuses.values():
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.main import app
+
+    corpus: SyntheticCorpus = SyntheticCorpus(args.seed)
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport,
+        base_url="http://loadtest",
+        timeout=args.timeout,
+    ) as client:
+        workload: Workload = Workload(client, corpus, args)
+
+        seeding: float = time.perf_counter()
+        for _ in range(args.seed_docs):
+            await workload.ingest(random.Random(args.seed), "")
+        seeded: Dict[str, int] = await wait_for_jobs(client, workload.job_ids, args.job_timeout)
+        workload.job_ids.clear()
+        print(f"Seeded {args.seed_docs} documents in {time.perf_counter() - seeding:.1f}s: {seeded}")
+
+        for users in args.users:
+            gc.collect()
+            rss_before: float = current_rss_mb()
+            started: float = time.perf_counter()
+            if args.rate:
+                samples = await open_loop(workload, users, args.mix, args.duration, args.rate, args.seed)
+            else:
+                samples = await closed_loop(workload, users, args.mix, args.duration, args.seed)
+            elapsed: float = time.perf_counter() - started
+
+            jobs: Dict[str, int] = await wait_for_jobs(client, workload.job_ids, args.job_timeout)
+            workload.job_ids.clear()
+            gc.collect()
+            stats: Dict[str, Any] = (await client.get("/agent/stats")).json()
+            level: Dict[str, Any] = summarize(samples, elapsed)
+            level.update({
+                "users": users,
+                "rate": args.rate,
+                "elapsed_s": elapsed,
+                "rss_before_mb": rss_before,
+                "rss_after_mb": current_rss_mb(),
+                "rss_growth_mb": current_rss_mb() - rss_before,
+                "rss_peak_mb": rss_mb(),
+                "sessions": stats.get("sessions", {}).get("sessions"),
+                "ingest_jobs": jobs,
+            })
+            results[f"users={users}"] = level
+            print(format_level(level))
+    return results
+
+
+def format_level(level: Dict[str, Any]) -> str:
+    lines: List[str] = [
+        f"users={level['users']:<4} elapsed={level['elapsed_s']:.1f}s  "
+        f"rss {level['rss_before_mb']:.0f} -> {level['rss_after_mb']:.0f} MB  sessions={level['sessions']}"
+    ]
+    for op in ["all", *OPS]:
+        if op not in level:
+            continue
+        s: Dict[str, Any] = level[op]
+        lines.append(
+            f"  {op:7s} n={s['requests']:<6d} rps={s['throughput_rps']:8.1f}  "
+            f"p50={s['p50_ms']:9.1f}  p95={s['p95_ms']:9.1f}  p99={s['p99_ms']:9.1f} ms  "
+            f"errors={s['errors']}{' ' + ','.join(s['error_kinds']) if s['error_kinds'] else ''}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32, 128],
+                        help="Concurrency levels, run one after another against the same app")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per concurrency level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=0.6,stream=0.1,search=0.25,ingest=0.05"),
+                        help="Operation weights, e.g. chat=0.7,search=0.3")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Open-loop arrival rate in requests/s; 0 runs closed-loop users")
+    parser.add_argument("--turns-per-session", type=int, default=5,
+                        help="Chat turns before a user starts a new session")
+    parser.add_argument("--seed-docs", type=int, default=50, help="Documents ingested before the first level")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Local LLM time to first token, seconds")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout, seconds")
+    parser.add_argument("--job-timeout", type=float, default=300.0,
+                        help="How long to wait for queued ingestion jobs after each level")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--out", type=Path, default=Path("benchmarks/results/loadtest.json"))
+    args = parser.parse_args()
+    args.turns_per_session = max(1, args.turns_per_session)
+
+    out: Path = args.out.resolve()
+    repo_root: str = str(Path(__file__).resolve().parents[1])
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+    with tempfile.TemporaryDirectory(prefix="rag-loadtest-") as tmp:
+        workdir: Path = Path(tmp)
+        configure_environment(workdir, args)
+        # Remaining relative paths (uploads, query router examples) land in the temp dir too.
+        cwd: str = os.getcwd()
+        os.chdir(workdir)
+        try:
+            results: Dict[str, Any] = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    write_results(
+        out,
+        results,
+        users=args.users,
+        duration=args.duration,
+        rate=args.rate,
+        mix=args.mix,
+        seed_docs=args.seed_docs,
+        llm_latency=args.llm_latency,
+        env={key: os.environ[key] for key in ("LLM_BACKEND", "EMBEDDER_BACKEND", "CONTEXT_PACKER")},
+    )
+    print(f"Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
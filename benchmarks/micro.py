@@ -0,0 +1,177 @@
+"""Micro-benchmarks for chunking, embedding, rerank and vector storage.
+
+    python -m benchmarks.micro --sizes 200 1000 --out benchmarks/results/micro.json
+    python -m benchmarks.micro --baseline benchmarks/results/baseline.json --threshold 0.2
+
+Exits with status 1 when a benchmark's median time regresses past the threshold.
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from langchain_core.documents import Document
+
+from app.models.parameters import BiEncoderParams, CrossEncoderParams, SearchParameters
+from app.services.documents_parser import DBNParser
+from app.services.embedders import HFBiEmbedder, HFCrossEncoder
+from app.services.vector_storage import VectorMemory
+from benchmarks.common import compare, load_baseline, measure, write_results
+from benchmarks.corpus import SyntheticCorpus
+
+logger: logging.Logger = logging.getLogger("benchmarks.micro")
+
+
+def bench_chunking(
+    corpus: SyntheticCorpus,
+    parser: DBNParser,
+    sizes: List[int],
+    repeat: int,
+    workdir: Path,
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for size in sizes:
+        docs: List[Document] = corpus.documents(size)
+        results[f"chunking/docs={size}"] = measure(lambda: parser.chunk(docs), repeat=repeat, items=size)
+
+    pdf: Path = corpus.write_pdf(workdir / "long.pdf", pages=200)
+    results["chunking/pdf_pages=200"] = measure(
+        lambda: parser.load(str(pdf), "file"),
+        repeat=repeat,
+        items=200,
+    )
+    return results
+
+
+def bench_embedding(
+    embedder: HFBiEmbedder,
+    texts: List[str],
+    repeat: int,
+    batch_sizes: List[int],
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {
+        "embed/single": measure(
+            lambda: [embedder.get_embedding(text) for text in texts],
+            repeat=repeat,
+            items=len(texts),
+        ),
+    }
+    for batch_size in batch_sizes:
+        def batched() -> None:
+            for start in range(0, len(texts), batch_size):
+                embedder.get_embeddings(texts[start:start + batch_size])
+
+        results[f"embed/batched/batch={batch_size}"] = measure(batched, repeat=repeat, items=len(texts))
+    return results
+
+
+def bench_rerank(
+    cross_encoder: HFCrossEncoder,
+    query: str,
+    texts: List[str],
+    repeat: int,
+    candidates: List[int],
+) -> Dict[str, Dict[str, float]]:
+    return {
+        f"rerank/candidates={n}": measure(
+            lambda n=n: cross_encoder.get_scores(query, texts[:n]),
+            repeat=repeat,
+            items=n,
+        )
+        for n in candidates
+    }
+
+
+def bench_vector_memory(
+    bi_embedder: HFBiEmbedder,
+    chunks: List[Document],
+    queries: List[str],
+    sizes: List[int],
+    repeat: int,
+    workdir: Path,
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for size in sizes:
+        if size > len(chunks):
+            logger.warning("Skipping vector size %d: only %d chunks generated", size, len(chunks))
+            continue
+        batch: List[Document] = [
+            Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+            for doc in chunks[:size]
+        ]
+        memory: VectorMemory = VectorMemory(
+            bi_embedder=bi_embedder,
+            persist_path=str(workdir / f"chroma_{size}"),
+        )
+        # Indexing runs once into a fresh index; search then repeats over it.
+        results[f"vector/add/chunks={size}"] = measure(
+            lambda: memory.add_documents(batch),
+            repeat=1,
+            warmup=0,
+            items=size,
+            stateful=True,
+        )
+        results[f"vector/search/chunks={size}"] = measure(
+            lambda: [memory.search(SearchParameters(query=q, top_k_retrieve=10)) for q in queries],
+            repeat=repeat,
+            items=len(queries),
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000],
+                        help="Corpus sizes: documents for chunking, chunks for vector storage")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--only", nargs="+", choices=["chunking", "embed", "rerank", "vector"],
+                        default=["chunking", "embed", "rerank", "vector"])
+    parser.add_argument("--out", type=Path, default=Path("benchmarks/results/micro.json"))
+    parser.add_argument("--baseline", type=Path, help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative slowdown of median time before failing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    corpus: SyntheticCorpus = SyntheticCorpus(args.seed)
+    chunker: DBNParser = DBNParser()
+    chunks: List[Document] = chunker.chunk(corpus.documents(max(args.sizes) // 4 + 1))
+    queries: List[str] = corpus.queries(20)
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+        workdir: Path = Path(tmp)
+        if "chunking" in args.only:
+            results.update(bench_chunking(corpus, chunker, args.sizes, args.repeat, workdir))
+
+        bi_embedder = HFBiEmbedder(BiEncoderParams()) if {"embed", "vector"} & set(args.only) else None
+        if "embed" in args.only:
+            texts: List[str] = [doc.page_content for doc in chunks[:256]]
+            results.update(bench_embedding(bi_embedder, texts, args.repeat, [8, 32, 64]))
+        if "rerank" in args.only:
+            cross_encoder: HFCrossEncoder = HFCrossEncoder(CrossEncoderParams())
+            texts = [doc.page_content for doc in chunks[:100]]
+            results.update(bench_rerank(cross_encoder, queries[0], texts, args.repeat, [10, 50, 100]))
+        if "vector" in args.only:
+            results.update(bench_vector_memory(bi_embedder, chunks, queries, args.sizes, args.repeat, workdir))
+
+    write_results(args.out, results, sizes=args.sizes, seed=args.seed, repeat=args.repeat)
+    for name, stats in results.items():
+        print(f"{name:40s} median={stats['median_s'] * 1000:10.2f} ms  "
+              f"p95={stats['p95_s'] * 1000:10.2f} ms  heap_peak={stats['heap_peak_mb']:8.1f} MB")
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        regressions = compare(results, load_baseline(args.baseline), args.threshold)
+        if regressions:
+            print(json.dumps({"regressions": regressions}, indent=2))
+            sys.exit(1)
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
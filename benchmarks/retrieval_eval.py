@@ -0,0 +1,331 @@
+"""Retrieval quality vs latency sweep over chunking, ANN and search parameters.
+
+    python -m benchmarks.retrieval_eval --docs data/imports/dbn --labels data/eval/labels.jsonl
+    python -m benchmarks.retrieval_eval --synthetic-docs 200 --synthetic-queries 100 --stub
+
+Labels are JSONL, one query per line; a retrieved chunk is relevant when it
+contains a labeled snippet (or lies inside it) and, if given, comes from the
+labeled source file:
+
+    {"query": "...", "relevant": [{"source": "dbn_b_2_6.pdf", "text": "..."}, "bare snippet"]}
+
+Every chunk size (and HNSW setting) gets its own index; each search config is
+then run over all queries. The report lists recall@k, MRR and nDCG next to
+mean/p95 search latency and memory, and marks the configs on the Pareto
+frontier of ``--objective`` vs p95 latency.
+"""
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from app.models.parameters import (
+    BiEncoderParams,
+    ChunkingParameters,
+    CrossEncoderParams,
+    SearchParameters,
+)
+from app.services.documents_parser import DBNParser
+from app.services.embedders import create_bi_embedder, create_cross_encoder
+from app.services.vector_storage import VectorMemory
+from benchmarks.common import current_rss_mb, quantile, write_results
+from benchmarks.corpus import SyntheticCorpus
+
+logger: logging.Logger = logging.getLogger("benchmarks.retrieval_eval")
+
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class Label:
+    text: str
+    source: Optional[str] = None
+
+
+@dataclass
+class LabeledQuery:
+    query: str
+    relevant: List[Label]
+
+
+@dataclass
+class SearchConfig:
+    top_k_retrieve: int
+    use_reranking: bool
+    top_k_reranking: int = 0
+    rerank_threshold: float = 0.0
+
+    @property
+    def name(self) -> str:
+        if not self.use_reranking:
+            return f"retrieve={self.top_k_retrieve}"
+        return f"retrieve={self.top_k_retrieve}/rerank={self.top_k_reranking}/threshold={self.rerank_threshold:g}"
+
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(" ", text).strip().lower()
+
+
+def load_labels(path: Path) -> List[LabeledQuery]:
+    queries: List[LabeledQuery] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        row: Dict[str, Any] = json.loads(line)
+        labels: List[Label] = [
+            Label(text=item) if isinstance(item, str) else Label(text=item["text"], source=item.get("source"))
+            for item in row["relevant"]
+        ]
+        queries.append(LabeledQuery(query=row["query"], relevant=labels))
+    return queries
+
+
+def matches(doc: Document, label: Label) -> bool:
+    if label.source and Path(str(doc.metadata.get("source", ""))).name != Path(label.source).name:
+        return False
+    chunk: str = normalize(doc.page_content)
+    snippet: str = normalize(label.text)
+    return snippet in chunk or (len(chunk) > 20 and chunk in snippet)
+
+
+def score_ranking(ranking: List[Document], labels: List[Label], ks: Sequence[int]) -> Dict[str, float]:
+    # Each label counts once: overlapping chunks that repeat a found snippet gain nothing.
+    found_at: Dict[int, int] = {}
+    for rank, doc in enumerate(ranking):
+        for idx, label in enumerate(labels):
+            if idx not in found_at and matches(doc, label):
+                found_at[idx] = rank
+                break
+
+    first: Optional[int] = min(found_at.values(), default=None)
+    scores: Dict[str, float] = {"mrr": 1.0 / (first + 1) if first is not None else 0.0}
+    for k in ks:
+        hits: List[int] = [rank for rank in found_at.values() if rank < k]
+        dcg: float = sum(1.0 / math.log2(rank + 2) for rank in hits)
+        idcg: float = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(labels), k)))
+        scores[f"recall@{k}"] = len(hits) / len(labels) if labels else 0.0
+        scores[f"ndcg@{k}"] = dcg / idcg if idcg else 0.0
+    return scores
+
+
+def search_configs(args: argparse.Namespace) -> List[SearchConfig]:
+    configs: List[SearchConfig] = []
+    for top_k_retrieve in args.top_k_retrieve:
+        configs.append(SearchConfig(top_k_retrieve=top_k_retrieve, use_reranking=False))
+        if args.no_rerank:
+            continue
+        for top_k_reranking in args.top_k_rerank:
+            if top_k_reranking > top_k_retrieve:
+                continue
+            for threshold in args.rerank_thresholds:
+                configs.append(SearchConfig(top_k_retrieve, True, top_k_reranking, threshold))
+    return configs
+
+
+def evaluate(
+    memory: VectorMemory,
+    queries: List[LabeledQuery],
+    config: SearchConfig,
+    ks: Sequence[int],
+    memory_sample: int,
+) -> Dict[str, Any]:
+    def params(query: str) -> SearchParameters:
+        return SearchParameters(
+            query=query,
+            top_k_retrieve=config.top_k_retrieve,
+            use_reranking=config.use_reranking,
+            top_k_reranking=config.top_k_reranking or config.top_k_retrieve,
+            rerank_threshold=config.rerank_threshold,
+        )
+
+    latencies: List[float] = []
+    per_query: List[Dict[str, float]] = []
+    for labeled in queries:
+        started: float = time.perf_counter()
+        hits = memory.search(params(labeled.query))
+        latencies.append(time.perf_counter() - started)
+        per_query.append(score_ranking([hit.document for hit in hits], labeled.relevant, ks))
+
+    # Heap peak from a separate pass: tracemalloc would distort the latencies above.
+    tracemalloc.start()
+    try:
+        for labeled in queries[:memory_sample]:
+            memory.search(params(labeled.query))
+        _, heap_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result: Dict[str, Any] = {
+        metric: statistics.fmean(scores[metric] for scores in per_query)
+        for metric in per_query[0]
+    } if per_query else {}
+    result.update({
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": quantile(latencies, 0.95) * 1000,
+        "search_heap_peak_mb": heap_peak / 1024 ** 2,
+    })
+    return result
+
+
+def pareto_frontier(results: Dict[str, Dict[str, Any]], objective: str) -> List[str]:
+    """Configs no other config beats on both ``objective`` (higher) and p95 latency (lower)."""
+    frontier: List[str] = []
+    for name, result in results.items():
+        dominated: bool = any(
+            other[objective] >= result[objective]
+            and other["p95_ms"] <= result["p95_ms"]
+            and (other[objective] > result[objective] or other["p95_ms"] < result["p95_ms"])
+            for other_name, other in results.items()
+            if other_name != name
+        )
+        if not dominated:
+            frontier.append(name)
+    return sorted(frontier, key=lambda name: results[name]["p95_ms"])
+
+
+def load_corpus(args: argparse.Namespace, workdir: Path) -> Tuple[List[Document], List[LabeledQuery]]:
+    if args.docs:
+        if not args.labels:
+            raise SystemExit("--docs needs --labels")
+        files: List[Path] = sorted(
+            path for path in args.docs.rglob("*")
+            if path.suffix.lower() in DBNParser.SUPPORTED_EXTENSIONS
+        )
+        pages: List[Document] = []
+        loader: DBNParser = DBNParser()
+        for path in files:
+            pages.extend(loader.load_pages(str(path), "file"))
+        return pages, load_labels(args.labels)
+
+    corpus: SyntheticCorpus = SyntheticCorpus(args.seed)
+    pages = corpus.documents(args.synthetic_docs)
+    labeled: List[Dict[str, Any]] = corpus.labeled_queries(args.synthetic_docs, args.synthetic_queries)
+    labels_path: Path = workdir / "labels.jsonl"
+    labels_path.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in labeled), encoding="utf-8")
+    return pages, load_labels(labels_path)
+
+
+def directory_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1024 ** 2
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=Path, help="Directory of documents to index")
+    parser.add_argument("--labels", type=Path, help="Labeled queries (JSONL), required with --docs")
+    parser.add_argument("--synthetic-docs", type=int, default=200)
+    parser.add_argument("--synthetic-queries", type=int, default=100)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[400, 800, 1600])
+    parser.add_argument("--chunk-overlap", type=int, default=ChunkingParameters.chunk_overlap,
+                        help="Capped at a quarter of the chunk size")
+    parser.add_argument("--hnsw-search-ef", type=int, nargs="+",
+                        help="Chroma hnsw:search_ef values; one index per value")
+    parser.add_argument("--top-k-retrieve", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--top-k-rerank", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--rerank-thresholds", type=float, nargs="+", default=[0.0, 0.1, 0.2])
+    parser.add_argument("--no-rerank", action="store_true", help="Only sweep retrieval without reranking")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cutoffs for recall@k and nDCG@k")
+    parser.add_argument("--objective", default="ndcg@10", help="Quality metric for the Pareto frontier")
+    parser.add_argument("--memory-sample", type=int, default=20,
+                        help="Queries re-run under tracemalloc for the search heap peak")
+    parser.add_argument("--stub", action="store_true",
+                        help="Use the hashed stub encoders (EMBEDDER_BACKEND=stub) instead of HF models")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--out", type=Path, default=Path("benchmarks/results/retrieval_eval.json"))
+    args = parser.parse_args()
+
+    if args.objective not in {"mrr", *(f"{m}@{k}" for m in ("recall", "ndcg") for k in args.k)}:
+        parser.error(f"--objective must be mrr, recall@k or ndcg@k for k in {args.k}")
+    if args.stub:
+        os.environ["EMBEDDER_BACKEND"] = "stub"
+
+    logging.basicConfig(level=logging.WARNING)
+    bi_embedder = create_bi_embedder(BiEncoderParams())
+    cross_encoder = None if args.no_rerank else create_cross_encoder(CrossEncoderParams())
+    configs: List[SearchConfig] = search_configs(args)
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with tempfile.TemporaryDirectory(prefix="rag-eval-") as tmp:
+        workdir: Path = Path(tmp)
+        pages, queries = load_corpus(args, workdir)
+        print(f"{len(pages)} pages, {len(queries)} labeled queries, {len(configs)} search configs per index")
+
+        for chunk_size in args.chunk_sizes:
+            chunker: DBNParser = DBNParser(ChunkingParameters(
+                chunk_size=chunk_size,
+                chunk_overlap=min(args.chunk_overlap, chunk_size // 4),
+            ))
+            chunks: List[Document] = chunker.chunk(
+                [Document(page_content=p.page_content, metadata=dict(p.metadata)) for p in pages]
+            )
+            for search_ef in args.hnsw_search_ef or [None]:
+                index_name: str = f"chunk={chunk_size}" + (f"/ef={search_ef}" if search_ef else "")
+                persist: Path = workdir / index_name.replace("/", "_")
+                gc.collect()
+                rss_before: float = current_rss_mb()
+                started: float = time.perf_counter()
+                memory: VectorMemory = VectorMemory(
+                    bi_embedder=bi_embedder,
+                    cross_encoder=cross_encoder,
+                    persist_path=str(persist),
+                    collection_metadata={"hnsw:search_ef": search_ef} if search_ef else None,
+                )
+                memory.add_documents(chunks)
+                index: Dict[str, Any] = {
+                    "chunk_size": chunk_size,
+                    "hnsw_search_ef": search_ef,
+                    "chunks": len(chunks),
+                    "index_s": time.perf_counter() - started,
+                    "index_rss_growth_mb": current_rss_mb() - rss_before,
+                    "index_disk_mb": directory_mb(persist),
+                }
+
+                for config in configs:
+                    name: str = f"{index_name}/{config.name}"
+                    results[name] = {
+                        **index,
+                        **asdict(config),
+                        **evaluate(memory, queries, config, args.k, args.memory_sample),
+                    }
+                    r: Dict[str, Any] = results[name]
+                    print(f"{name:60s} {args.objective}={r[args.objective]:.3f} mrr={r['mrr']:.3f} "
+                          f"mean={r['mean_ms']:7.1f} ms p95={r['p95_ms']:7.1f} ms")
+                del memory
+
+    frontier: List[str] = pareto_frontier(results, args.objective)
+    for name in results:
+        results[name]["pareto"] = name in frontier
+
+    print(f"\nPareto frontier ({args.objective} vs p95 latency):")
+    for name in frontier:
+        r = results[name]
+        print(f"  {name:60s} {args.objective}={r[args.objective]:.3f} p95={r['p95_ms']:7.1f} ms "
+              f"index={r['index_disk_mb']:.1f} MB heap={r['search_heap_peak_mb']:.1f} MB")
+
+    write_results(
+        args.out,
+        results,
+        objective=args.objective,
+        pareto=frontier,
+        queries=len(queries),
+        ks=args.k,
+        embedder_backend=os.getenv("EMBEDDER_BACKEND", "hf"),
+        labels=str(args.labels) if args.labels else "synthetic",
+    )
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,30 @@
 import streamlit as st
 import requests
+import json
 import os
 import uuid
 
 API_BASE = os.getenv("API_BASE", "http://localhost:8000")
 
+STAGE_LABELS = {
+    "analysis": "🧠 Аналіз запиту",
+    "retrieval": "🔎 Пошук документів",
+    "grading": "⚖️ Оцінка документів",
+    "rewrite": "✏️ Переформулювання запиту",
+}
+
+
+def iter_sse(response):
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+            event = "message"
+
 
 def format_source(source: dict, idx: int) -> str:
     source_type = source.get("source_type", "document")
@@ -32,6 +52,20 @@ def format_source(source: dict, idx: int) -> str:
     return "\n\n".join(parts)
 
 
+def render_timings(timings: dict):
+    with st.expander(f"🐞 Debug: {timings['total_ms']:.0f} мс", expanded=False):
+        st.markdown(
+            f"**LLM викликів:** {timings['llm_calls']} • "
+            f"**токени:** {timings['input_tokens']} → {timings['output_tokens']} • "
+            f"**кеш:** {timings['cache_hits']} влучань / {timings['cache_misses']} промахів • "
+            f"**кандидатів пошуку:** {timings['retrieval_candidates']} • "
+            f"**переформулювань:** {timings['rewrite_iterations']}"
+        )
+        st.dataframe(timings["nodes"], hide_index=True)
+        if timings["llm"]:
+            st.dataframe(timings["llm"], hide_index=True)
+
+
 def main():
     # ==============================
     # Session state
@@ -83,6 +117,7 @@ def main():
                 st.sidebar.error(f"❌ Помилка: {str(e)}")
 
     st.sidebar.divider()
+    debug = st.sidebar.checkbox("🐞 Показувати таймінги", value=False)
 
     # ==============================
     # New conversation
@@ -121,34 +156,58 @@ def main():
     # Відправка запиту асистенту
     # ==============================
     with st.chat_message("assistant"):
-        with st.spinner("🤔 Шукаю відповідь..."):
-            try:
-                r = requests.post(
-                    f"{API_BASE}/agent/chat",
-                    json={"query": user_input, "session_id": st.session_state.session_id},
-                    timeout=60,
-                )
+        result = {"answer": "", "sources": [], "error": None, "timings": None}
+        status = st.status("🤔 Шукаю відповідь...")
+
+        def tokens():
+            with requests.post(
+                f"{API_BASE}/agent/chat/stream",
+                json={"query": user_input, "session_id": st.session_state.session_id, "debug": debug},
+                stream=True,
+                timeout=60,
+            ) as r:
                 if not r.ok:
-                    st.error(r.text)
+                    result["error"] = r.text
                     return
-
-                data = r.json()
-                answer = data.get("answer", "")
-                sources = data.get("sources", [])
-
-                # Відповідь завжди на першому плані
-                st.markdown(f"**💡 Відповідь:** {answer}")
-
-                # Зберігаємо повідомлення
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": answer,
-                    "sources": sources,
-                })
-
-            except Exception as e:
-                st.error(f"❌ Помилка: {str(e)}")
-                return
+                for event, data in iter_sse(r):
+                    if event == "progress":
+                        status.write(STAGE_LABELS.get(data.get("stage"), data.get("stage")))
+                    elif event == "token":
+                        yield data["text"]
+                    elif event == "sources":
+                        result["sources"] = data.get("sources", [])
+                    elif event == "done":
+                        result["answer"] = data.get("answer", "")
+                        result["timings"] = data.get("timings")
+                    elif event == "error":
+                        result["error"] = data.get("detail")
+
+        try:
+            streamed = st.write_stream(tokens())
+        except Exception as e:
+            status.update(label="❌ Помилка", state="error")
+            st.error(f"❌ Помилка: {str(e)}")
+            return
+
+        if result["error"]:
+            status.update(label="❌ Помилка", state="error")
+            st.error(result["error"])
+            return
+        status.update(label="✅ Готово", state="complete")
+
+        # Fallback-відповіді не стрімляться токенами
+        answer = result["answer"] or (streamed if isinstance(streamed, str) else "")
+        if not streamed and answer:
+            st.markdown(answer)
+        if result["timings"]:
+            render_timings(result["timings"])
+
+        # Зберігаємо повідомлення
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": answer,
+            "sources": result["sources"],
+        })
 
     # ==============================
     # Collapsed sources block (усі джерела)